@@ -1,31 +1,15 @@
 from fastapi import APIRouter
-import logging
-import traceback
 
-logger = logging.getLogger(__name__)
-api_router = APIRouter()
-
-def _log_import_error(name: str, exc: Exception) -> None:
-    tb_str = ''.join(traceback.format_exception(exc.__class__, exc, exc.__traceback__))
-    logger.error("Failed to import router '%s': %s\n%s", name, exc, tb_str)
-
-# Users router
-try:
-    from backend.app.api.v1.routes.users import router as users_router
-    api_router.include_router(users_router)
-except Exception as e:  # pragma: no cover
-    _log_import_error('users', e)
+# 路由模块导入失败（依赖缺失、配置错误）时直接中止启动，而不是带着缺失的路由继续服务
+from backend.app.api.v1.routes.graphs import router as graphs_router
+from backend.app.api.v1.routes.interaction import router as interaction_router
+from backend.app.api.v1.routes.jobs import router as jobs_router
+from backend.app.api.v1.routes.search import router as search_router
+from backend.app.api.v1.routes.users import router as users_router
 
-# Graphs router
-try:
-    from backend.app.api.v1.routes.graphs import router as graphs_router
-    api_router.include_router(graphs_router, tags=["graphs"])    
-except Exception as e:  # pragma: no cover
-    _log_import_error('graphs', e)
-
-# Interaction router
-try:
-    from backend.app.api.v1.routes.interaction import router as interaction_router
-    api_router.include_router(interaction_router, tags=["interaction"])  
-except Exception as e:  # pragma: no cover
-    _log_import_error('interaction', e)
+api_router = APIRouter()
+api_router.include_router(users_router)
+api_router.include_router(graphs_router, tags=["graphs"])
+api_router.include_router(interaction_router, tags=["interaction"])
+api_router.include_router(search_router, tags=["search"])
+api_router.include_router(jobs_router, tags=["jobs"])
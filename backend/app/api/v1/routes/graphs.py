@@ -1,64 +1,496 @@
 import datetime
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Any, Callable, Literal
+import anyio
+import orjson
+import zstandard
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import tuple_, update
 from sqlmodel import Session, select
 
-from backend.app.schemas.graph import GraphBasic, GraphCreate, GraphDetail, GraphUpdate
+from backend.app.schemas.graph import (
+    GraphBasic, GraphCreate, GraphDetail, GraphOp, GraphPatch, GraphPatchResult, GraphSkeleton, GraphUpdate,
+    NodeSkeleton, RelatedNode, RelatedQuery,
+)
 from backend.app.db.session import get_session
-from backend.app.models.graph import Graph
+from backend.app.models.graph import Graph, GraphEdge, GraphNode
 from backend.app.models.user import User
-from backend.app.db.base import init_db
-from backend.app.core.security import get_current_user
-from backend.app.utils.graph_utils import pack_graph, unpack_graph
+from backend.app.core.metrics import stats_collector
+from backend.app.core.security import get_current_user, user_from_token
+from backend.app.crud.graph import (
+    GraphDelta, GraphPatchError, apply_graph_patch, delete_graph_rows, graph_etag, sync_graph_rows,
+)
+from backend.app.crud.graph_transfer import (
+    GRAPH_IMPORT_BATCH, ImportItem, ImportLineTooLong, ImportResult, import_batch, iter_export, iter_lines, parse_line,
+)
+from backend.app.search import fulltext
+from backend.app.search.vector_index import VECTOR_INDEX_ENABLED, VECTOR_MIN_SCORE, vector_indexes
+from backend.app.utils.graph_hub import CLOSE_NOT_FOUND, CLOSE_UNAUTHORIZED, Subscriber, encode, graph_hub
+from backend.app.utils.graph_utils import merge_graph_json, pack_graph, unpack_graph
+from backend.app.utils.http_cache import accepts_encoding, content_etag, etag_matches, format_etag, graph_response_cache
+from backend.app.utils.write_coalescer import Pending, WriteCoalescer
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/graphs", tags=["graphs"])
 
-@router.on_event("startup")
-def _startup():
-    init_db()
+def _version_conflict(current: int) -> HTTPException:
+    return HTTPException(status_code=409, detail={"message": "Graph version conflict", "version": current})
+
+def _index_vectors(owner_id: int | None, graph_id: int, delta: GraphDelta) -> None:
+    """提交后增量更新向量索引，只处理内容有变化的节点；索引失败不影响保存"""
+    if not VECTOR_INDEX_ENABLED or owner_id is None:
+        return
+    try:
+        vector_indexes.index_nodes(owner_id, graph_id, delta.upserted_nodes, delta.deleted_node_ids)
+    except Exception:
+        logger.exception("vector indexing failed for graph %s", graph_id)
+
+def _write_graph(session: Session, graph_id: int, expected_version: int, nodes: list, edges: list,
+                 title: str, exported_at: str, owner_id: int | None = None, new_version: int | None = None) -> int:
+    """仅当库中版本仍为 expected_version 时写入（原子比较并更新），并同步节点/边表，返回新版本号
+    （默认 expected_version + 1；合并写入时为批内最后一次保存的版本）"""
+    new_version = expected_version + 1 if new_version is None else new_version
+    payload = pack_graph(nodes, edges)
+    result = session.execute(
+        update(Graph)
+        .where(Graph.id == graph_id, Graph.version == expected_version)
+        .values(version=new_version, payload=payload, data=None, title=title, exported_at=exported_at,
+                content_hash=graph_etag(new_version, title, exported_at, payload))
+    )
+    if result.rowcount == 0:
+        session.rollback()
+        current = session.get(Graph, graph_id)
+        if current is None:
+            raise HTTPException(status_code=404, detail="Graph not found")
+        raise _version_conflict(current.version)
+    delta = sync_graph_rows(session, graph_id, nodes, edges)
+    fulltext.index_delta(session, owner_id, graph_id, delta)
+    session.commit()
+    graph_response_cache.invalidate(graph_id)
+    _index_vectors(owner_id, graph_id, delta)
+    return new_version
+
+# 保存合并：同一张图在窗口内的连续保存（PUT/PATCH/WebSocket 变更）合并为一次提交，0 表示不等待
+# （仍会合并上一批提交期间到达的保存）
+GRAPH_SAVE_COALESCE_MS = float(os.getenv("GRAPH_SAVE_COALESCE_MS", "20"))
+GRAPH_SAVE_MAX_BATCH = int(os.getenv("GRAPH_SAVE_MAX_BATCH", "64"))
+# 与其他进程的并发写入冲突时，基于最新数据重放整批的次数
+GRAPH_SAVE_RETRIES = 5
+
+graph_saves = WriteCoalescer(GRAPH_SAVE_COALESCE_MS / 1000, GRAPH_SAVE_MAX_BATCH)
+stats_collector("graph_saves", graph_saves.stats, "Coalesced graph saves")
+
+@dataclass
+class _GraphSave:
+    # (title, nodes, edges) -> 新的 (title, nodes, edges)；replaces 为 True 时不读取原图（整图替换），传入 None
+    apply: Callable[[str, Any, Any], tuple[str, list, list]]
+    # None 表示作用于最新版本
+    expected_version: int | None
+    # 保存后广播的消息
+    message: Callable[[str, list, list], dict]
+    replaces: bool = False
+    # 发起保存的用户，不是图的所有者时以 404 失败；None 表示调用方已校验（WebSocket 连接时）
+    owner_id: int | None = None
+
+@dataclass
+class _SaveResult:
+    version: int
+    title: str
+    exported_at: str
+
+def _commit_saves(session: Session, graph_id: int, batch: list[Pending]) -> None:
+    """按到达顺序把一批保存应用到最新版本上（逐个校验 version，结果与逐个提交相同），
+    一次写入最终状态，再按版本顺序广播每个保存"""
+    for _ in range(GRAPH_SAVE_RETRIES):
+        session.expire_all()
+        g = session.get(Graph, graph_id)
+        if g is None:
+            for item in batch:
+                item.error = HTTPException(status_code=404, detail="Graph not found")
+            return
+        base_version, owner_id, stored = g.version, g.owner_id, g.stored
+        title, nodes, edges, version = g.title, None, None, base_version
+        applied = []
+        for item in batch:
+            save: _GraphSave = item.value
+            item.error = None
+            if save.owner_id is not None and save.owner_id != owner_id:
+                item.error = HTTPException(status_code=404, detail="Graph not found")
+                continue
+            if save.expected_version is not None and save.expected_version != version:
+                item.error = _version_conflict(version)
+                continue
+            if nodes is None and not save.replaces:
+                nodes, edges = unpack_graph(stored)
+            try:
+                title, nodes, edges = save.apply(title, nodes, edges)
+            except GraphPatchError as exc:
+                item.error = HTTPException(status_code=422, detail=str(exc))
+                continue
+            version += 1
+            applied.append((item, version, title, nodes, edges))
+        if not applied:
+            return
+        exported_at = datetime.datetime.utcnow().isoformat()
+        try:
+            _write_graph(session, graph_id, base_version, nodes, edges, title=title, exported_at=exported_at,
+                         owner_id=owner_id, new_version=version)
+        except HTTPException as exc:
+            if exc.status_code == 409:
+                continue  # 其他进程先写入了
+            raise
+        for item, item_version, item_title, item_nodes, item_edges in applied:
+            item.result = _SaveResult(item_version, item_title, exported_at)
+            graph_hub.publish(graph_id, item_version, item.value.message(item_title, item_nodes, item_edges))
+        return
+    for item in batch:
+        item.error = _version_conflict(version)
+
+def _save_graph(session: Session, graph_id: int, save: _GraphSave) -> _SaveResult:
+    return graph_saves.submit(graph_id, save, partial(_commit_saves, session))
+
+def _snapshot_message(title: str, nodes: list, edges: list) -> dict:
+    return {"type": "snapshot", "title": title, "nodes": nodes, "edges": edges}
 
 @router.get("/", response_model=list[GraphBasic])
-def list_graphs(session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    items = list(session.exec(select(Graph).where(Graph.owner_id == current_user.id)).all())
-    items.sort(key=lambda g: (g.id or 0), reverse=True)
-    return [GraphBasic(id=(g.id or 0), title=g.title) for g in items]
+def list_graphs(request: Request,
+                limit: int | None = Query(None, ge=1, le=500),
+                cursor: int | None = Query(None, ge=1, description="上一页响应头 X-Next-Cursor 的值"),
+                session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    # 只取列表需要的列，在数据库中排序分页，不加载 data 大字段
+    stmt = select(Graph.id, Graph.title).where(Graph.owner_id == current_user.id)
+    if cursor is not None:
+        stmt = stmt.where(Graph.id < cursor)
+    stmt = stmt.order_by(Graph.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    rows = list(session.exec(stmt).all())
+    headers = {}
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = str(rows[-1][0])
+    body = orjson.dumps([{"id": graph_id, "title": title} for graph_id, title in rows])
+    etag = content_etag(body)
+    headers["ETag"] = format_etag(etag)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
-@router.get("/{graph_id}", response_model=GraphDetail)
-def get_graph(graph_id: int, session: Session = Depends(get_session)):
+@router.get("/export")
+def export_graphs(compression: Literal["none", "zstd"] = "none",
+                  session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    """以 NDJSON 流式导出当前用户全部图（首行为格式头）；compression=zstd 时输出 .ndjson.zst 文件"""
+    compress = compression == "zstd"
+    filename = f"aitu-graphs-{current_user.id}.ndjson" + (".zst" if compress else "")
+    return StreamingResponse(iter_export(session.get_bind(), current_user.id, compress),
+                             media_type="application/zstd" if compress else "application/x-ndjson",
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@router.post("/import")
+async def import_graphs(request: Request, session: Session = Depends(get_session),
+                        current_user: User = Depends(get_current_user)):
+    """导入 /graphs/export 的输出（NDJSON，可 zstd 压缩，自动识别）：边读取请求体边按批写入，每张图分配新 id"""
+    zstd = True if request.headers.get("content-encoding", "").lower() == "zstd" else None
+    owner_id = current_user.id  # 每批提交后会话中的对象会过期并被移出
+    result = ImportResult()
+    batch: list[ImportItem] = []
+
+    async def flush() -> None:
+        created = await run_in_threadpool(import_batch, session, owner_id, batch)
+        for graph_id, delta in created:
+            graph_response_cache.invalidate(graph_id)  # SQLite 可能复用已删除图的 id
+            await run_in_threadpool(_index_vectors, owner_id, graph_id, delta)
+        result.imported += len(created)
+        result.ids.extend(graph_id for graph_id, _ in created)
+        batch.clear()
+
+    try:
+        async for line_no, line in iter_lines(request.stream(), zstd):
+            item = parse_line(line_no, line, result)
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= GRAPH_IMPORT_BATCH:
+                await flush()
+    except ImportLineTooLong as exc:
+        raise HTTPException(status_code=413, detail={"message": str(exc), **asdict(result)})
+    except zstandard.ZstdError as exc:
+        raise HTTPException(status_code=400, detail={"message": f"invalid zstd stream: {exc}", **asdict(result)})
+    if batch:
+        await flush()
+    return asdict(result)
+
+@router.get("/{graph_id}/skeleton", response_model=GraphSkeleton)
+def get_graph_skeleton(graph_id: int, session: Session = Depends(get_session),
+                       current_user: User = Depends(get_current_user)):
+    """骨架模式：节点 id、位置、标题与边，正文通过 /nodes 按需分批加载"""
     g = session.get(Graph, graph_id)
-    if not g:
+    if not g or g.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Graph not found")
+    node_rows = session.exec(
+        select(GraphNode.node_id, GraphNode.type, GraphNode.pos_x, GraphNode.pos_y, GraphNode.title, GraphNode.parent_id)
+        .where(GraphNode.graph_id == graph_id).order_by(GraphNode.position)
+    ).all()
+    edge_rows = session.exec(
+        select(GraphEdge.data).where(GraphEdge.graph_id == graph_id).order_by(GraphEdge.position)
+    ).all()
+    nodes = [NodeSkeleton(id=node_id, type=type_, position={"x": x, "y": y}, title=title, parentId=parent_id)
+             for node_id, type_, x, y, title, parent_id in node_rows]
+    return GraphSkeleton(id=graph_id, title=g.title, nodes=nodes, edges=[json.loads(e) for e in edge_rows],
+                         exportedAt=g.exported_at, version=g.version)
+
+@router.get("/{graph_id}/nodes", response_model=list[Any])
+def get_graph_nodes(graph_id: int,
+                    ids: list[str] | None = Query(None, description="按 id 批量获取，可重复传参"),
+                    x_min: float | None = None, y_min: float | None = None,
+                    x_max: float | None = None, y_max: float | None = None,
+                    limit: int = Query(200, ge=1, le=1000),
+                    session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    """按 id 或视口范围分批获取节点完整内容"""
+    g = session.get(Graph, graph_id)
+    if not g or g.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Graph not found")
+    stmt = select(GraphNode.data).where(GraphNode.graph_id == graph_id)
+    if ids:
+        stmt = stmt.where(GraphNode.node_id.in_(ids[:limit]))
+    elif None not in (x_min, y_min, x_max, y_max):
+        stmt = stmt.where(GraphNode.pos_x >= x_min, GraphNode.pos_x <= x_max,
+                          GraphNode.pos_y >= y_min, GraphNode.pos_y <= y_max)
+    else:
+        raise HTTPException(status_code=400, detail="需要 ids 或完整的视口范围 x_min/y_min/x_max/y_max")
+    rows = session.exec(stmt.order_by(GraphNode.position).limit(limit)).all()
+    return [json.loads(data) for data in rows]
+
+@router.post("/{graph_id}/nodes/{node_id}/related", response_model=list[RelatedNode])
+def related_nodes(graph_id: int, node_id: str, body: RelatedQuery | None = None,
+                  session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    """跨主题关联：在当前用户的其它图中查找与该节点语义相近的节点"""
+    g = session.get(Graph, graph_id)
+    if not g or g.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Graph not found")
+    row = session.get(GraphNode, (graph_id, node_id))
+    if row is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    query = body or RelatedQuery()
+    min_score = VECTOR_MIN_SCORE if query.minScore is None else query.minScore
+    hits = vector_indexes.related(current_user.id, graph_id, json.loads(row.data), k=query.k,
+                                  include_same_graph=query.includeSameGraph, min_score=min_score)
+    if not hits:
+        return []
+    graph_titles = dict(session.exec(
+        select(Graph.id, Graph.title).where(Graph.id.in_({h.graph_id for h in hits}), Graph.owner_id == current_user.id)
+    ).all())
+    node_titles = {(gid, nid): title for gid, nid, title in session.exec(
+        select(GraphNode.graph_id, GraphNode.node_id, GraphNode.title)
+        .where(tuple_(GraphNode.graph_id, GraphNode.node_id).in_([(h.graph_id, h.node_id) for h in hits]))
+    ).all()}
+    # 索引中可能残留已删除的图/节点，以数据库为准过滤
+    return [RelatedNode(graphId=h.graph_id, graphTitle=graph_titles[h.graph_id], nodeId=h.node_id,
+                        title=node_titles[(h.graph_id, h.node_id)], score=round(h.score, 4))
+            for h in hits if h.graph_id in graph_titles and (h.graph_id, h.node_id) in node_titles]
+
+@router.get("/{graph_id}", response_model=GraphDetail)
+def get_graph(graph_id: int, request: Request, session: Session = Depends(get_session)):
+    # 先只查版本与摘要：命中 If-None-Match 或响应缓存时不加载整图
+    row = session.exec(select(Graph.version, Graph.content_hash).where(Graph.id == graph_id)).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Graph not found")
-    nodes, edges = unpack_graph(g.data)
-    return GraphDetail(id=(g.id or 0), title=g.title, nodes=nodes, edges=edges, exportedAt=g.exported_at)
+    version, etag = row
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": format_etag(etag), "Vary": "Accept-Encoding"})
+    accept_zstd = accepts_encoding(request.headers.get("accept-encoding"), "zstd")
+    cached = graph_response_cache.get((graph_id, version, accept_zstd))
+    if cached is not None:
+        body, (etag, zstd_encoded) = cached
+        cache_status = "HIT"
+    else:
+        g = session.get(Graph, graph_id)
+        if not g:
+            raise HTTPException(status_code=404, detail="Graph not found")
+        # 直接拼接存储的 nodes/edges 字节，不做 JSON 解析/校验；客户端支持 zstd 时连解压也省去
+        header = {"id": g.id or 0, "title": g.title, "exportedAt": g.exported_at, "version": g.version}
+        body, zstd_encoded = merge_graph_json(header, g.stored, accept_zstd)
+        etag = g.content_hash or graph_etag(g.version, g.title, g.exported_at, g.stored)  # 旧数据没有摘要
+        graph_response_cache.put((graph_id, g.version, accept_zstd), body, (etag, zstd_encoded))
+        cache_status = "MISS"
+    headers = {"ETag": format_etag(etag), "Vary": "Accept-Encoding", "X-Cache": cache_status}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if zstd_encoded:
+        headers["Content-Encoding"] = "zstd"
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.post("/", response_model=GraphDetail, status_code=201)
 def create_graph(body: GraphCreate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
     exported_at = datetime.datetime.utcnow().isoformat()
-    g = Graph(title=body.title, data=pack_graph(body.nodes, body.edges), exported_at=exported_at, owner_id=current_user.id)
+    payload = pack_graph(body.nodes, body.edges)
+    g = Graph(title=body.title, payload=payload, exported_at=exported_at, owner_id=current_user.id,
+              content_hash=graph_etag(0, body.title, exported_at, payload))
     session.add(g)
+    session.flush()
+    delta = sync_graph_rows(session, g.id, body.nodes, body.edges)
+    fulltext.index_delta(session, current_user.id, g.id, delta)
     session.commit()
+    graph_response_cache.invalidate(g.id)  # SQLite 可能复用已删除图的 id
+    _index_vectors(current_user.id, g.id, delta)
     session.refresh(g)
-    return GraphDetail(id=(g.id or 0), title=g.title, nodes=body.nodes, edges=body.edges, exportedAt=exported_at)
+    return GraphDetail(id=(g.id or 0), title=g.title, nodes=body.nodes, edges=body.edges, exportedAt=exported_at,
+                       version=g.version)
 
 @router.put("/{graph_id}", response_model=GraphDetail)
-def update_graph(graph_id: int, body: GraphUpdate, session: Session = Depends(get_session)):
-    g = session.get(Graph, graph_id)
-    if not g:
-        raise HTTPException(status_code=404, detail="Graph not found")
-    exported_at = datetime.datetime.utcnow().isoformat()
-    g.title = body.title
-    g.data = pack_graph(body.nodes, body.edges)
-    g.exported_at = exported_at
-    session.add(g)
-    session.commit()
-    session.refresh(g)
-    return GraphDetail(id=(g.id or 0), title=g.title, nodes=body.nodes, edges=body.edges, exportedAt=exported_at)
+def update_graph(graph_id: int, body: GraphUpdate, session: Session = Depends(get_session),
+                 current_user: User = Depends(get_current_user)):
+    result = _save_graph(session, graph_id, _GraphSave(
+        apply=lambda title, nodes, edges: (body.title, body.nodes, body.edges), expected_version=body.version,
+        message=_snapshot_message, replaces=True, owner_id=current_user.id))
+    return GraphDetail(id=graph_id, title=body.title, nodes=body.nodes, edges=body.edges,
+                       exportedAt=result.exported_at, version=result.version)
+
+@router.patch("/{graph_id}", response_model=GraphPatchResult)
+def patch_graph(graph_id: int, body: GraphPatch, session: Session = Depends(get_session),
+                current_user: User = Depends(get_current_user)):
+    """增量保存：只提交变化的节点/边，基于 version 检测并发冲突（409）"""
+    if body.ops:
+        # JSON Patch 路径按整图广播，订阅者无需实现 RFC 6902
+        message = _snapshot_message
+    else:
+        op = GraphOp(**body.model_dump(include=set(GraphOp.model_fields) - {"type", "op_id"}))
+        changes = {"type": "op", "origin": None, "op_id": None, **op.changes()}
+        message = lambda title, nodes, edges: changes
+    result = _save_graph(session, graph_id, _GraphSave(
+        apply=lambda title, nodes, edges: apply_graph_patch(title, nodes, edges, body),
+        expected_version=body.version, message=message, owner_id=current_user.id))
+    return GraphPatchResult(id=graph_id, title=result.title, version=result.version, exportedAt=result.exported_at)
 
 @router.delete("/{graph_id}")
-def delete_graph(graph_id: int, session: Session = Depends(get_session)):
+def delete_graph(graph_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
     g = session.get(Graph, graph_id)
-    if not g:
+    if not g or g.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Graph not found")
+    delete_graph_rows(session, graph_id)
+    fulltext.drop_graph(session, graph_id)
+    owner_id = g.owner_id
     session.delete(g)
     session.commit()
+    graph_response_cache.invalidate(graph_id)
+    graph_hub.close_graph(graph_id, {"type": "deleted"})
+    if VECTOR_INDEX_ENABLED and owner_id is not None:
+        try:
+            vector_indexes.drop_graph(owner_id, graph_id)
+        except Exception:
+            logger.exception("vector index cleanup failed for graph %s", graph_id)
     return {"id": graph_id, "deleted": True}
+
+
+def _load_for_ws(session: Session, graph_id: int, owner_id: int | None) -> Graph | None:
+    try:
+        g = session.get(Graph, graph_id)
+        return g if g is not None and g.owner_id == owner_id else None
+    finally:
+        session.close()  # 空闲连接不占用数据库连接
+
+
+def _apply_ws_op(session: Session, graph_id: int, op: GraphOp, origin: str) -> int:
+    """把节点/边级变更应用到最新版本并写入（与其他保存合并提交），返回新版本号；图不存在时 404，变更非法时 422"""
+    patch = GraphPatch(version=0, **op.model_dump(exclude={"type", "op_id"}))
+    # 广播（包括发送者本身，作为确认）
+    changes = {"type": "op", "origin": origin, "op_id": op.op_id, **op.changes()}
+    try:
+        return _save_graph(session, graph_id, _GraphSave(
+            apply=lambda title, nodes, edges: apply_graph_patch(title, nodes, edges, patch), expected_version=None,
+            message=lambda title, nodes, edges: changes)).version
+    finally:
+        session.close()
+
+
+async def _send_initial(websocket: WebSocket, sub: Subscriber, g: Graph, since: int | None) -> int:
+    """补发 since 之后的变更；无法补齐（或首次连接）时发送整图快照。在写协程启动前直接发送，返回已发送到的序号"""
+    missed = graph_hub.replay(g.id, since, g.version) if since is not None and since <= g.version else None
+    if missed is None:
+        nodes, edges = unpack_graph(g.stored)
+        await websocket.send_text(encode({"type": "snapshot", "seq": g.version, "title": g.title, "nodes": nodes,
+                                          "edges": edges}))
+    for _, data in missed or []:
+        await websocket.send_text(data)
+    await websocket.send_text(encode({"type": "ready", "seq": g.version, "client_id": sub.id}))
+    return g.version
+
+
+async def _ws_writer(websocket: WebSocket, sub: Subscriber, sent: int) -> None:
+    while True:
+        seq, data, close = await sub.queue.get()
+        if seq is not None and seq <= sent:
+            continue  # 已包含在快照或补发内容中
+        if data is not None:
+            await websocket.send_text(data)
+        if close is not None:
+            await websocket.close(code=close)
+            return
+        if seq is not None:
+            sent = seq
+
+
+async def _ws_reader(websocket: WebSocket, sub: Subscriber, graph_id: int, session: Session) -> None:
+    while True:
+        message = await websocket.receive_json()
+        kind = message.get("type") if isinstance(message, dict) else None
+        if kind == "ping":
+            sub.send({"type": "pong"})
+            continue
+        if kind != "op":
+            sub.send({"type": "error", "detail": f"unknown message type: {kind}"})
+            continue
+        try:
+            op = GraphOp.model_validate(message)
+        except ValidationError as exc:
+            sub.send({"type": "error", "op_id": message.get("op_id"), "detail": exc.errors(include_url=False)})
+            continue
+        try:
+            await run_in_threadpool(_apply_ws_op, session, graph_id, op, sub.id)
+        except HTTPException as exc:
+            sub.send({"type": "error", "op_id": op.op_id, "status": exc.status_code, "detail": exc.detail},
+                     close=CLOSE_NOT_FOUND if exc.status_code == 404 else None)
+
+
+@router.websocket("/{graph_id}/ws")
+async def graph_ws(websocket: WebSocket, graph_id: int, token: str | None = None, since: int | None = None,
+                   session: Session = Depends(get_session)):
+    """实时同步：连接后收到整图快照（或 since 之后的补发）与 ready，随后接收带序号的变更广播；
+    发送 {"type": "op", "op_id", "upsert_nodes", ...} 提交变更。浏览器无法设置请求头，令牌经 ?token= 传递。"""
+    await websocket.accept()
+    user = await user_from_token(token, session)
+    if user is None:
+        await websocket.close(code=CLOSE_UNAUTHORIZED)
+        return
+    # 先订阅再读取当前版本，保证两者之间的变更不会丢失
+    sub = graph_hub.subscribe(graph_id)
+    try:
+        g = await run_in_threadpool(_load_for_ws, session, graph_id, user.id)
+        if g is None:
+            await websocket.close(code=CLOSE_NOT_FOUND)
+            return
+        sent = await _send_initial(websocket, sub, g, since)
+        async with anyio.create_task_group() as tg:
+            async def run_until_closed(loop_fn, *args) -> None:
+                # 读、写任一方结束（断开、关闭或出错）即结束整个连接
+                try:
+                    await loop_fn(websocket, sub, *args)
+                except WebSocketDisconnect:
+                    pass
+                except Exception:
+                    logger.exception("graph %s websocket failed", graph_id)
+                finally:
+                    tg.cancel_scope.cancel()
+
+            tg.start_soon(run_until_closed, _ws_writer, sent)
+            tg.start_soon(run_until_closed, _ws_reader, graph_id, session)
+    finally:
+        graph_hub.unsubscribe(sub)
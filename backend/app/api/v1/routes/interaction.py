@@ -1,25 +1,35 @@
 from __future__ import annotations
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+import logging
+import os
+import threading
+import weakref
+from contextlib import aclosing
+from typing import TYPE_CHECKING
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.params import Depends
-from pydantic import BaseModel
-from langchain.agents import create_agent
-from langgraph.checkpoint.memory import InMemorySaver
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlmodel import Session
 
+from backend.app.core.metrics import span
 from backend.app.core.security import get_current_user
+from backend.app.db.session import get_session
+from backend.app.llm.limiter import ModelBusyError, model_limiter
+from backend.app.llm.quota import QuotaExceededError, usage_ledger
+from backend.app.llm.resilience import CircuitOpenError, UpstreamTimeoutError, upstream_policy
+from backend.app.models.graph import Graph
 from backend.app.models.user import User
+from backend.app.utils.graph_utils import unpack_graph
 
+if TYPE_CHECKING:
+    from backend.app.llm.context import AskContext
 
-
-try:
-    from backend.app.llm.model import SiliconFlowChatModel
-except ImportError as e:
-    msg = repr(e)
-    if ("attempted relative import" in msg) or ("parent package" in msg):
-        from llm.model import SiliconFlowChatModel  # type: ignore
-    else:
-        raise
-
-checkpointer = InMemorySaver()
+logger = logging.getLogger(__name__)
+# agent 依赖的加载时机：background 启动后在后台线程预热（默认）/ startup 加载完成后才开始服务 / off 首次问答时加载
+LLM_PRELOAD = os.getenv("LLM_PRELOAD", "background").lower()
 router = APIRouter(prefix="/interaction", tags=["interaction"])
 
 class AskRequest(BaseModel):
@@ -28,33 +38,327 @@ class AskRequest(BaseModel):
     thread_id: str
     context_thread_id: str | None = None
     context_msg_index: int | None = 0
+    # 提供 graph_id + node_id 时按图谱祖先链组装上下文（受 token 预算约束），取代 context_thread_id 拼接
+    graph_id: int | None = None
+    node_id: str | None = None
+    # 允许复用相同输入的缓存回答（同一批用户的相同延伸提问），并合并并发的相同请求
+    use_cache: bool = False
 
 class AskResponse(BaseModel):
     answer: str
 
-@router.post("/ask", response_model=AskResponse)
-def ask_question(req: AskRequest, current_user: User = Depends(get_current_user)):
+# 单次批量请求的条目上限；同一用户所有批量请求同时在途的条目数
+ASK_BATCH_MAX_ITEMS = int(os.getenv("ASK_BATCH_MAX_ITEMS", "10"))
+ASK_BATCH_USER_CONCURRENCY = int(os.getenv("ASK_BATCH_USER_CONCURRENCY", "3"))
+
+class AskBatchItem(BaseModel):
+    question: str
+    thread_id: str
+    context_thread_id: str | None = None
+    context_msg_index: int | None = 0
+    graph_id: int | None = None
+    node_id: str | None = None
+
+class AskBatchRequest(BaseModel):
+    """知识延伸：一次提交多个分支问题（每个条目对应一个新分支 thread）"""
+    model: str
+    items: list[AskBatchItem] = Field(..., min_length=1, max_length=ASK_BATCH_MAX_ITEMS)
+    use_cache: bool = False
+
+
+def _validate(req: AskRequest) -> None:
     if not req.question.strip():
         raise HTTPException(status_code=400, detail="问题不能为空")
     if not req.thread_id:
         raise HTTPException(status_code=400, detail="缺少 thread_id")
 
-    context_msgs = []
-    if req.context_thread_id:
-        context_config = {"configurable": {"thread_id": req.context_thread_id}}
-        saved = checkpointer.get(context_config)
-        msgs = saved.get("channel_values").get("messages")
-        context_msgs = msgs[req.context_msg_index*2: req.context_msg_index*2+2]
-    
-
-    model = SiliconFlowChatModel(model=current_user.ad_model, api_key=current_user.ad_api_key)
-    agent = create_agent(
-        model=model,
-        tools=[],
-        system_prompt="You are a helpful assistant",
-        checkpointer=checkpointer
-    )
+
+async def _load_branch_context(req: AskRequest, current_user: User, session: Session,
+                               graphs: dict[int, tuple] | None = None) -> AskContext:
+    """graphs 为批量请求内共享的已解包图，同一张图只读取一次"""
+    if graphs is not None and req.graph_id in graphs:
+        nodes, edges = graphs[req.graph_id]
+    else:
+        graph = await run_in_threadpool(session.get, Graph, req.graph_id)
+        if not graph or graph.owner_id != current_user.id:
+            raise HTTPException(status_code=404, detail="Graph not found")
+        nodes, edges = unpack_graph(graph.stored)
+        if graphs is not None:
+            graphs[req.graph_id] = (nodes, edges)
+    from backend.app.llm.context import AskContext, branch_turns
+    return AskContext(branch_turns=branch_turns(nodes, edges, req.node_id, focus_index=req.context_msg_index))
+
+
+async def _load_context_messages(req: AskRequest) -> list:
+    if not req.context_thread_id:
+        return []
+    context_config = {"configurable": {"thread_id": req.context_thread_id}}
+    saved = await _llm().checkpointer.aget(context_config)
+    if not saved:
+        return []
+    msgs = saved.get("channel_values").get("messages")
+    idx = req.context_msg_index or 0
+    return msgs[idx*2: idx*2+2]
+
+
+async def _prepare_context(req: AskRequest, current_user: User, session: Session,
+                           graphs: dict[int, tuple] | None = None) -> tuple[list, AskContext]:
+    if req.graph_id is not None and req.node_id:
+        context_msgs, ask_context = [], await _load_branch_context(req, current_user, session, graphs)
+    else:
+        from backend.app.llm.context import AskContext
+        context_msgs, ask_context = await _load_context_messages(req), AskContext()
+    ask_context.use_cache = req.use_cache
+    ask_context.user_id = current_user.id
+    return context_msgs, ask_context
+
+
+async def _admit(current_user: User) -> float:
+    """请求发往上游前检查当日 token 配额（超出时抛出 QuotaExceededError），返回该用户的调度权重"""
+    policy = await run_in_threadpool(usage_ledger.check, current_user.id, current_user.ad_model or "")
+    return policy.weight
+
+
+def _quota_error(exc: QuotaExceededError) -> HTTPException:
+    return HTTPException(status_code=429, detail=_error_detail(exc), headers={"Retry-After": str(exc.retry_after)})
+
+
+def _llm():
+    """LangChain/LangGraph 与模型客户端（见 llm.agent），首次调用时导入"""
+    from backend.app.llm import agent
+    return agent
+
+
+def _preload_llm() -> None:
+    try:
+        _llm()
+    except Exception:
+        logger.exception("failed to preload LLM dependencies")
+
+
+@router.on_event("startup")
+async def _startup():
+    if LLM_PRELOAD == "startup":
+        _llm()
+    elif LLM_PRELOAD == "background":
+        threading.Thread(target=_preload_llm, name="llm-preload", daemon=True).start()
+
+
+@router.on_event("shutdown")
+async def _shutdown():
+    try:
+        await run_in_threadpool(usage_ledger.flush)
+    except Exception:
+        logger.exception("failed to persist LLM usage on shutdown")
+
+
+def _build_agent(current_user: User):
+    return _llm().agent_cache.get(current_user.id, current_user.ad_model, current_user.ad_api_key)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _error_detail(exc: BaseException) -> str:
+    if isinstance(exc, ModelBusyError):
+        return "模型繁忙，请稍后重试"
+    if isinstance(exc, QuotaExceededError):
+        return "今日 token 配额已用完" if exc.model is None else f"今日 {exc.model} 的 token 配额已用完"
+    if isinstance(exc, CircuitOpenError):
+        return "模型服务暂不可用，请稍后重试"
+    if isinstance(exc, UpstreamTimeoutError):
+        return "模型响应超时，请稍后重试"
+    if isinstance(exc, HTTPException):
+        return str(exc.detail)
+    return "服务内部错误，请稍后重试"
+
+
+# 按用户 id 的批量并发名额；没有在途批量时条目自动回收
+_batch_slots: weakref.WeakValueDictionary[int, asyncio.Semaphore] = weakref.WeakValueDictionary()
+
+
+def _batch_slot(user_id: int) -> asyncio.Semaphore:
+    sem = _batch_slots.get(user_id)
+    if sem is None:
+        sem = _batch_slots[user_id] = asyncio.Semaphore(ASK_BATCH_USER_CONCURRENCY)
+    return sem
+
+
+@router.post("/ask", response_model=AskResponse)
+async def ask_question(req: AskRequest, current_user: User = Depends(get_current_user),
+                       session: Session = Depends(get_session)):
+    _validate(req)
+    try:
+        weight = await _admit(current_user)
+    except QuotaExceededError as exc:
+        raise _quota_error(exc)
+    with span("ask.context"):
+        context_msgs, ask_context = await _prepare_context(req, current_user, session)
+    with span("ask.agent_build"):
+        agent = _build_agent(current_user)
     config = {"configurable": {"thread_id": req.thread_id}}
-    agent_response = agent.invoke({"messages": [*context_msgs, {"role": "user", "content": req.question}]}, config=config)
+    try:
+        async with model_limiter.slot(current_user.ad_model or "", current_user.id, weight):
+            # 含 checkpointer 读写与上游调用，二者分别见 checkpointer.* 与 aitu_llm_request_duration_seconds
+            with span("ask.invoke"):
+                agent_response = await agent.ainvoke(
+                    {"messages": [*context_msgs, {"role": "user", "content": req.question}]},
+                    config=config, context=ask_context)
+    except ModelBusyError:
+        raise HTTPException(status_code=503, detail="模型繁忙，请稍后重试", headers={"Retry-After": "5"})
+    except CircuitOpenError as exc:
+        raise HTTPException(status_code=503, detail="模型服务暂不可用，请稍后重试",
+                            headers={"Retry-After": str(int(exc.retry_after))})
+    except UpstreamTimeoutError:
+        raise HTTPException(status_code=504, detail="模型响应超时，请稍后重试")
     answer = agent_response["messages"][-1].content
     return AskResponse(answer=answer)
+
+
+@router.post("/ask/batch")
+async def ask_batch(batch: AskBatchRequest, request: Request, current_user: User = Depends(get_current_user),
+                    session: Session = Depends(get_session)):
+    """并发回答多个问题，按完成顺序以 SSE 推送；共享同一个 agent，每个条目各自写入自己的 thread。
+
+    事件: result {"index", "thread_id", "answer"} / error {"index", "thread_id", "detail"} /
+    done {"succeeded", "failed"}
+    """
+    reqs = [AskRequest(model=batch.model, use_cache=batch.use_cache, **item.model_dump()) for item in batch.items]
+    for req in reqs:
+        _validate(req)
+    if len({req.thread_id for req in reqs}) != len(reqs):
+        raise HTTPException(status_code=400, detail="thread_id 不能重复")
+    try:
+        await _admit(current_user)
+    except QuotaExceededError as exc:
+        raise _quota_error(exc)
+    # 上下文在返回响应前按顺序准备（共用请求内的数据库会话，同一张图只解包一次）
+    graphs: dict[int, tuple] = {}
+    prepared: list[tuple[list, AskContext] | HTTPException] = []
+    for req in reqs:
+        try:
+            prepared.append(await _prepare_context(req, current_user, session, graphs))
+        except HTTPException as exc:
+            prepared.append(exc)
+    agent = _build_agent(current_user)
+    slots = _batch_slot(current_user.id)
+    model_name = current_user.ad_model or ""
+
+    async def run_one(index: int, req: AskRequest, context_msgs: list, ask_context: AskContext) -> dict:
+        try:
+            async with slots:
+                # 配额在每个条目发往上游前重新检查，批量进行中用完时其余条目失败
+                weight = await _admit(current_user)
+                async with model_limiter.slot(model_name, current_user.id, weight):
+                    response = await agent.ainvoke(
+                        {"messages": [*context_msgs, {"role": "user", "content": req.question}]},
+                        config={"configurable": {"thread_id": req.thread_id}}, context=ask_context)
+            return {"index": index, "thread_id": req.thread_id, "answer": response["messages"][-1].content}
+        except Exception as exc:
+            if not isinstance(exc, (ModelBusyError, QuotaExceededError, CircuitOpenError, UpstreamTimeoutError)):
+                logger.exception("batch ask failed for thread %s", req.thread_id)
+            return {"index": index, "thread_id": req.thread_id, "detail": _error_detail(exc)}
+
+    async def event_stream():
+        failed = 0
+        tasks = []
+        for index, (req, item) in enumerate(zip(reqs, prepared)):
+            if isinstance(item, HTTPException):
+                failed += 1
+                yield _sse("error", {"index": index, "thread_id": req.thread_id, "detail": _error_detail(item)})
+            else:
+                tasks.append(asyncio.create_task(run_one(index, req, *item)))
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                if await request.is_disconnected():
+                    logger.info("client disconnected, cancel remaining batch items")
+                    return
+                failed += "detail" in result
+                yield _sse("error" if "detail" in result else "result", result)
+            yield _sse("done", {"succeeded": len(reqs) - failed, "failed": failed})
+        finally:
+            # 客户端断开或生成器被关闭时取消尚未完成的条目
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/cache/stats")
+async def completion_cache_stats(current_user: User = Depends(get_current_user)):
+    """回答缓存的命中率、节省的 token 与耗时统计（当前进程）"""
+    from backend.app.llm.completion_cache import completion_cache
+    return completion_cache.stats()
+
+
+@router.get("/usage")
+async def usage_report(current_user: User = Depends(get_current_user)):
+    """当前用户当日（UTC）的 token 用量、配额与调度权重；用量每隔数秒写库，多 worker 时略有延迟"""
+    return await run_in_threadpool(usage_ledger.report, current_user.id)
+
+
+@router.get("/upstream/stats")
+async def upstream_stats(current_user: User = Depends(get_current_user)):
+    """上游调用策略统计：重试、超时、对冲、熔断状态与各模型 p95 耗时（当前进程）"""
+    return upstream_policy.stats()
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(req: AskRequest, request: Request, current_user: User = Depends(get_current_user),
+                              session: Session = Depends(get_session)):
+    """以 SSE 逐 token 推送回答；完整轮次仍由 agent 写入 checkpointer。
+
+    事件: token {"content"} / done {"answer"} / error {"detail"}
+    """
+    _validate(req)
+    try:
+        weight = await _admit(current_user)
+    except QuotaExceededError as exc:
+        raise _quota_error(exc)
+    with span("ask.context"):
+        context_msgs, ask_context = await _prepare_context(req, current_user, session)
+    with span("ask.agent_build"):
+        agent = _build_agent(current_user)
+    config = {"configurable": {"thread_id": req.thread_id}}
+    payload = {"messages": [*context_msgs, {"role": "user", "content": req.question}]}
+
+    async def event_stream():
+        parts: list[str] = []
+        try:
+            # 名额在生成器内获取/释放，客户端提前断开时也不会泄漏
+            async with model_limiter.slot(current_user.ad_model or "", current_user.id, weight):
+                # aclosing 保证提前退出时关闭图的执行，从而取消上游生成
+                async with aclosing(agent.astream(payload, config=config, context=ask_context,
+                                                      stream_mode="messages")) as stream:
+                    async for chunk, metadata in stream:
+                        if await request.is_disconnected():
+                            logger.info("client disconnected, cancel generation for thread %s", req.thread_id)
+                            return
+                        if metadata.get("langgraph_node") != "model":
+                            continue
+                        text = chunk.content if isinstance(chunk.content, str) else ""
+                        if text:
+                            parts.append(text)
+                            yield _sse("token", {"content": text})
+            yield _sse("done", {"answer": "".join(parts)})
+        except ModelBusyError:
+            yield _sse("error", {"detail": "模型繁忙，请稍后重试"})
+        except CircuitOpenError:
+            yield _sse("error", {"detail": "模型服务暂不可用，请稍后重试"})
+        except UpstreamTimeoutError:
+            yield _sse("error", {"detail": "模型响应超时，请稍后重试"})
+        except Exception:
+            logger.exception("stream ask failed for thread %s", req.thread_id)
+            yield _sse("error", {"detail": "服务内部错误，请稍后重试"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
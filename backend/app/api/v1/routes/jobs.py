@@ -0,0 +1,113 @@
+import logging
+import os
+import threading
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from backend.app.core.metrics import registry
+from backend.app.core.security import get_current_user
+from backend.app.db.base import engine
+from backend.app.db.session import get_session
+from backend.app.jobs import queue, tasks, worker  # noqa: F401  tasks 注册处理函数
+from backend.app.models.graph import Graph
+from backend.app.models.job import Job
+from backend.app.models.user import User
+from backend.app.schemas.job import JobCreate, JobStatus
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+# 任务数指标的刷新间隔（秒）
+JOB_METRICS_TTL = float(os.getenv("JOB_METRICS_TTL", "5"))
+
+@router.on_event("startup")
+async def _startup():
+    worker.start_in_process(engine)
+
+@router.on_event("shutdown")
+async def _shutdown():
+    await worker.stop_in_process()
+
+class JobCounts:
+    """/metrics 抓取运行在事件循环上，不在其中查库：返回最近一次的计数，过期时在后台线程刷新"""
+
+    def __init__(self, engine: Engine | None = None, ttl: float = JOB_METRICS_TTL):
+        self._engine = engine
+        self.ttl = ttl
+        self._counts = {"queued": 0, "running": 0}
+        self._updated = float("-inf")
+        self._refreshing = threading.Lock()
+
+    @property
+    def engine(self) -> Engine:
+        return self._engine if self._engine is not None else engine
+
+    def reset(self, engine: Engine | None = None) -> None:
+        """切换数据库并清空计数（测试使用）"""
+        self._engine = engine
+        self._counts = {"queued": 0, "running": 0}
+        self._updated = float("-inf")
+
+    def refresh(self) -> None:
+        with Session(self.engine) as session:
+            rows = session.exec(select(Job.status, func.count()).where(Job.status.in_(("queued", "running")))
+                                .group_by(Job.status)).all()
+        self._counts = {"queued": 0, "running": 0, **dict(rows)}
+        self._updated = time.monotonic()
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("failed to count jobs for metrics")
+        finally:
+            self._refreshing.release()
+
+    def collect(self):
+        if time.monotonic() - self._updated > self.ttl and self._refreshing.acquire(blocking=False):
+            threading.Thread(target=self._refresh_in_background, name="job-metrics", daemon=True).start()
+        yield "aitu_jobs", "gauge", "Background jobs by status", [({"status": s}, n) for s, n in self._counts.items()]
+
+job_counts = JobCounts()
+registry.register_collector(job_counts.collect)
+
+def _own_job(session: Session, job_id: int, current_user: User) -> Job:
+    job = session.get(Job, job_id)
+    if job is None or job.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("", response_model=JobStatus, status_code=202)
+def create_job(body: JobCreate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    """提交后台任务，立即返回任务状态；通过 GET /jobs/{id} 查询进度与结果"""
+    handler = queue.get_handler(body.kind)
+    if handler is None or not handler.user_submittable:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {body.kind}")
+    if body.kind == "summarize_graph":
+        graph = session.get(Graph, body.payload.get("graph_id"))
+        if graph is None or graph.owner_id != current_user.id:
+            raise HTTPException(status_code=404, detail="Graph not found")
+    job = queue.enqueue(session, body.kind, body.payload, owner_id=current_user.id)
+    worker.wake()
+    return JobStatus.from_job(job)
+
+@router.get("", response_model=list[JobStatus])
+def list_jobs(limit: int = Query(20, ge=1, le=100), session: Session = Depends(get_session),
+              current_user: User = Depends(get_current_user)):
+    jobs = session.exec(select(Job).where(Job.owner_id == current_user.id).order_by(Job.id.desc()).limit(limit)).all()
+    return [JobStatus.from_job(job) for job in jobs]
+
+@router.get("/{job_id}", response_model=JobStatus)
+def get_job(job_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    return JobStatus.from_job(_own_job(session, job_id, current_user))
+
+@router.post("/{job_id}/cancel", response_model=JobStatus)
+def cancel_job(job_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    """排队中的任务立即取消；运行中的任务在下次汇报进度时停止"""
+    job = _own_job(session, job_id, current_user)
+    if job.status not in queue.FINISHED:
+        job = queue.request_cancel(session, job)
+    return JobStatus.from_job(job)
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import tuple_
+from sqlmodel import Session, select
+
+from backend.app.core.security import get_current_user
+from backend.app.db.session import get_session
+from backend.app.models.graph import Graph, GraphNode
+from backend.app.models.user import User
+from backend.app.schemas.search import SearchHit
+from backend.app.search import fulltext
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("", response_model=list[SearchHit])
+def search_nodes(q: str = Query(..., min_length=1, max_length=200),
+                 limit: int = Query(20, ge=1, le=100),
+                 graph_id: int | None = Query(None, description="只在指定图内检索"),
+                 session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    """在当前用户所有图的节点问答中全文检索，按相关度返回带摘要的结果"""
+    hits = fulltext.search(session, current_user.id, q, limit=limit, graph_id=graph_id)
+    if not hits:
+        return []
+    graph_titles = dict(session.exec(select(Graph.id, Graph.title).where(Graph.id.in_({h.graph_id for h in hits}))).all())
+    node_titles = {(gid, nid): title for gid, nid, title in session.exec(
+        select(GraphNode.graph_id, GraphNode.node_id, GraphNode.title)
+        .where(tuple_(GraphNode.graph_id, GraphNode.node_id).in_([(h.graph_id, h.node_id) for h in hits]))
+    ).all()}
+    results = []
+    for h in hits:
+        snippet, spans = fulltext.make_snippet(h.body, q)
+        results.append(SearchHit(graphId=h.graph_id, graphTitle=graph_titles.get(h.graph_id, ""), nodeId=h.node_id,
+                                 title=node_titles.get((h.graph_id, h.node_id)), snippet=snippet,
+                                 highlights=[list(span) for span in spans], score=round(float(h.score), 4)))
+    return results
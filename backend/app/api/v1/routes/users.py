@@ -1,6 +1,7 @@
 from __future__ import annotations
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session, select
 
 from backend.app.core.security import create_access_token
@@ -10,9 +11,19 @@ from backend.app.api.deps import get_db
 from backend.app.models.user import User
 from backend.app.schemas.user import UserPublic, UserTokenLookup, UserCredentialUpdate, UserLogin
 from backend.app.crud.user import authenticate_user, register_user
+from backend.app.core.hashing import PasswordHasherBusy, password_hasher
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+@router.on_event("shutdown")
+def _shutdown():
+    password_hasher.shutdown()
+
+def _hasher_busy() -> HTTPException:
+    # 哈希进程池排满：快速拒绝，避免登录高峰拖垮整个 worker
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="服务繁忙，请稍后重试",
+                         headers={"Retry-After": "1"})
+
 @router.get("/token/{token}", response_model=UserTokenLookup)
 def get_user_id_by_token(token: str, session: Session = Depends(get_db)):
     cleaned_token = token.strip()
@@ -22,11 +33,15 @@ def get_user_id_by_token(token: str, session: Session = Depends(get_db)):
     return UserTokenLookup(id=user.id or 0)
 
 @router.put("/{user_id}/register/", response_model=UserPublic)
-def update_credentials(user_id: int, body: UserCredentialUpdate, response: Response, session: Session = Depends(get_db)):
-    user = session.get(User, user_id)
+async def update_credentials(user_id: int, body: UserCredentialUpdate, response: Response,
+                             session: Session = Depends(get_db)):
+    user = await run_in_threadpool(session.get, User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    register_user(user, body.user_name, body.password, session)
+    try:
+        await register_user(user, body.user_name, body.password, session)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
     access_token = create_access_token(data={"sub": user.user_name}, expires_delta=timedelta(minutes=30))
     response.headers["Authorization"] = f"Bearer {access_token}"
     response.headers["X-Access-Token"] = access_token
@@ -34,8 +49,11 @@ def update_credentials(user_id: int, body: UserCredentialUpdate, response: Respo
                       ad_api_key=user.ad_api_key, ad_model=user.ad_model)
 
 @router.post("/login/", response_model=UserPublic)
-def login(body: UserLogin, response: Response, session: Session = Depends(get_db)):
-    user = authenticate_user(body.user_name, body.password, session)
+async def login(body: UserLogin, response: Response, session: Session = Depends(get_db)):
+    try:
+        user = await authenticate_user(body.user_name, body.password, session)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
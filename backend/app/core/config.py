@@ -1,11 +1,52 @@
-from pydantic_settings import BaseSettings
+"""启动配置：加载 .env 并集中校验环境变量（由应用启动钩子调用，导入本模块无副作用）"""
+import logging
+import os
+from pathlib import Path
 
-class Settings(BaseSettings):
-    database_url: str | None = None
-    secret_key: str = "change-me"
-    access_token_expire_minutes: int = 30
+from dotenv import load_dotenv
 
-    class Config:
-        env_file = ".env"
+logger = logging.getLogger(__name__)
 
-settings = Settings()
+
+class ConfigError(RuntimeError):
+    pass
+
+
+# 取值受限的环境变量：(变量, 默认值, 允许的取值)；默认值与各读取处一致
+_CHOICES = (
+    ("CHECKPOINTER_BACKEND", "sql", ("sql", "memory")),
+    ("JOB_WORKER", "inprocess", ("inprocess", "off")),
+    ("LLM_PRELOAD", "background", ("background", "startup", "off")),
+)
+
+
+def load_env_files() -> None:
+    """加载 backend/app/llm/.env（兼容旧路径 <cwd>/backend/llm/.env）；已存在的环境变量不覆盖"""
+    path = Path(__file__).resolve().parent.parent / "llm" / ".env"
+    if not path.exists():
+        # 容器内可能在 /app 工作目录下
+        path = Path.cwd() / "backend" / "llm" / ".env"
+    if path.exists():
+        load_dotenv(path)
+
+
+def validate_settings() -> list[str]:
+    """启动时集中校验配置：取值非法时抛出 ConfigError（worker 不会带着错误配置开始服务），
+    不影响启动但需要注意的问题作为警告返回"""
+    errors, warnings = [], []
+    for name, default, choices in _CHOICES:
+        value = os.getenv(name, default).lower()
+        if value not in choices:
+            errors.append(f"{name}={value!r}, expected one of {', '.join(choices)}")
+    if not os.getenv("SILICONFLOW_API_KEY"):
+        warnings.append("SILICONFLOW_API_KEY is not set; asks from users without their own API key will fail. "
+                        "Create backend/app/llm/.env from .env.example and set the key.")
+    if errors:
+        raise ConfigError("Invalid configuration: " + "; ".join(errors))
+    return warnings
+
+
+def check_settings() -> None:
+    """应用启动钩子：校验失败时中止启动，警告写入日志"""
+    for warning in validate_settings():
+        logger.warning(warning)
@@ -0,0 +1,300 @@
+"""进程内指标与 Prometheus 文本格式导出（/metrics）。
+
+- Counter / Gauge / Histogram：按标签聚合，线程安全
+- span(name)：代码段耗时，记入 aitu_span_duration_seconds{span=...}
+- register_collector / stats_collector：抓取时再读取的派生指标（连接池、各类缓存统计等）
+- MetricsMiddleware：ASGI 中间件，按路由模板统计请求数、耗时与响应大小（流式响应计到最后一个 chunk）
+"""
+from __future__ import annotations
+import bisect
+import functools
+import inspect
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator
+
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+
+logger = logging.getLogger(__name__)
+
+# 设置后 /metrics 需携带 Authorization: Bearer <METRICS_TOKEN>
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or None
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+Sample = tuple[str, dict[str, str], float]  # (名称后缀, 标签, 值)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], Any] = {}
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: tuple[str, ...]) -> dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> list[Sample]:
+        with self._lock:
+            return [("", self._labels(k), v) for k, v in self._values.items()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels: Any) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def samples(self) -> list[Sample]:
+        out: list[Sample] = []
+        with self._lock:
+            items = [(k, [list(v[0]), v[1], v[2]]) for k, v in self._values.items()]
+        for key, (counts, total, count) in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, n in zip((*self.buckets, math.inf), counts):
+                cumulative += n
+                out.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            out.append(("_sum", labels, total))
+            out.append(("_count", labels, count))
+        return out
+
+
+# 抓取时调用，返回 (名称, 类型, 说明, [(标签, 值)])
+Collector = Callable[[], Iterable[tuple[str, str, str, list[tuple[dict[str, str], float]]]]]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Collector] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing  # 模块重复导入时复用
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def register_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: list[str] = []
+
+        def family(name: str, type_: str, help: str, samples: Iterable[Sample]) -> None:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type_}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+
+        for metric in list(self._metrics.values()):
+            family(metric.name, metric.type, metric.help, metric.samples())
+        for collector in self._collectors:
+            try:
+                for name, type_, help, values in collector():
+                    family(name, type_, help, [("", labels, value) for labels, value in values])
+            except Exception:
+                logger.exception("metrics collector failed")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+SPAN_SECONDS = registry.histogram("aitu_span_duration_seconds", "Duration of instrumented code sections", ["span"])
+HTTP_REQUESTS = registry.counter("aitu_http_requests_total", "HTTP requests", ["method", "route", "status"])
+HTTP_SECONDS = registry.histogram("aitu_http_request_duration_seconds", "HTTP request latency (until last body chunk)",
+                                  ["method", "route"])
+HTTP_RESPONSE_BYTES = registry.histogram("aitu_http_response_size_bytes", "HTTP response body size", ["route"],
+                                         buckets=SIZE_BUCKETS)
+HTTP_IN_FLIGHT = registry.gauge("aitu_http_requests_in_flight", "HTTP requests currently being served")
+DB_QUERY_SECONDS = registry.histogram("aitu_db_query_duration_seconds", "SQL statement execution time", ["op"])
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_SECONDS.observe(time.perf_counter() - started, span=name)
+
+
+def timed(name: str):
+    """函数耗时记为 span（支持同步与异步函数）"""
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def stats_collector(prefix: str, stats: Callable[[], dict[str, Any]], help: str) -> None:
+    """把 stats() 返回的数值项导出为 aitu_<prefix>_<key> 仪表盘；非数值项忽略"""
+    def collect():
+        for key, value in stats().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield f"aitu_{prefix}_{key}", "gauge", f"{help}: {key}", [({}, float(value))]
+    registry.register_collector(collect)
+
+
+def instrument_engine(engine) -> None:
+    """SQL 语句耗时直方图 + 连接池状态"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("aitu_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("aitu_query_start")
+        if starts:
+            op = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            DB_QUERY_SECONDS.observe(time.perf_counter() - starts.pop(), op=op if op.isalpha() else "OTHER")
+
+    def collect_pool():
+        pool = engine.pool
+        for attr, help in (("size", "configured pool size"), ("checkedout", "connections in use"),
+                           ("checkedin", "idle connections"), ("overflow", "overflow connections")):
+            getter = getattr(pool, attr, None)
+            if callable(getter):
+                yield f"aitu_db_pool_{attr}", "gauge", f"SQLAlchemy pool {help}", [({}, float(getter()))]
+    registry.register_collector(collect_pool)
+
+
+def _route_template(scope: dict) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """纯 ASGI 实现，不缓冲响应，SSE 等流式响应不受影响"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        state = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.inc(-1)
+            route = _route_template(scope)
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(state["status"]))
+            HTTP_SECONDS.observe(time.perf_counter() - started, method=method, route=route)
+            HTTP_RESPONSE_BYTES.observe(state["bytes"], route=route)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response(status_code=401)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,9 +1,11 @@
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.concurrency import run_in_threadpool
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
+from backend.app.core.metrics import span
+from backend.app.core.user_cache import user_cache
 from backend.app.crud.user import get_user_by_username
 from backend.app.db.session import get_session
 
@@ -11,7 +13,6 @@ from backend.app.db.session import get_session
 SECRET_KEY = "IloveGinJin"
 ALGORITHM = "HS256"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     """创建访问令牌 (JWT)"""
@@ -24,27 +25,41 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+async def user_from_token(token: str | None, session):
+    """解析令牌并返回对应用户（命中缓存时不查询数据库）；令牌无效或用户不存在时返回 None"""
+    if not token:
+        return None
+    try:
+        with span("auth.decode"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={'verify_exp': False})
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+    # 同步查询放到线程池，避免阻塞事件循环
+    with span("auth.lookup"):
+        user = await run_in_threadpool(get_user_by_username, username, session)
+    if user is not None:
+        user_cache.put(username, user)
+    return user
+
 async def get_current_user(
     token = Depends(oauth2_scheme),
-    session = Depends(get_session)  # 注入数据库会话
+    session = Depends(get_session)  # 注入数据库会话；与路由中的 Depends(get_session) 为同一请求内的同一会话
 ):
     """通过令牌获取当前用户"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={'verify_exp': False})
-        username = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-
-    user = get_user_by_username(username, session)
+    user = await user_from_token(token, session)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 if __name__ == "__main__":
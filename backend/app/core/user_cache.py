@@ -0,0 +1,68 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from backend.app.core.metrics import stats_collector
+from backend.app.models.user import User
+
+# 已认证用户缓存：条目上限（LRU）与有效期（秒）。多 worker 部署时其它进程最迟在 TTL 后看到变更
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+
+
+class UserCache:
+    """按令牌 sub（用户名）缓存用户记录，避免每个请求都查询 user 表。
+
+    缓存的是字段快照，每次返回新的未绑定会话的 User 实例，路由中修改不会互相影响。
+    """
+
+    def __init__(self, maxsize: int = AUTH_USER_CACHE_SIZE, ttl: float = AUTH_USER_CACHE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> User | None:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or self._clock() - entry[1] > self.ttl:
+                self._entries.pop(username, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return User(**entry[0])
+
+    def put(self, username: str, user: User) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[username] = (user.model_dump(), self._clock())
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *usernames: str | None) -> None:
+        with self._lock:
+            for username in usernames:
+                if username is not None:
+                    self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+user_cache = UserCache()
+stats_collector("user_cache", lambda: {"entries": len(user_cache), "hits": user_cache.hits, "misses": user_cache.misses},
+                "Authenticated user cache")
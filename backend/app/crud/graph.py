@@ -0,0 +1,178 @@
+from __future__ import annotations
+import datetime
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+import jsonpatch
+import xxhash
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from backend.app.models.graph import GraphEdge, GraphNode
+from backend.app.schemas.graph import GraphPatch
+from backend.app.utils.http_cache import content_etag
+
+
+class GraphPatchError(ValueError):
+    pass
+
+
+def graph_etag(version: int, title: str, exported_at: str, stored: str | bytes | None) -> str:
+    """整图响应的 ETag，写入时计算并存入 Graph.content_hash"""
+    return content_etag(str(version), title, exported_at, stored)
+
+
+def _upsert(items: List[Any], updates: List[Any], kind: str) -> List[Any]:
+    index = {item.get("id"): pos for pos, item in enumerate(items) if isinstance(item, dict)}
+    result = list(items)
+    for update in updates:
+        if not isinstance(update, dict) or update.get("id") is None:
+            raise GraphPatchError(f"{kind} upsert requires an object with 'id'")
+        pos = index.get(update["id"])
+        if pos is None:
+            index[update["id"]] = len(result)
+            result.append(update)
+        else:
+            result[pos] = update
+    return result
+
+
+def apply_graph_patch(title: str, nodes: List[Any], edges: List[Any],
+                      patch: GraphPatch) -> Tuple[str, List[Any], List[Any]]:
+    """把增量修改应用到图数据上，返回新的 (title, nodes, edges)"""
+    if patch.ops:
+        try:
+            doc = jsonpatch.apply_patch({"title": title, "nodes": nodes, "edges": edges}, patch.ops)
+        except (jsonpatch.JsonPatchException, jsonpatch.JsonPointerException) as exc:
+            raise GraphPatchError(str(exc)) from exc
+        if not isinstance(doc, dict):
+            raise GraphPatchError("patched document must be an object")
+        title, nodes, edges = doc.get("title", title), doc.get("nodes", []), doc.get("edges", [])
+        if not isinstance(title, str) or not title:
+            raise GraphPatchError("title must be a non-empty string")
+        if not isinstance(nodes, list) or not isinstance(edges, list):
+            raise GraphPatchError("nodes and edges must be arrays")
+
+    if patch.title is not None:
+        title = patch.title
+    if patch.delete_nodes:
+        removed = set(patch.delete_nodes)
+        nodes = [n for n in nodes if not (isinstance(n, dict) and n.get("id") in removed)]
+        # 删除节点时一并删除与之相连的边
+        edges = [e for e in edges
+                 if not (isinstance(e, dict) and (e.get("source") in removed or e.get("target") in removed))]
+    if patch.delete_edges:
+        removed = set(patch.delete_edges)
+        edges = [e for e in edges if not (isinstance(e, dict) and e.get("id") in removed)]
+    if patch.upsert_nodes:
+        nodes = _upsert(nodes, patch.upsert_nodes, "node")
+    if patch.upsert_edges:
+        edges = _upsert(edges, patch.upsert_edges, "edge")
+    return title, nodes, edges
+
+
+@dataclass
+class GraphDelta:
+    """一次同步中实际变化的节点，供搜索/向量索引等增量更新使用"""
+    upserted_nodes: List[dict] = field(default_factory=list)
+    deleted_node_ids: List[str] = field(default_factory=list)
+
+
+def _dump(item: Any) -> str:
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+
+
+def node_content_hash(node: dict) -> str:
+    return xxhash.xxh3_64_hexdigest(_dump([node.get("type"), node.get("data")]))
+
+
+def node_position(node: dict) -> tuple[float, float]:
+    position = node.get("position") or {}
+    try:
+        return float(position.get("x") or 0), float(position.get("y") or 0)
+    except (TypeError, ValueError, AttributeError):
+        return 0.0, 0.0
+
+
+def node_title(node: dict) -> str | None:
+    context = (node.get("data") or {}).get("context") or []
+    if context and isinstance(context[0], dict) and context[0].get("question"):
+        return str(context[0]["question"])[:200]
+    return None
+
+
+def parent_map(edges: List[Any]) -> Dict[str, str]:
+    """target -> source；id 统一为字符串（与 graph_node.node_id 一致，前端可能使用数字 id）"""
+    parents: Dict[str, str] = {}
+    for e in edges:
+        if isinstance(e, dict) and e.get("target") is not None and e.get("source") is not None:
+            parents.setdefault(str(e["target"]), str(e["source"]))
+    return parents
+
+
+def sync_graph_rows(session: Session, graph_id: int, nodes: List[Any], edges: List[Any]) -> GraphDelta:
+    """把 nodes/edges 同步到 graph_node / graph_edge，只写入有变化的行；由调用方提交事务"""
+    now = datetime.datetime.utcnow().isoformat()
+    delta = GraphDelta()
+    parents = parent_map(edges)
+
+    existing = {row.node_id: row for row in session.exec(select(GraphNode).where(GraphNode.graph_id == graph_id))}
+    seen: set[str] = set()
+    for position, node in enumerate(nodes):
+        if not isinstance(node, dict) or node.get("id") is None:
+            continue
+        node_id = str(node["id"])
+        if node_id in seen:
+            continue
+        seen.add(node_id)
+        data = _dump(node)
+        digest = node_content_hash(node)
+        parent_id = parents.get(node_id)
+        pos_x, pos_y = node_position(node)
+        row = existing.get(node_id)
+        if row is None:
+            session.add(GraphNode(graph_id=graph_id, node_id=node_id, position=position, parent_id=parent_id,
+                                  type=node.get("type"), title=node_title(node), pos_x=pos_x, pos_y=pos_y,
+                                  data=data, content_hash=digest, created_at=now, updated_at=now))
+            delta.upserted_nodes.append(node)
+        elif row.data != data or (row.position, row.parent_id) != (position, parent_id):
+            if row.content_hash != digest:
+                row.type, row.title, row.content_hash, row.updated_at = node.get("type"), node_title(node), digest, now
+                delta.upserted_nodes.append(node)
+            # 仅位置/顺序/父子关系变化时不算内容更新
+            row.position, row.parent_id, row.pos_x, row.pos_y, row.data = position, parent_id, pos_x, pos_y, data
+            session.add(row)
+    delta.deleted_node_ids = [node_id for node_id in existing if node_id not in seen]
+    if delta.deleted_node_ids:
+        session.exec(delete(GraphNode).where(GraphNode.graph_id == graph_id,
+                                             GraphNode.node_id.in_(delta.deleted_node_ids)))
+
+    existing_edges = {row.edge_id: row for row in session.exec(select(GraphEdge).where(GraphEdge.graph_id == graph_id))}
+    seen_edges: set[str] = set()
+    for position, edge in enumerate(edges):
+        if not isinstance(edge, dict):
+            continue
+        edge_id = str(edge.get("id") or f"{edge.get('source')}-{edge.get('target')}")
+        if edge_id in seen_edges:
+            continue
+        seen_edges.add(edge_id)
+        data = _dump(edge)
+        digest = xxhash.xxh3_64_hexdigest(data)
+        row = existing_edges.get(edge_id)
+        if row is None:
+            session.add(GraphEdge(graph_id=graph_id, edge_id=edge_id, position=position, source=edge.get("source"),
+                                  target=edge.get("target"), data=data, content_hash=digest))
+        elif row.content_hash != digest or row.position != position:
+            row.position, row.source, row.target = position, edge.get("source"), edge.get("target")
+            row.data, row.content_hash = data, digest
+            session.add(row)
+    stale_edges = [edge_id for edge_id in existing_edges if edge_id not in seen_edges]
+    if stale_edges:
+        session.exec(delete(GraphEdge).where(GraphEdge.graph_id == graph_id, GraphEdge.edge_id.in_(stale_edges)))
+    return delta
+
+
+def delete_graph_rows(session: Session, graph_id: int) -> None:
+    session.exec(delete(GraphEdge).where(GraphEdge.graph_id == graph_id))
+    session.exec(delete(GraphNode).where(GraphNode.graph_id == graph_id))
@@ -0,0 +1,174 @@
+"""工作区整体导出/导入（NDJSON，可选 zstd）。
+
+导出：首行为格式头 {"format": "aitu-graphs", ...}，其后每行一张图
+{"id", "title", "exportedAt", "version", "nodes", "edges"}；按 id 分批从数据库游标读取，
+图数据直接由存储字节拼接（不解析），内存占用与工作区大小无关。
+导入：逐块读取请求体、按行解析，每 GRAPH_IMPORT_BATCH 张图一个事务写入（分配新 id，归属当前用户）。
+"""
+from __future__ import annotations
+import datetime
+import os
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Iterator
+
+import orjson
+import zstandard
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from backend.app.crud.graph import GraphDelta, graph_etag, sync_graph_rows
+from backend.app.models.graph import Graph
+from backend.app.search import fulltext
+from backend.app.utils.graph_utils import GRAPH_ZSTD_LEVEL, merge_graph_json, pack_graph
+
+_env = os.getenv
+# 导出时每次从游标取出的行数；导入时每个事务写入的图数
+GRAPH_EXPORT_BATCH = int(_env("GRAPH_EXPORT_BATCH", "200"))
+GRAPH_IMPORT_BATCH = int(_env("GRAPH_IMPORT_BATCH", "200"))
+# 导入时单行（单张图）的字节上限
+GRAPH_IMPORT_MAX_LINE = int(_env("GRAPH_IMPORT_MAX_LINE", str(64 * 1024 * 1024)))
+# zstd 输入每次送入解压器的字节数：每个 zstd 块头至少 3 字节、块输出至多 128KB，
+# 每步的解压输出因此有上限（约 GRAPH_IMPORT_ZSTD_STEP / 3 * 128KB），压缩炸弹在单次调用内无法展开到任意大
+GRAPH_IMPORT_ZSTD_STEP = int(_env("GRAPH_IMPORT_ZSTD_STEP", "256"))
+# 导入结果中最多返回的错误条数
+GRAPH_IMPORT_MAX_ERRORS = 100
+
+EXPORT_FORMAT = "aitu-graphs"
+EXPORT_FORMAT_VERSION = 1
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class ImportLineTooLong(ValueError):
+    pass
+
+
+def export_line(graph_id: int, title: str, exported_at: str, version: int, stored: str | bytes | None) -> bytes:
+    header = {"id": graph_id, "title": title, "exportedAt": exported_at, "version": version}
+    body, _ = merge_graph_json(header, stored)
+    return body + b"\n"
+
+
+def iter_export(engine: Engine, owner_id: int, compress: bool = False) -> Iterator[bytes]:
+    """逐批产出导出内容；自建会话（StreamingResponse 迭代时请求依赖的会话已关闭）"""
+    cobj = zstandard.ZstdCompressor(level=GRAPH_ZSTD_LEVEL).compressobj() if compress else None
+
+    def emit(chunk: bytes) -> bytes:
+        if cobj is None:
+            return chunk
+        # 每批结束刷出一个 zstd 块，接收端可边下载边解压
+        return cobj.compress(chunk) + cobj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    header = {"format": EXPORT_FORMAT, "version": EXPORT_FORMAT_VERSION,
+              "exportedAt": datetime.datetime.utcnow().isoformat()}
+    yield emit(orjson.dumps(header) + b"\n")
+    stmt = (select(Graph.id, Graph.title, Graph.exported_at, Graph.version, Graph.payload, Graph.data)
+            .where(Graph.owner_id == owner_id).order_by(Graph.id)
+            .execution_options(yield_per=GRAPH_EXPORT_BATCH))
+    with Session(engine) as session:
+        for partition in session.exec(stmt).partitions():
+            yield emit(b"".join(export_line(graph_id, title, exported_at, version,
+                                            payload if payload is not None else data)
+                                for graph_id, title, exported_at, version, payload, data in partition))
+    if cobj is not None:
+        yield cobj.flush()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], zstd: bool | None = None,
+                     max_line: int = GRAPH_IMPORT_MAX_LINE) -> AsyncIterator[tuple[int, bytes]]:
+    """把请求体块流切分为 (行号, 行)；zstd 为 None 时按帧头自动识别压缩"""
+    dobj = None
+    buffer = bytearray()
+    line_no = 0
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if zstd is None:
+            zstd = bytes(chunk[:4]) == ZSTD_MAGIC
+        if zstd:
+            if dobj is None:
+                dobj = zstandard.ZstdDecompressor().decompressobj(read_across_frames=True)
+            view = memoryview(chunk)
+            steps = (dobj.decompress(view[i:i + GRAPH_IMPORT_ZSTD_STEP])
+                     for i in range(0, len(view), GRAPH_IMPORT_ZSTD_STEP))
+        else:
+            steps = (chunk,)
+        # 每一步之后立即切行并检查行长，缓冲区不超过 max_line 加一步的输出
+        for step in steps:
+            buffer += step
+            start = 0
+            while (end := buffer.find(b"\n", start)) != -1:
+                line_no += 1
+                yield line_no, bytes(buffer[start:end])
+                start = end + 1
+            del buffer[:start]
+            if len(buffer) > max_line:
+                raise ImportLineTooLong(f"line {line_no + 1} exceeds {max_line} bytes")
+    if buffer.strip():
+        yield line_no + 1, bytes(buffer)
+
+
+@dataclass
+class ImportItem:
+    line: int
+    title: str
+    exported_at: str
+    nodes: list[Any]
+    edges: list[Any]
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    skipped: int = 0
+    ids: list[int] = field(default_factory=list)
+    errors: list[dict] = field(default_factory=list)
+
+    def error(self, line: int, detail: str) -> None:
+        self.skipped += 1
+        if len(self.errors) < GRAPH_IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "detail": detail})
+
+
+def parse_line(line_no: int, line: bytes, result: ImportResult) -> ImportItem | None:
+    """解析一行；格式头与空行返回 None，非法行记入 result.errors"""
+    if not line.strip():
+        return None
+    try:
+        doc = orjson.loads(line)
+    except orjson.JSONDecodeError as exc:
+        result.error(line_no, f"invalid JSON: {exc}")
+        return None
+    if not isinstance(doc, dict):
+        result.error(line_no, "expected a JSON object")
+        return None
+    if "format" in doc and "nodes" not in doc:
+        if doc["format"] != EXPORT_FORMAT or doc.get("version", 1) > EXPORT_FORMAT_VERSION:
+            result.error(line_no, f"unsupported format {doc.get('format')!r} v{doc.get('version')}")
+        return None
+    title, nodes, edges = doc.get("title"), doc.get("nodes", []), doc.get("edges", [])
+    if not isinstance(title, str) or not 1 <= len(title) <= 200:
+        result.error(line_no, "title must be a string of 1-200 characters")
+        return None
+    if not isinstance(nodes, list) or not isinstance(edges, list):
+        result.error(line_no, "nodes and edges must be arrays")
+        return None
+    exported_at = doc.get("exportedAt")
+    return ImportItem(line_no, title, exported_at if isinstance(exported_at, str) else
+                      datetime.datetime.utcnow().isoformat(), nodes, edges)
+
+
+def import_batch(session: Session, owner_id: int, items: list[ImportItem]) -> list[tuple[int, GraphDelta]]:
+    """一个事务写入一批图（快照、节点/边表、全文索引），返回 [(新 id, 节点变化)]"""
+    created = []
+    for item in items:
+        payload = pack_graph(item.nodes, item.edges)
+        g = Graph(title=item.title, payload=payload, exported_at=item.exported_at, owner_id=owner_id,
+                  content_hash=graph_etag(0, item.title, item.exported_at, payload))
+        session.add(g)
+        session.flush()
+        delta = sync_graph_rows(session, g.id, item.nodes, item.edges)
+        fulltext.index_delta(session, owner_id, g.id, delta)
+        created.append((g.id, delta))
+    session.commit()
+    session.expunge_all()  # 释放本批对象，导入期间内存不随图数增长
+    return created
@@ -1,41 +1,47 @@
+import sys
+
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session, select
-from passlib.context import CryptContext
-from passlib.exc import UnknownHashError
 
+from backend.app.core.hashing import password_hasher
+from backend.app.core.user_cache import user_cache
 from backend.app.models.user import User
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 def get_user_by_username(username: str, session: Session):
     return session.exec(select(User).where(User.user_name == username)).first()
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-
-def verify_password(plain_password: str, hashed_password: str | None) -> bool:
-    if not hashed_password:
-        return False
-    try:
-        return pwd_context.verify(plain_password, hashed_password)
-    except UnknownHashError:
-        return False
+def _commit(session: Session, user: User) -> None:
+    session.add(user)
+    session.commit()
+    session.refresh(user)
 
 
-def authenticate_user(username: str, password: str, session: Session):
-    user = get_user_by_username(username, session)
+async def authenticate_user(username: str, password: str, session: Session):
+    user = await run_in_threadpool(get_user_by_username, username, session)
     if not user:
         return False
-    if not verify_password(password, user.password):
+    ok, new_hash = await password_hasher.verify_and_update(password, user.password)
+    if not ok:
         return False
+    if new_hash:  # BCRYPT_ROUNDS 变更后透明升级旧哈希
+        user.password = new_hash
+        await run_in_threadpool(_commit, session, user)
+        user_cache.invalidate(user.user_name)
     return user
 
 
-def register_user(user: User, user_name: str, password: str, session: Session):
+async def register_user(user: User, user_name: str, password: str, session: Session):
+    hashed = await password_hasher.hash(password)
+    old_name = user.user_name
     user.user_name = user_name
-    user.password = hash_password(password)
+    user.password = hashed
     user.ad_token = None
-    session.commit()
-    session.refresh(user)
+    await run_in_threadpool(_commit, session, user)
+    # 修改用户名/密码或模型配置后都要清除缓存，旧用户名签发的令牌随之失效
+    user_cache.invalidate(old_name, user_name)
+    # LLM 依赖按需加载：尚未导入时不会有缓存的 agent，也不必为此导入
+    llm_agent = sys.modules.get("backend.app.llm.agent")
+    if llm_agent is not None:
+        llm_agent.agent_cache.invalidate_user(user.id)
@@ -1,8 +1,10 @@
 from typing import Generator
 from sqlmodel import Session
+from backend.app.core.metrics import span
 from .base import engine
 
 
 def get_session() -> Generator[Session, None, None]:
-    with Session(engine) as session:
+    # 会话生命周期（约等于请求占用连接的时长）
+    with span("db.session"), Session(engine) as session:
         yield session
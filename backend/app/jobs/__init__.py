@@ -0,0 +1 @@
+# jobs package
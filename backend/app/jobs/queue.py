@@ -0,0 +1,185 @@
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, TypeVar
+
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from backend.app.models.job import Job
+
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
+
+_env = os.getenv
+JOB_MAX_ATTEMPTS = int(_env("JOB_MAX_ATTEMPTS", "3"))
+# 运行中的任务需在租约内刷新心跳，否则视为 worker 已退出
+JOB_LEASE_SECONDS = float(_env("JOB_LEASE_SECONDS", "120"))
+JOB_RETRY_BASE = float(_env("JOB_RETRY_BASE", "5"))
+# 进度写库的最小间隔（秒）
+_PROGRESS_INTERVAL = 0.5
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """任务被用户取消；处理函数在汇报进度时抛出"""
+
+
+class PermanentJobError(Exception):
+    """不值得重试的失败（如参数错误、资源已删除）"""
+
+
+@dataclass
+class JobHandler:
+    kind: str
+    func: Callable[["JobContext"], Any]
+    user_submittable: bool
+    max_attempts: int
+
+
+_handlers: dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str, user_submittable: bool = False, max_attempts: int = JOB_MAX_ATTEMPTS):
+    """注册任务处理函数：func(ctx) 在 worker 线程中同步执行，返回值（可 JSON 序列化）作为结果"""
+    def register(func: Callable[["JobContext"], Any]):
+        _handlers[kind] = JobHandler(kind, func, user_submittable, max_attempts)
+        return func
+    return register
+
+
+def get_handler(kind: str) -> JobHandler | None:
+    return _handlers.get(kind)
+
+
+def enqueue(session: Session, kind: str, payload: dict | None = None, owner_id: int | None = None,
+            delay: float = 0) -> Job:
+    handler = get_handler(kind)
+    if handler is None:
+        raise ValueError(f"unknown job kind: {kind}")
+    now = time.time()
+    job = Job(kind=kind, owner_id=owner_id, payload=json.dumps(payload or {}, ensure_ascii=False),
+              max_attempts=handler.max_attempts, created_at=now, run_after=now + delay)
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+def request_cancel(session: Session, job: Job) -> Job:
+    """排队中的任务直接取消；运行中的任务打标记，由处理函数在下次汇报进度时退出"""
+    now = time.time()
+    session.execute(update(Job).where(Job.id == job.id, Job.status == "queued")
+                    .values(status="cancelled", finished_at=now))
+    session.execute(update(Job).where(Job.id == job.id, Job.status == "running").values(cancel_requested=True))
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+def claim(session: Session, worker: str) -> Job | None:
+    """领取一个到期的排队任务；用条件更新保证多个 worker（含多进程）不会领取同一任务"""
+    for _ in range(5):
+        now = time.time()
+        job_id = session.exec(
+            select(Job.id).where(Job.status == "queued", Job.run_after <= now).order_by(Job.run_after, Job.id).limit(1)
+        ).first()
+        if job_id is None:
+            return None
+        result = session.execute(
+            update(Job).where(Job.id == job_id, Job.status == "queued")
+            .values(status="running", worker=worker, started_at=now, heartbeat_at=now, attempts=Job.attempts + 1)
+        )
+        session.commit()
+        if result.rowcount == 1:
+            return session.get(Job, job_id)
+    return None
+
+
+def heartbeat(session: Session, job_ids: list[int]) -> None:
+    if job_ids:
+        session.execute(update(Job).where(Job.id.in_(job_ids), Job.status == "running").values(heartbeat_at=time.time()))
+        session.commit()
+
+
+def complete(session: Session, job_id: int, result: Any) -> None:
+    session.execute(update(Job).where(Job.id == job_id, Job.status == "running").values(
+        status="succeeded", result=json.dumps(result, ensure_ascii=False, default=str), progress=1.0,
+        finished_at=time.time()))
+    session.commit()
+
+
+def fail(session: Session, job_id: int, error: str, retry: bool = True) -> str:
+    """失败后按指数退避重新排队，次数用尽则标记 failed；返回新状态"""
+    job = session.get(Job, job_id)
+    if job is None or job.status != "running":
+        return job.status if job else "missing"
+    now = time.time()
+    if job.cancel_requested:
+        job.status, job.finished_at = "cancelled", now
+    elif retry and job.attempts < job.max_attempts:
+        job.status, job.run_after, job.worker = "queued", now + JOB_RETRY_BASE * 2 ** (job.attempts - 1), None
+    else:
+        job.status, job.finished_at = "failed", now
+    job.error = error[:2000]
+    session.add(job)
+    session.commit()
+    return job.status
+
+
+def requeue_stale(session: Session, lease: float = JOB_LEASE_SECONDS) -> int:
+    """心跳超时的运行中任务重新排队（次数用尽则失败）"""
+    now = time.time()
+    stale = session.exec(select(Job).where(Job.status == "running", Job.heartbeat_at < now - lease)).all()
+    for job in stale:
+        logger.warning("job %s lease expired on worker %s", job.id, job.worker)
+        if job.attempts < job.max_attempts and not job.cancel_requested:
+            job.status, job.run_after, job.worker = "queued", now, None
+        else:
+            job.status, job.finished_at = ("cancelled" if job.cancel_requested else "failed"), now
+            job.error = job.error or "worker lost"
+        session.add(job)
+    session.commit()
+    return len(stale)
+
+
+@dataclass
+class JobContext:
+    """传给处理函数：参数、独立会话与进度汇报"""
+    engine: Engine
+    job_id: int
+    owner_id: int | None
+    payload: dict
+    _last_report: float = field(default=0.0, repr=False)
+    # worker 的事件循环；处理函数运行在线程中，经 run_async 使用事件循环上的组件（如模型调度）
+    loop: asyncio.AbstractEventLoop | None = field(default=None, repr=False)
+
+    def session(self) -> Session:
+        return Session(self.engine)
+
+    def run_async(self, coro: Awaitable[T]) -> T:
+        """在 worker 事件循环中执行协程并等待结果；没有事件循环时（直接调用处理函数）就地执行"""
+        if self.loop is None:
+            return asyncio.run(coro)
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def progress(self, fraction: float, message: str | None = None, force: bool = False) -> None:
+        """更新进度（节流写库），同时检查取消标记"""
+        now = time.monotonic()
+        if not force and now - self._last_report < _PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        with self.session() as session:
+            values: dict[str, Any] = {"progress": max(0.0, min(1.0, fraction)), "heartbeat_at": time.time()}
+            if message is not None:
+                values["message"] = message[:200]
+            session.execute(update(Job).where(Job.id == self.job_id).values(**values))
+            session.commit()
+            if session.exec(select(Job.cancel_requested).where(Job.id == self.job_id)).first():
+                raise JobCancelled()
@@ -0,0 +1,151 @@
+"""内置后台任务：user_submittable=True 的任务可由用户通过 /jobs 提交"""
+from __future__ import annotations
+import asyncio
+import logging
+import os
+from typing import Any
+
+from sqlmodel import select
+
+from backend.app.crud.graph import GraphDelta, parent_map
+from backend.app.jobs.queue import JobContext, PermanentJobError, job_handler
+from backend.app.models.graph import Graph
+from backend.app.models.user import User
+from backend.app.search import fulltext
+from backend.app.search.text import node_text
+from backend.app.search.vector_index import VECTOR_INDEX_ENABLED, vector_indexes
+from backend.app.utils.graph_utils import unpack_graph
+
+logger = logging.getLogger(__name__)
+
+# 整树摘要时每次送给模型的问答文本长度上限（字符）
+SUMMARY_CHUNK_CHARS = int(os.getenv("JOB_SUMMARY_CHUNK_CHARS", "6000"))
+
+_SUMMARY_PROMPT = "你是知识整理助手。下面是一棵知识树中按层级顺序排列的若干问答，请用简洁的条目概括其中的要点。"
+_COMBINE_PROMPT = "你是知识整理助手。下面是同一棵知识树各部分的要点，请合并去重，整理为一份结构清晰的总摘要。"
+
+
+def _valid_nodes(nodes: list[Any]) -> list[dict]:
+    return [n for n in nodes if isinstance(n, dict) and n.get("id") is not None]
+
+
+@job_handler("reindex", user_submittable=True)
+def reindex_user(ctx: JobContext) -> dict:
+    """重建当前用户所有图的全文索引与向量索引"""
+    with ctx.session() as session:
+        graph_ids = list(session.exec(select(Graph.id).where(Graph.owner_id == ctx.owner_id).order_by(Graph.id)).all())
+    indexed = 0
+    for i, graph_id in enumerate(graph_ids):
+        ctx.progress(i / len(graph_ids), f"graph {graph_id}")
+        with ctx.session() as session:
+            graph = session.get(Graph, graph_id)
+            if graph is None:
+                continue
+            nodes = _valid_nodes(unpack_graph(graph.stored)[0])
+            fulltext.drop_graph(session, graph_id)
+            fulltext.index_delta(session, ctx.owner_id, graph_id, GraphDelta(upserted_nodes=nodes))
+            session.commit()
+        if VECTOR_INDEX_ENABLED:
+            vector_indexes.drop_graph(ctx.owner_id, graph_id)
+            vector_indexes.index_nodes(ctx.owner_id, graph_id, nodes)
+        indexed += len(nodes)
+    return {"graphs": len(graph_ids), "nodes": indexed}
+
+
+def tree_order(nodes: list[Any], edges: list[Any]) -> list[dict]:
+    """按父子关系深度优先排列节点（同级保持原顺序），孤立节点排在最后"""
+    nodes = _valid_nodes(nodes)
+    by_id = {str(n["id"]): n for n in nodes}
+    parents = {k: v for k, v in parent_map(edges).items() if v in by_id}
+    children: dict[str, list[str]] = {}
+    for node_id in by_id:
+        if node_id in parents:
+            children.setdefault(parents[node_id], []).append(node_id)
+    ordered: list[dict] = []
+    seen: set[str] = set()
+    for root in [node_id for node_id in by_id if node_id not in parents] + list(by_id):
+        stack = [root]
+        while stack:
+            node_id = stack.pop()
+            if node_id in seen:
+                continue
+            seen.add(node_id)
+            ordered.append(by_id[node_id])
+            stack.extend(reversed(children.get(node_id, [])))
+    return ordered
+
+
+def _chunks(texts: list[str], limit: int) -> list[str]:
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+    for text in texts:
+        if current and size + len(text) > limit:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(text[:limit])
+        size += len(text)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def chat_model(user: User):
+    """按用户配置的模型与 key 创建客户端（延迟导入，worker 进程只在需要时加载 LLM 依赖）"""
+    from backend.app.llm.model import SiliconFlowChatModel
+    return SiliconFlowChatModel(model=user.ad_model, api_key=user.ad_api_key)
+
+
+def _invoke(ctx: JobContext, user: User, model: Any, messages: list) -> str:
+    """与问答路由相同的上游调用约束：发送前检查配额、按用户公平排队占用模型名额，返回后记入用量"""
+    from backend.app.llm.context import count_tokens
+    from backend.app.llm.limiter import model_limiter
+    from backend.app.llm.quota import QuotaExceededError, usage_ledger
+
+    model_key = user.ad_model or ""
+    try:
+        policy = usage_ledger.check(user.id, model_key)
+    except QuotaExceededError as exc:
+        raise PermanentJobError(str(exc)) from exc
+
+    async def call():
+        async with model_limiter.slot(model_key, user.id, policy.weight):
+            return await asyncio.to_thread(model.invoke, messages)
+
+    message = ctx.run_async(call())
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        prompt, completion = int(usage.get("input_tokens") or 0), int(usage.get("output_tokens") or 0)
+    else:
+        prompt = sum(count_tokens(str(m.content)) for m in messages)
+        completion = count_tokens(str(message.content))
+    usage_ledger.record(user.id, str(getattr(model, "model_name", None) or "unknown"), prompt, completion)
+    return str(message.content)
+
+
+@job_handler("summarize_graph", user_submittable=True)
+def summarize_graph(ctx: JobContext) -> dict:
+    """分块概括整棵知识树再合并（map-reduce），结果为总摘要"""
+    graph_id = ctx.payload.get("graph_id")
+    with ctx.session() as session:
+        graph = session.get(Graph, graph_id) if graph_id is not None else None
+        if graph is None or graph.owner_id != ctx.owner_id:
+            raise PermanentJobError("Graph not found")
+        user = session.get(User, ctx.owner_id)
+        nodes, edges = unpack_graph(graph.stored)
+        title = graph.title
+    chunks = _chunks([t for t in (node_text(n) for n in tree_order(nodes, edges)) if t], SUMMARY_CHUNK_CHARS)
+    if not chunks:
+        return {"graph_id": graph_id, "title": title, "summary": "", "chunks": 0}
+    from langchain_core.messages import HumanMessage, SystemMessage
+    model = chat_model(user)
+    steps = len(chunks) + (len(chunks) > 1)
+    partials = []
+    for i, chunk in enumerate(chunks):
+        ctx.progress(i / steps, f"chunk {i + 1}/{len(chunks)}", force=True)
+        partials.append(_invoke(ctx, user, model, [SystemMessage(_SUMMARY_PROMPT), HumanMessage(chunk)]))
+    summary = partials[0]
+    if len(partials) > 1:
+        ctx.progress(len(chunks) / steps, "combine", force=True)
+        summary = _invoke(ctx, user, model, [SystemMessage(_COMBINE_PROMPT), HumanMessage("\n\n".join(partials))])
+    return {"graph_id": graph_id, "title": title, "summary": summary, "chunks": len(chunks)}
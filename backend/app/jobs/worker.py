@@ -0,0 +1,185 @@
+"""后台任务 worker。
+
+- 进程内：JOB_WORKER=inprocess（默认）时随 API 启动，与请求共用事件循环，处理函数在线程中执行
+- 独立进程：API 设 JOB_WORKER=off，另起 `python -m backend.app.jobs.worker`，多个进程可同时消费同一队列
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import uuid
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from backend.app.jobs import queue
+from backend.app.jobs.queue import JobCancelled, JobContext, PermanentJobError
+
+logger = logging.getLogger(__name__)
+
+_env = os.getenv
+JOB_WORKER = _env("JOB_WORKER", "inprocess")  # inprocess / off
+JOB_CONCURRENCY = int(_env("JOB_CONCURRENCY", "2"))
+JOB_POLL_INTERVAL = float(_env("JOB_POLL_INTERVAL", "1"))
+
+
+class Worker:
+    def __init__(self, engine: Engine, concurrency: int = JOB_CONCURRENCY, poll_interval: float = JOB_POLL_INTERVAL,
+                 lease: float = queue.JOB_LEASE_SECONDS):
+        self.engine = engine
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._running: dict[int, asyncio.Task] = {}
+        self._wake: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._main: asyncio.Task | None = None
+        self._stopping = False
+
+    def wake(self) -> None:
+        """有新任务入队时提前结束轮询等待；可在任意线程调用"""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def run_once(self) -> int:
+        """领取并执行当前可运行的任务，直到队列为空或名额用满；返回启动的任务数（供测试与单次运行）"""
+        started = 0
+        while len(self._running) < self.concurrency:
+            job = await asyncio.to_thread(self._claim)
+            if job is None:
+                break
+            self._running[job.id] = asyncio.create_task(self._execute(job.id, job.kind, job.owner_id, job.payload))
+            started += 1
+        return started
+
+    async def drain(self) -> None:
+        """执行到队列中没有到期任务为止"""
+        while await self.run_once() or self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    async def run_forever(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        last_sweep = 0.0
+        logger.info("job worker %s started (concurrency=%d)", self.name, self.concurrency)
+        while not self._stopping:
+            try:
+                now = self._loop.time()
+                if now - last_sweep > self.lease / 3:
+                    last_sweep = now
+                    await asyncio.to_thread(self._sweep)
+                await self.run_once()
+            except Exception:
+                logger.exception("job worker loop error")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except TimeoutError:
+                pass
+
+    def start(self) -> None:
+        self._stopping = False
+        self._main = asyncio.get_running_loop().create_task(self.run_forever())
+
+    async def stop(self, timeout: float = 10) -> None:
+        """停止领取新任务，等待在途任务结束；超时未结束的由租约机制在之后重新入队"""
+        self._stopping = True
+        self.wake()
+        if self._main is not None:
+            await asyncio.gather(self._main, return_exceptions=True)
+        if self._running:
+            await asyncio.wait(list(self._running.values()), timeout=timeout)
+
+    def _claim(self):
+        with Session(self.engine) as session:
+            job = queue.claim(session, self.name)
+            if job is not None:
+                session.expunge(job)
+            return job
+
+    def _sweep(self) -> None:
+        with Session(self.engine) as session:
+            queue.heartbeat(session, list(self._running))
+            queue.requeue_stale(session, self.lease)
+
+    async def _execute(self, job_id: int, kind: str, owner_id: int | None, payload: str) -> None:
+        handler = queue.get_handler(kind)
+        ctx = JobContext(self.engine, job_id, owner_id, json.loads(payload or "{}"), loop=asyncio.get_running_loop())
+        try:
+            if handler is None:
+                raise PermanentJobError(f"unknown job kind: {kind}")
+            result = await asyncio.to_thread(handler.func, ctx)
+            await asyncio.to_thread(self._finish, job_id, result)
+        except JobCancelled:
+            await asyncio.to_thread(self._fail, job_id, "cancelled", False)
+        except Exception as exc:
+            logger.exception("job %s (%s) failed", job_id, kind)
+            # 只有 PermanentJobError 的信息是写给用户看的；其它异常可能带有内部地址、SQL 等，详情只记日志
+            permanent = isinstance(exc, PermanentJobError)
+            await asyncio.to_thread(self._fail, job_id, str(exc) if permanent else "internal error", not permanent)
+        finally:
+            self._running.pop(job_id, None)
+            if self._wake is not None:
+                self._wake.set()
+
+    def _finish(self, job_id: int, result) -> None:
+        with Session(self.engine) as session:
+            queue.complete(session, job_id, result)
+
+    def _fail(self, job_id: int, error: str, retry: bool) -> None:
+        with Session(self.engine) as session:
+            queue.fail(session, job_id, error, retry)
+
+
+job_worker: Worker | None = None
+
+
+def start_in_process(engine: Engine) -> Worker | None:
+    """在 API 进程的事件循环中启动 worker（JOB_WORKER=inprocess 时）"""
+    global job_worker
+    if JOB_WORKER != "inprocess" or job_worker is not None:
+        return job_worker
+    from backend.app.jobs import tasks  # noqa: F401  注册处理函数
+    job_worker = Worker(engine)
+    job_worker.start()
+    return job_worker
+
+
+async def stop_in_process() -> None:
+    global job_worker
+    if job_worker is not None:
+        await job_worker.stop()
+        job_worker = None
+
+
+def wake() -> None:
+    if job_worker is not None:
+        job_worker.wake()
+
+
+async def _main() -> None:
+    from backend.app.core.config import check_settings, load_env_files
+    load_env_files()
+    check_settings()
+    from backend.app.db.base import engine
+    from backend.app.jobs import tasks  # noqa: F401
+
+    worker = Worker(engine)
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    worker.start()
+    await stop.wait()
+    await worker.stop()
+    from backend.app.llm.quota import usage_ledger
+    await asyncio.to_thread(usage_ledger.flush)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    asyncio.run(_main())
@@ -0,0 +1,35 @@
+"""问答 agent 的构建与缓存，LangChain / LangGraph / 模型客户端集中在此导入。
+
+这些依赖导入约需 2s，interaction 路由在首次问答或启动预热（LLM_PRELOAD）时才加载本模块，
+worker 启动与图 CRUD 不受影响。
+"""
+from __future__ import annotations
+
+from langchain.agents import create_agent
+
+from backend.app.core.metrics import stats_collector
+from backend.app.llm.agent_cache import AgentCache
+from backend.app.llm.checkpointer import create_checkpointer
+from backend.app.llm.completion_cache import CompletionCacheMiddleware
+from backend.app.llm.context import AskContext, TokenBudgetMiddleware
+from backend.app.llm.model import SiliconFlowChatModel
+from backend.app.llm.usage import UsageMiddleware
+
+checkpointer = create_checkpointer()
+
+
+def _create_agent(model_name: str | None, api_key: str | None):
+    model = SiliconFlowChatModel(model=model_name, api_key=api_key)
+    return create_agent(
+        model=model,
+        tools=[],
+        system_prompt="You are a helpful assistant",
+        middleware=[TokenBudgetMiddleware(), CompletionCacheMiddleware(), UsageMiddleware()],
+        context_schema=AskContext,
+        checkpointer=checkpointer
+    )
+
+
+agent_cache = AgentCache(_create_agent)
+stats_collector("agent_cache", lambda: {"entries": len(agent_cache), "hits": agent_cache.hits,
+                                        "misses": agent_cache.misses}, "Compiled agent cache")
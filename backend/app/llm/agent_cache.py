@@ -0,0 +1,88 @@
+from __future__ import annotations
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+# 缓存条目上限（LRU）与空闲淘汰时间（秒）
+AGENT_CACHE_SIZE = int(os.getenv("AGENT_CACHE_SIZE", "256"))
+AGENT_CACHE_IDLE_TTL = float(os.getenv("AGENT_CACHE_IDLE_TTL", "1800"))
+
+
+def api_key_fingerprint(api_key: str | None) -> str:
+    """API Key 只以摘要形式出现在缓存键中"""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+class AgentCache:
+    """按 (ad_model, ad_api_key 摘要) 缓存已编译的 agent 及其模型客户端。
+
+    - LRU + 空闲超时淘汰
+    - 记录每个用户当前使用的键，用户更换 key/模型 时丢弃旧条目
+    """
+
+    def __init__(self, factory: Callable[[str | None, str | None], Any],
+                 maxsize: int = AGENT_CACHE_SIZE, idle_ttl: float = AGENT_CACHE_IDLE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self._factory = factory
+        self.maxsize = maxsize
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str | None, str], tuple[Any, float]] = OrderedDict()
+        self._user_keys: dict[Hashable, tuple[str | None, str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: Hashable, model: str | None, api_key: str | None) -> Any:
+        key = (model, api_key_fingerprint(api_key))
+        now = self._clock()
+        with self._lock:
+            self._evict_idle(now)
+            previous = self._user_keys.get(user_id)
+            if previous is not None and previous != key:
+                self._drop_if_unowned(previous, excluding=user_id)
+            self._user_keys[user_id] = key
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries[key] = (entry[0], now)
+                self._entries.move_to_end(key)
+                return entry[0]
+            self.misses += 1
+        # 编译放在锁外，避免阻塞其他键；并发未命中时后写入者覆盖，结果等价
+        agent = self._factory(model, api_key)
+        with self._lock:
+            self._entries[key] = (agent, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return agent
+
+    def invalidate_user(self, user_id: Hashable) -> None:
+        with self._lock:
+            key = self._user_keys.pop(user_id, None)
+            if key is not None:
+                self._drop_if_unowned(key, excluding=user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict_idle(self, now: float) -> None:
+        # OrderedDict 按最近使用排序，只需从头部检查
+        while self._entries:
+            key, (_, last_used) = next(iter(self._entries.items()))
+            if now - last_used <= self.idle_ttl:
+                break
+            self._entries.popitem(last=False)
+
+    def _drop_if_unowned(self, key: tuple[str | None, str], excluding: Hashable) -> None:
+        if not any(k == key for uid, k in self._user_keys.items() if uid != excluding):
+            self._entries.pop(key, None)
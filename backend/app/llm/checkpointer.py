@@ -0,0 +1,353 @@
+from __future__ import annotations
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any
+
+import orjson
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    copy_checkpoint,
+    get_checkpoint_id,
+    get_serializable_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from sqlalchemy import delete, func
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from backend.app.core.metrics import timed
+from backend.app.models.checkpoint import ConversationCheckpoint, ConversationWrite
+
+_env = os.getenv
+# memory: 进程内（仅调试/单 worker）；sql: 基于 db.base.engine，可跨 worker 共享
+CHECKPOINTER_BACKEND = _env("CHECKPOINTER_BACKEND", "sql").lower()
+# 热点缓存：最近访问线程的最新 checkpoint（已反序列化）
+CHECKPOINT_CACHE_SIZE = int(_env("CHECKPOINT_CACHE_SIZE", "512"))
+CHECKPOINT_CACHE_TTL = float(_env("CHECKPOINT_CACHE_TTL", "600"))
+# 每个线程保留的历史 checkpoint 数，旧的随写入清理，库大小随线程数而非轮次增长
+CHECKPOINT_KEEP_PER_THREAD = int(_env("CHECKPOINT_KEEP_PER_THREAD", "4"))
+
+
+class _HotCache:
+    """(thread_id, checkpoint_ns) -> (checkpoint_id, checkpoint, metadata) 的 LRU + TTL 缓存"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items: OrderedDict[tuple[str, str], tuple[float, str, Checkpoint, CheckpointMetadata]] = OrderedDict()
+
+    def get(self, key: tuple[str, str], checkpoint_id: str) -> tuple[Checkpoint, CheckpointMetadata] | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            stored_at, cached_id, checkpoint, metadata = item
+            if cached_id != checkpoint_id or time.monotonic() - stored_at > self.ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return checkpoint, metadata
+
+    def put(self, key: tuple[str, str], checkpoint_id: str, checkpoint: Checkpoint, metadata: CheckpointMetadata) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic(), checkpoint_id, checkpoint, metadata)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def discard_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._items if k[0] == thread_id]:
+                del self._items[key]
+
+
+class SQLCheckpointSaver(BaseCheckpointSaver[str]):
+    """基于 SQLAlchemy engine 的 checkpoint 存储（SQLite / PostgreSQL）。
+
+    - checkpoint 与 pending writes 使用 serde（JsonPlusSerializer → ormsgpack）紧凑序列化，
+      metadata 以 orjson 存储
+    - 最新 checkpoint 先按主键查询 id，再命中热点缓存，避免重复反序列化整段消息历史；
+      其他 worker 写入新 checkpoint 时 id 不同，缓存自然失效
+    - 每个线程只保留最近 keep_per_thread 个 checkpoint
+    """
+
+    def __init__(self, engine: Engine, *, serde: SerializerProtocol | None = None,
+                 cache_size: int = CHECKPOINT_CACHE_SIZE, cache_ttl: float = CHECKPOINT_CACHE_TTL,
+                 keep_per_thread: int = CHECKPOINT_KEEP_PER_THREAD):
+        super().__init__(serde=serde)
+        self.engine = engine
+        self.keep_per_thread = keep_per_thread
+        self._cache = _HotCache(cache_size, cache_ttl)
+
+    def setup(self) -> None:
+        ConversationCheckpoint.__table__.create(self.engine, checkfirst=True)
+        ConversationWrite.__table__.create(self.engine, checkfirst=True)
+
+    # ---- sync API ----
+
+    @timed("checkpointer.get")
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id: str = config["configurable"]["thread_id"]
+        checkpoint_ns: str = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with Session(self.engine) as session:
+            # 只取主键与父 id，不加载 checkpoint 大字段
+            stmt = select(ConversationCheckpoint.checkpoint_id, ConversationCheckpoint.parent_checkpoint_id).where(
+                ConversationCheckpoint.thread_id == thread_id,
+                ConversationCheckpoint.checkpoint_ns == checkpoint_ns,
+            )
+            if checkpoint_id:
+                stmt = stmt.where(ConversationCheckpoint.checkpoint_id == checkpoint_id)
+            else:
+                stmt = stmt.order_by(ConversationCheckpoint.checkpoint_id.desc()).limit(1)
+            head = session.exec(stmt).first()
+            if head is None:
+                return None
+            checkpoint_id, parent_checkpoint_id = head
+            key = (thread_id, checkpoint_ns)
+            cached = self._cache.get(key, checkpoint_id)
+            if cached is not None:
+                checkpoint, metadata = cached
+            else:
+                row = session.get(ConversationCheckpoint, (thread_id, checkpoint_ns, checkpoint_id))
+                if row is None:  # 恰好被并发清理
+                    return None
+                checkpoint = self.serde.loads_typed((row.type, row.checkpoint))
+                metadata = orjson.loads(row.meta)
+                self._cache.put(key, checkpoint_id, checkpoint, metadata)
+            writes = self._load_writes(session, thread_id, checkpoint_ns, checkpoint_id)
+        return self._make_tuple(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                                copy_checkpoint(checkpoint), dict(metadata), writes)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        stmt = select(ConversationCheckpoint)
+        if config:
+            stmt = stmt.where(ConversationCheckpoint.thread_id == config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                stmt = stmt.where(ConversationCheckpoint.checkpoint_ns == checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                stmt = stmt.where(ConversationCheckpoint.checkpoint_id == checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            stmt = stmt.where(ConversationCheckpoint.checkpoint_id < before_id)
+        stmt = stmt.order_by(ConversationCheckpoint.thread_id, ConversationCheckpoint.checkpoint_id.desc())
+        with Session(self.engine) as session:
+            rows = session.exec(stmt).all()
+            for row in rows:
+                metadata = orjson.loads(row.meta)
+                if filter and not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                if limit is not None:
+                    if limit <= 0:
+                        break
+                    limit -= 1
+                writes = self._load_writes(session, row.thread_id, row.checkpoint_ns, row.checkpoint_id)
+                yield self._make_tuple(row.thread_id, row.checkpoint_ns, row.checkpoint_id,
+                                       row.parent_checkpoint_id,
+                                       self.serde.loads_typed((row.type, row.checkpoint)), metadata, writes)
+
+    @timed("checkpointer.put")
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+        type_, payload = self.serde.dumps_typed(checkpoint)
+        serializable_metadata = get_serializable_checkpoint_metadata(config, metadata)
+        with Session(self.engine) as session:
+            session.merge(ConversationCheckpoint(
+                thread_id=thread_id, checkpoint_ns=checkpoint_ns, checkpoint_id=checkpoint["id"],
+                parent_checkpoint_id=parent_checkpoint_id, type=type_, checkpoint=payload,
+                meta=orjson.dumps(serializable_metadata, default=str),
+            ))
+            self._prune(session, thread_id, checkpoint_ns)
+            session.commit()
+        self._cache.put((thread_id, checkpoint_ns), checkpoint["id"], copy_checkpoint(checkpoint),
+                        serializable_metadata)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    @timed("checkpointer.put_writes")
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with Session(self.engine) as session:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                pk = (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx)
+                # 特殊通道（错误/中断等）允许覆盖，普通写入保持首次结果
+                if write_idx >= 0 and session.get(ConversationWrite, pk) is not None:
+                    continue
+                type_, payload = self.serde.dumps_typed(value)
+                session.merge(ConversationWrite(
+                    thread_id=thread_id, checkpoint_ns=checkpoint_ns, checkpoint_id=checkpoint_id,
+                    task_id=task_id, idx=write_idx, channel=channel, type=type_, value=payload,
+                    task_path=task_path,
+                ))
+            session.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with Session(self.engine) as session:
+            session.exec(delete(ConversationWrite).where(ConversationWrite.thread_id == thread_id))
+            session.exec(delete(ConversationCheckpoint).where(ConversationCheckpoint.thread_id == thread_id))
+            session.commit()
+        self._cache.discard_thread(thread_id)
+
+    # ---- async API：数据库驱动为同步实现，放到线程池执行 ----
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        # 与 InMemorySaver 相同的版本格式："<递增序号>.<随机数>"，可按字符串排序
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ---- helpers ----
+
+    def _load_writes(self, session: Session, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> list:
+        rows = session.exec(
+            select(ConversationWrite).where(
+                ConversationWrite.thread_id == thread_id,
+                ConversationWrite.checkpoint_ns == checkpoint_ns,
+                ConversationWrite.checkpoint_id == checkpoint_id,
+            ).order_by(ConversationWrite.task_id, ConversationWrite.idx)
+        ).all()
+        return [(w.task_id, w.channel, self.serde.loads_typed((w.type, w.value))) for w in rows]
+
+    def _prune(self, session: Session, thread_id: str, checkpoint_ns: str) -> None:
+        if self.keep_per_thread <= 0:
+            return
+        scope = (
+            ConversationCheckpoint.thread_id == thread_id,
+            ConversationCheckpoint.checkpoint_ns == checkpoint_ns,
+        )
+        session.flush()
+        total = session.exec(select(func.count()).select_from(ConversationCheckpoint).where(*scope)).one()
+        if total <= self.keep_per_thread:
+            return
+        cutoff = session.exec(
+            select(ConversationCheckpoint.checkpoint_id).where(*scope)
+            .order_by(ConversationCheckpoint.checkpoint_id.desc())
+            .offset(self.keep_per_thread - 1).limit(1)
+        ).one()
+        session.exec(delete(ConversationWrite).where(
+            ConversationWrite.thread_id == thread_id,
+            ConversationWrite.checkpoint_ns == checkpoint_ns,
+            ConversationWrite.checkpoint_id < cutoff,
+        ))
+        session.exec(delete(ConversationCheckpoint).where(*scope, ConversationCheckpoint.checkpoint_id < cutoff))
+
+    @staticmethod
+    def _make_tuple(thread_id: str, checkpoint_ns: str, checkpoint_id: str, parent_checkpoint_id: str | None,
+                    checkpoint: Checkpoint, metadata: CheckpointMetadata, writes: list) -> CheckpointTuple:
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=checkpoint,
+            metadata=metadata,
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=writes,
+        )
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """按 CHECKPOINTER_BACKEND 创建对话 checkpointer"""
+    if CHECKPOINTER_BACKEND == "memory":
+        return InMemorySaver()
+    if CHECKPOINTER_BACKEND == "sql":
+        from backend.app.db.base import engine
+        return SQLCheckpointSaver(engine)
+    raise ValueError(f"Unknown CHECKPOINTER_BACKEND: {CHECKPOINTER_BACKEND}")
@@ -0,0 +1,262 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage, BaseMessage
+from sqlalchemy import delete, func, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from backend.app.core.metrics import stats_collector
+from backend.app.models.completion import CompletionCacheEntry
+
+logger = logging.getLogger(__name__)
+
+_env = os.getenv
+COMPLETION_CACHE_TTL = float(_env("COMPLETION_CACHE_TTL", str(7 * 24 * 3600)))
+COMPLETION_CACHE_MAX_ENTRIES = int(_env("COMPLETION_CACHE_MAX_ENTRIES", "10000"))
+# 每写入多少条检查一次条数上限
+COMPLETION_CACHE_PRUNE_EVERY = int(_env("COMPLETION_CACHE_PRUNE_EVERY", "100"))
+# 命中时最多每隔多少秒刷新一次 last_used_at，避免每次命中都写库
+_TOUCH_INTERVAL = 60.0
+
+_SPACES = re.compile(r"\s+")
+
+
+def _normalize(content: Any) -> str:
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)
+    return _SPACES.sub(" ", content).strip()
+
+
+def _model_params(model: Any) -> dict:
+    try:
+        params = dict(model._identifying_params)
+    except Exception:
+        params = {"model_name": getattr(model, "model_name", None)}
+    return params
+
+
+def completion_key(model: Any, system_prompt: str | None, messages: list[BaseMessage]) -> str:
+    """缓存键：模型参数、system prompt 与规范化后的消息（角色 + 去除多余空白的内容）"""
+    payload = {
+        "model": _model_params(model),
+        "system": _normalize(system_prompt or ""),
+        "messages": [[m.type, _normalize(m.content)] for m in messages],
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class _LeaderFailed(Exception):
+    """发起上游调用的请求失败或被取消，等待者自行调用"""
+
+
+class CompletionCache:
+    """基于数据库的回答缓存，带 TTL、条数上限与进程内同键请求合并"""
+
+    def __init__(self, engine: Engine | None = None, ttl: float = COMPLETION_CACHE_TTL,
+                 max_entries: int = COMPLETION_CACHE_MAX_ENTRIES, clock: Callable[[], float] = time.time):
+        self._engine = engine
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._writes = 0
+        self.counters = {
+            "hits": 0, "misses": 0, "coalesced": 0, "stores": 0,
+            "saved_prompt_tokens": 0, "saved_completion_tokens": 0,
+            "upstream_calls": 0, "upstream_seconds": 0.0, "hit_seconds": 0.0,
+        }
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            from backend.app.db.base import engine
+            self._engine = engine
+        return self._engine
+
+    def _session(self) -> Session:
+        # 表由迁移 0008 创建，这里不做运行期 DDL
+        return Session(self.engine)
+
+    def reset(self, engine: Engine | None = None) -> None:
+        """切换数据库（测试使用）"""
+        self._engine = engine
+
+    def _count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def lookup(self, key: str) -> CompletionCacheEntry | None:
+        now = self._clock()
+        with self._session() as session:
+            entry = session.get(CompletionCacheEntry, key)
+            if entry is None:
+                return None
+            if now - entry.created_at > self.ttl:
+                session.delete(entry)
+                session.commit()
+                return None
+            if now - entry.last_used_at > _TOUCH_INTERVAL:
+                session.exec(update(CompletionCacheEntry).where(CompletionCacheEntry.key == key)
+                             .values(last_used_at=now, hits=CompletionCacheEntry.hits + 1))
+                session.commit()
+            session.expunge(entry)
+            return entry
+
+    def store(self, key: str, model: str | None, message: AIMessage) -> None:
+        usage = message.usage_metadata or {}
+        now = self._clock()
+        with self._session() as session:
+            session.merge(CompletionCacheEntry(
+                key=key, model=model, content=message.content, created_at=now, last_used_at=now,
+                prompt_tokens=usage.get("input_tokens", 0), completion_tokens=usage.get("output_tokens", 0)))
+            session.commit()
+            self._count("stores")
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % COMPLETION_CACHE_PRUNE_EVERY == 1
+            if prune:
+                self._prune(session, now)
+
+    def _prune(self, session: Session, now: float) -> None:
+        session.exec(delete(CompletionCacheEntry).where(CompletionCacheEntry.created_at < now - self.ttl))
+        total = session.exec(select(func.count()).select_from(CompletionCacheEntry)).one()
+        if total > self.max_entries:
+            cutoff = session.exec(select(CompletionCacheEntry.last_used_at)
+                                  .order_by(CompletionCacheEntry.last_used_at.desc())
+                                  .offset(self.max_entries).limit(1)).first()
+            if cutoff is not None:
+                session.exec(delete(CompletionCacheEntry).where(CompletionCacheEntry.last_used_at <= cutoff))
+        session.commit()
+
+    def clear(self) -> None:
+        with self._session() as session:
+            session.exec(delete(CompletionCacheEntry))
+            session.commit()
+
+    def _hit_response(self, entry: CompletionCacheEntry, started: float) -> ModelResponse:
+        self._count("hits")
+        self._count("saved_prompt_tokens", entry.prompt_tokens)
+        self._count("saved_completion_tokens", entry.completion_tokens)
+        self._count("hit_seconds", time.perf_counter() - started)
+        return ModelResponse(result=[AIMessage(content=entry.content, response_metadata={"completion_cache": "hit"})])
+
+    @staticmethod
+    def _cacheable(response: ModelResponse) -> AIMessage | None:
+        messages = response.result if isinstance(response, ModelResponse) else [response]
+        if len(messages) == 1 and isinstance(messages[0], AIMessage) and not messages[0].tool_calls \
+                and isinstance(messages[0].content, str) and messages[0].content:
+            return messages[0]
+        return None
+
+    async def _call_upstream(self, key: str, request: ModelRequest, handler) -> ModelResponse:
+        started = time.perf_counter()
+        response = await handler(request)
+        self._count("upstream_calls")
+        self._count("upstream_seconds", time.perf_counter() - started)
+        message = self._cacheable(response)
+        if message is not None:
+            try:
+                await asyncio.to_thread(self.store, key, getattr(request.model, "model_name", None), message)
+            except Exception:
+                logger.exception("completion cache store failed")
+        return response
+
+    async def acall(self, request: ModelRequest,
+                    handler: Callable[[ModelRequest], Awaitable[ModelResponse]]) -> ModelResponse:
+        started = time.perf_counter()
+        key = completion_key(request.model, request.system_prompt, request.messages)
+        try:
+            entry = await asyncio.to_thread(self.lookup, key)
+        except Exception:
+            logger.exception("completion cache lookup failed")
+            entry = None
+        if entry is not None:
+            return self._hit_response(entry, started)
+        self._count("misses")
+
+        leader = self._inflight.get(key)
+        if leader is not None:
+            # 同一进程内相同请求正在调用上游：等待其结果，不再重复调用
+            self._count("coalesced")
+            try:
+                message = await asyncio.shield(leader)
+                return ModelResponse(result=[message.model_copy(update={"id": None})])
+            except _LeaderFailed:
+                return await handler(request)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await self._call_upstream(key, request, handler)
+        except BaseException:
+            future.set_exception(_LeaderFailed())
+            future.exception()  # 无人等待时避免 "exception was never retrieved"
+            raise
+        else:
+            message = self._cacheable(response)
+            if message is None:
+                future.set_exception(_LeaderFailed())
+                future.exception()
+            else:
+                future.set_result(message)
+            return response
+        finally:
+            self._inflight.pop(key, None)
+
+    def call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        started = time.perf_counter()
+        key = completion_key(request.model, request.system_prompt, request.messages)
+        entry = self.lookup(key)
+        if entry is not None:
+            return self._hit_response(entry, started)
+        self._count("misses")
+        response = handler(request)
+        message = self._cacheable(response)
+        if message is not None:
+            self.store(key, getattr(request.model, "model_name", None), message)
+        return response
+
+
+completion_cache = CompletionCache()
+stats_collector("completion_cache", completion_cache.stats, "LLM completion cache")
+
+
+class CompletionCacheMiddleware(AgentMiddleware):
+    """运行时上下文 use_cache 为真时，相同模型输入直接复用缓存的回答（需放在 TokenBudgetMiddleware 之后）"""
+
+    def __init__(self, cache: CompletionCache | None = None):
+        super().__init__()
+        self.cache = cache
+
+    def _enabled(self, request: ModelRequest) -> bool:
+        ctx = request.runtime.context if request.runtime is not None else None
+        return bool(getattr(ctx, "use_cache", False))
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]):
+        if not self._enabled(request):
+            return handler(request)
+        return (self.cache or completion_cache).call(request, handler)
+
+    async def awrap_model_call(self, request: ModelRequest,
+                               handler: Callable[[ModelRequest], Awaitable[ModelResponse]]):
+        if not self._enabled(request):
+            return await handler(request)
+        return await (self.cache or completion_cache).acall(request, handler)
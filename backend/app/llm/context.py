@@ -0,0 +1,190 @@
+from __future__ import annotations
+import logging
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Awaitable, Callable
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from backend.app.crud.graph import parent_map
+
+logger = logging.getLogger(__name__)
+
+_env = os.getenv
+# 单次模型调用（不含 system prompt）的 token 预算
+CONTEXT_TOKEN_BUDGET = int(_env("CONTEXT_TOKEN_BUDGET", "3000"))
+# 预算紧张时至少留给祖先分支上下文的比例
+CONTEXT_ANCESTOR_SHARE = float(_env("CONTEXT_ANCESTOR_SHARE", "0.4"))
+# 放不下完整内容的较早轮次截断到的 token 数；剩余预算更少时直接丢弃
+CONTEXT_MIN_TURN_TOKENS = int(_env("CONTEXT_MIN_TURN_TOKENS", "64"))
+CONTEXT_ENCODING = _env("CONTEXT_ENCODING", "cl100k_base")
+
+_TRUNCATED_MARK = "…（已截断）"
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(CONTEXT_ENCODING)
+    except Exception as exc:  # 离线环境无法下载 BPE 文件时退化为估算
+        logger.warning("tiktoken encoding %s unavailable, falling back to estimation: %s", CONTEXT_ENCODING, exc)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _encoding()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    # 估算：ASCII 约 4 字符 1 token，CJK 等非 ASCII 字符约 1 字符 1 token
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    enc = _encoding()
+    if enc is not None:
+        return enc.decode(enc.encode(text, disallowed_special=())[:max_tokens]) + _TRUNCATED_MARK
+    lo, hi = 0, len(text)
+    while lo < hi:  # 二分找到不超过预算的最长前缀
+        mid = (lo + hi + 1) // 2
+        if count_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo] + _TRUNCATED_MARK
+
+
+def _message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_tokens(content) + 4  # 角色等固定开销
+
+
+def ancestor_chain(nodes: list[Any], edges: list[Any], node_id: str) -> list[dict]:
+    """沿入边向上查找祖先节点，按由近及远返回（不含节点本身）；id 统一按字符串比较"""
+    by_id = {str(n["id"]): n for n in nodes if isinstance(n, dict) and n.get("id") is not None}
+    parent_of = parent_map(edges)
+    chain: list[dict] = []
+    seen = {node_id}
+    current = parent_of.get(node_id)
+    while current is not None and current not in seen and current in by_id:
+        seen.add(current)
+        chain.append(by_id[current])
+        current = parent_of.get(current)
+    return chain
+
+
+@dataclass
+class Turn:
+    question: str
+    answer: str
+    priority: int  # 越小越重要
+
+    @property
+    def tokens(self) -> int:
+        return count_tokens(self.question) + count_tokens(self.answer) + 8
+
+
+def branch_turns(nodes: list[Any], edges: list[Any], node_id: str, focus_index: int | None = None) -> list[Turn]:
+    """收集祖先链上的问答轮次，按时间顺序返回，并标注优先级。
+
+    父节点中被引用（知识延伸选区所在）的轮次优先级最高，其后按距离由近及远、同一节点内由新到旧。
+    """
+    turns: list[Turn] = []
+    rank = 1
+    for depth, ancestor in enumerate(ancestor_chain(nodes, edges, node_id)):
+        context = (ancestor.get("data") or {}).get("context") or []
+        node_turns: list[Turn] = []
+        for idx in range(len(context) - 1, -1, -1):
+            qa = context[idx] if isinstance(context[idx], dict) else {}
+            answer = qa.get("llmResponse")
+            if not answer:
+                continue
+            focused = depth == 0 and focus_index is not None and idx == focus_index
+            node_turns.insert(0, Turn(str(qa.get("question") or ""), str(answer), 0 if focused else rank))
+            rank += 1
+        turns[:0] = node_turns
+    return turns
+
+
+def pack_turns(turns: list[Turn], budget: int) -> list[BaseMessage]:
+    """在预算内按优先级挑选轮次；放不下的轮次截断回答，仍放不下则丢弃。结果保持时间顺序"""
+    chosen: dict[int, Turn] = {}
+    remaining = budget
+    for pos in sorted(range(len(turns)), key=lambda i: turns[i].priority):
+        turn = turns[pos]
+        cost = turn.tokens
+        if cost <= remaining:
+            chosen[pos] = turn
+            remaining -= cost
+            continue
+        answer_budget = remaining - count_tokens(turn.question) - 8
+        if answer_budget >= CONTEXT_MIN_TURN_TOKENS:
+            chosen[pos] = Turn(turn.question, truncate_tokens(turn.answer, answer_budget), turn.priority)
+            remaining -= chosen[pos].tokens
+    messages: list[BaseMessage] = []
+    for pos in sorted(chosen):
+        messages.append(HumanMessage(content=chosen[pos].question))
+        messages.append(AIMessage(content=chosen[pos].answer))
+    return messages
+
+
+@dataclass
+class AskContext:
+    """单次调用的运行时上下文：祖先分支轮次、token 预算、是否使用回答缓存及用量记在哪个用户名下"""
+    branch_turns: list[Turn] = field(default_factory=list)
+    token_budget: int = CONTEXT_TOKEN_BUDGET
+    use_cache: bool = False
+    user_id: int | None = None
+
+
+def assemble_messages(messages: list[BaseMessage], branch: list[Turn], budget: int) -> list[BaseMessage]:
+    """组装发给模型的消息：祖先分支 + 本线程近期历史 + 当前问题，总量不超过预算。
+
+    线程状态（checkpointer）中保存的完整历史不受影响，只裁剪本次调用的视图。
+    """
+    if not messages:
+        return messages
+    system = [m for m in messages if isinstance(m, SystemMessage)]
+    history = [m for m in messages if not isinstance(m, SystemMessage)]
+    current, history = history[-1:], history[:-1]
+    remaining = budget - sum(_message_tokens(m) for m in current)
+
+    branch_need = sum(t.tokens for t in branch)
+    reserve = min(branch_need, max(0, int(remaining * CONTEXT_ANCESTOR_SHARE)))
+    kept: list[BaseMessage] = []
+    history_budget = remaining - reserve
+    for message in reversed(history):
+        cost = _message_tokens(message)
+        if cost > history_budget:
+            break
+        kept.insert(0, message)
+        history_budget -= cost
+    # AI 回复不能脱离对应的提问单独出现
+    while kept and not isinstance(kept[0], HumanMessage):
+        history_budget += _message_tokens(kept.pop(0))
+    prefix = pack_turns(branch, reserve + history_budget) if branch else []
+    return [*system, *prefix, *kept, *current]
+
+
+class TokenBudgetMiddleware(AgentMiddleware):
+    """在模型调用前按 token 预算重组消息"""
+
+    def _rewrite(self, request: ModelRequest) -> ModelRequest:
+        ctx = request.runtime.context if request.runtime is not None else None
+        branch = ctx.branch_turns if isinstance(ctx, AskContext) else []
+        budget = ctx.token_budget if isinstance(ctx, AskContext) else CONTEXT_TOKEN_BUDGET
+        return request.override(messages=assemble_messages(request.messages, branch, budget))
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]):
+        return handler(self._rewrite(request))
+
+    async def awrap_model_call(self, request: ModelRequest,
+                               handler: Callable[[ModelRequest], Awaitable[ModelResponse]]):
+        return await handler(self._rewrite(request))
@@ -0,0 +1,180 @@
+"""上游模型调用的调度：按模型限制并发，名额不足时在用户之间加权公平排队。
+
+- 公平排队采用 start-time fair queueing：每个请求的虚拟开始时间为 max(当前虚拟时间, 该用户上一请求的虚拟完成时间)，
+  完成时间 = 开始时间 + cost / weight；空出名额时派发开始时间最小的请求。
+  连续提交大量请求的用户只会排在自己之前的请求之后，不会挤占其他用户，权重为 2 的用户获得约两倍的名额
+- 削峰：某模型排队数达到 LLM_MAX_QUEUE_PER_MODEL、或某用户在该模型上的排队数达到 LLM_MAX_QUEUE_PER_USER 时立即拒绝，
+  排队超过 LLM_ACQUIRE_TIMEOUT 秒同样视为过载
+- 全部状态只在事件循环线程中修改，无需加锁
+"""
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable
+
+from backend.app.core.metrics import SPAN_SECONDS, registry
+
+_env = os.getenv
+# 每个上游模型允许同时在途的请求数；超出的请求在事件循环里排队，不占用线程
+LLM_MAX_CONCURRENCY_PER_MODEL = int(_env("LLM_MAX_CONCURRENCY_PER_MODEL", "32"))
+# 按模型覆盖并发上限，如 {"Qwen/Qwen2.5-72B-Instruct": 8}
+LLM_MODEL_CONCURRENCY: dict[str, int] = json.loads(_env("LLM_MODEL_CONCURRENCY", "{}"))
+# 排队等待上限（秒），超时视为过载
+LLM_ACQUIRE_TIMEOUT = float(_env("LLM_ACQUIRE_TIMEOUT", "60"))
+# 每个模型 / 每个用户在每个模型上的最大排队数，超出时立即拒绝（0 表示不限）
+LLM_MAX_QUEUE_PER_MODEL = int(_env("LLM_MAX_QUEUE_PER_MODEL", "256"))
+LLM_MAX_QUEUE_PER_USER = int(_env("LLM_MAX_QUEUE_PER_USER", "16"))
+
+LLM_SHED = registry.counter("aitu_llm_limiter_shed_total", "Calls rejected by the model scheduler", ["model", "reason"])
+
+
+class ModelBusyError(Exception):
+    """排队数超限或等待模型并发名额超时；reason: queue_full / user_queue_full / timeout"""
+
+    def __init__(self, model: str, reason: str = "timeout"):
+        super().__init__(f"model '{model}' is busy ({reason})")
+        self.model = model
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("user", "future")
+
+    def __init__(self, user: Hashable, future: asyncio.Future):
+        self.user = user
+        self.future = future
+
+
+class _ModelQueue:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.vtime = 0.0
+        self.finish: dict[Hashable, float] = {}  # 各用户最近一个请求的虚拟完成时间
+        self.heap: list[tuple[float, int, _Waiter]] = []
+        self.waiting = 0
+        self.user_waiting: dict[Hashable, int] = {}
+
+    def tag(self, user: Hashable, cost: float, weight: float) -> tuple[float, float]:
+        start = max(self.vtime, self.finish.get(user, 0.0))
+        finish = self.finish[user] = start + cost / max(weight, 1e-6)
+        return start, finish
+
+    def dispatch(self, start: float) -> None:
+        self.in_flight += 1
+        self.vtime = max(self.vtime, start)
+        if len(self.finish) > 1024:
+            # 完成时间不晚于虚拟时间的用户与从未出现过等价
+            self.finish = {user: f for user, f in self.finish.items() if f > self.vtime}
+
+    def dequeued(self, user: Hashable) -> None:
+        self.waiting -= 1
+        left = self.user_waiting[user] - 1
+        if left:
+            self.user_waiting[user] = left
+        else:
+            del self.user_waiting[user]
+
+
+class ModelLimiter:
+    """按模型名划分的异步并发限制器，名额不足时按用户加权公平排队"""
+
+    def __init__(self, limit: int = LLM_MAX_CONCURRENCY_PER_MODEL, acquire_timeout: float = LLM_ACQUIRE_TIMEOUT,
+                 model_limits: dict[str, int] | None = None, max_queue: int = LLM_MAX_QUEUE_PER_MODEL,
+                 max_queue_per_user: int = LLM_MAX_QUEUE_PER_USER):
+        self.limit = limit
+        self.acquire_timeout = acquire_timeout
+        self.model_limits = LLM_MODEL_CONCURRENCY if model_limits is None else model_limits
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self._queues: dict[str, _ModelQueue] = {}
+        self._seq = itertools.count()
+
+    def _queue(self, model: str) -> _ModelQueue:
+        queue = self._queues.get(model)
+        if queue is None:
+            queue = self._queues[model] = _ModelQueue(self.model_limits.get(model, self.limit))
+        return queue
+
+    def _shed(self, model: str, reason: str) -> ModelBusyError:
+        LLM_SHED.inc(model=model, reason=reason)
+        return ModelBusyError(model, reason)
+
+    def _release(self, queue: _ModelQueue) -> None:
+        queue.in_flight -= 1
+        while queue.heap and queue.in_flight < queue.limit:
+            start, _, waiter = heapq.heappop(queue.heap)
+            if waiter.future.done():  # 已超时或取消
+                continue
+            queue.dequeued(waiter.user)
+            queue.dispatch(start)
+            waiter.future.set_result(None)
+
+    async def _acquire(self, model: str, queue: _ModelQueue, user: Hashable, weight: float, cost: float) -> None:
+        if queue.in_flight < queue.limit and not queue.waiting:
+            queue.heap.clear()  # 只剩已超时或取消的等待者
+            queue.dispatch(queue.tag(user, cost, weight)[0])
+            return
+        if self.max_queue and queue.waiting >= self.max_queue:
+            raise self._shed(model, "queue_full")
+        if self.max_queue_per_user and queue.user_waiting.get(user, 0) >= self.max_queue_per_user:
+            raise self._shed(model, "user_queue_full")
+        start, finish = queue.tag(user, cost, weight)
+        waiter = _Waiter(user, asyncio.get_running_loop().create_future())
+        heapq.heappush(queue.heap, (start, next(self._seq), waiter))
+        queue.waiting += 1
+        queue.user_waiting[user] = queue.user_waiting.get(user, 0) + 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.acquire_timeout)
+        except BaseException as exc:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 名额已分配但调用方已超时或被取消：交给下一个等待者
+                self._release(queue)
+            else:
+                waiter.future.cancel()
+                queue.dequeued(user)
+                if queue.finish.get(user) == finish:
+                    queue.finish[user] = start  # 未被服务的请求不计入该用户的虚拟时间
+            if isinstance(exc, TimeoutError):
+                raise self._shed(model, "timeout") from None
+            raise
+
+    @asynccontextmanager
+    async def slot(self, model: str, user: Hashable = None, weight: float = 1.0,
+                   cost: float = 1.0) -> AsyncIterator[None]:
+        """占用 model 的一个并发名额；user 为公平排队的单位，weight 越大分得的名额越多"""
+        queue = self._queue(model)
+        started = time.perf_counter()
+        try:
+            await self._acquire(model, queue, user, weight, cost)
+        finally:
+            SPAN_SECONDS.observe(time.perf_counter() - started, span="llm.limiter_wait")
+        try:
+            yield
+        finally:
+            self._release(queue)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            model: {"limit": q.limit, "in_flight": q.in_flight, "waiting": q.waiting,
+                    "waiting_users": len(q.user_waiting)}
+            for model, q in self._queues.items()
+        }
+
+
+model_limiter = ModelLimiter()
+
+
+def _collect():
+    stats = model_limiter.stats()
+    for key, help in (("in_flight", "Upstream calls holding a model slot"), ("waiting", "Calls waiting for a model slot"),
+                      ("waiting_users", "Users with calls waiting for a model slot")):
+        yield f"aitu_llm_limiter_{key}", "gauge", help, [({"model": m}, s[key]) for m, s in stats.items()]
+
+
+registry.register_collector(_collect)
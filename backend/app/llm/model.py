@@ -1,36 +1,113 @@
 import os
-from pathlib import Path
-from dotenv import load_dotenv
+from typing import Any, AsyncIterator
+import httpx
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
 from langchain_openai import ChatOpenAI  # 注意：使用 langchain_openai 而非 langchain
 
-# 加载 .env（与本文件同目录）
-_ENV_PATH = Path(__file__).resolve().parent / ".env"
-if _ENV_PATH.exists():
-    load_dotenv(_ENV_PATH)
-else:
-    # 兼容旧路径调用（容器内可能在 /app 工作目录下）
-    legacy_path = Path.cwd() / "backend" / "llm" / ".env"
-    if legacy_path.exists():
-        load_dotenv(legacy_path)
+from backend.app.llm import resilience
 
+# backend/app/llm/.env 由应用启动时的 core.config.load_env_files 加载，缺少 key 时在启动校验中给出提示
 SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY")
-if not SILICONFLOW_API_KEY:
-    # 提示缺失而不打印泄露
-    raise RuntimeError("Missing SILICONFLOW_API_KEY. Create backend/llm/.env from .env.example and set the key.")
 
 BASE_URL = os.getenv("BASE_URL", "https://api.siliconflow.cn/v1")
 
+# 所有模型实例共享到 BASE_URL 的连接池，复用 keep-alive 连接，省去每次请求的 TLS 握手
+HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "50"))
+_http_limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+shared_http_client = httpx.Client(base_url=BASE_URL, limits=_http_limits)
+shared_http_async_client = httpx.AsyncClient(base_url=BASE_URL, limits=_http_limits)
 
-# 封装 SiliconFlow 为 LangChain 兼容的模型
+
+# 流式响应中相邻 chunk 的最长间隔（秒），超过视为上游卡住
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+
+
+# 封装 SiliconFlow 为 LangChain 兼容的模型；上游调用经 resilience 策略（期限、重试、对冲、熔断、备用模型）
 class SiliconFlowChatModel(ChatOpenAI):
+    fallback_model: str | None = resilience.LLM_FALLBACK_MODEL
+
     def __init__(self, **kwargs):
+        kwargs.setdefault("http_client", shared_http_client)
+        kwargs.setdefault("http_async_client", shared_http_async_client)
+        # 重试由策略层统一处理，关闭 openai SDK 自带的重试以免叠加
+        kwargs.setdefault("max_retries", 0)
+        # 流式响应末尾附带 token 用量（stream_options.include_usage），用于按模型统计
+        kwargs.setdefault("stream_usage", True)
+        kwargs.setdefault("timeout", httpx.Timeout(LLM_READ_TIMEOUT, connect=10.0))
         # 硬编码 SiliconFlow 的 Base URL 和 API Key
+        kwargs.setdefault("base_url", BASE_URL)
         super().__init__(
             # api_key=SILICONFLOW_API_KEY,
-            base_url=BASE_URL,
             **kwargs
         )
 
+    def _policy_key(self) -> tuple[str, str]:
+        return (self.openai_api_base or BASE_URL, self.model_name)
+
+    def _fallback(self) -> "SiliconFlowChatModel | None":
+        if not self.fallback_model or self.fallback_model == self.model_name:
+            return None
+        resilience.upstream_policy.counters["fallbacks"] += 1
+        return self.model_copy(update={"model_name": self.fallback_model, "fallback_model": None})
+
+    def _generate(self, messages: list[BaseMessage], stop: list[str] | None = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        parent = super()._generate
+        try:
+            return resilience.upstream_policy.call(
+                self._policy_key(), lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs))
+        except Exception as exc:
+            fallback = self._fallback() if resilience.is_unavailable(exc) else None
+            if fallback is None:
+                raise
+            return fallback._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: list[str] | None = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        parent = super()._agenerate
+        try:
+            # 对冲时可能并发两次，不传 run_manager，避免重复回调
+            return await resilience.upstream_policy.acall(
+                self._policy_key(), lambda: parent(messages, stop=stop, **kwargs))
+        except Exception as exc:
+            fallback = self._fallback() if resilience.is_unavailable(exc) else None
+            if fallback is None:
+                raise
+            return await fallback._agenerate(messages, stop=stop, **kwargs)
+
+    async def _astream(self, messages: list[BaseMessage], stop: list[str] | None = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        """策略作用于“拿到首个 chunk”之前；开始输出后不再重试，避免客户端收到重复内容"""
+        parent = super()._astream
+
+        async def open_stream():
+            stream = parent(messages, stop=stop, **kwargs)
+            try:
+                return await anext(stream, None), stream
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        try:
+            first, stream = await resilience.upstream_policy.acall(
+                self._policy_key(), open_stream, kind="stream", discard=lambda r: r[1].aclose())
+        except Exception as exc:
+            fallback = self._fallback() if resilience.is_unavailable(exc) else None
+            if fallback is None:
+                raise
+            async for chunk in fallback._astream(messages, stop=stop, **kwargs):
+                yield chunk
+            return
+        try:
+            if first is not None:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+        finally:
+            await stream.aclose()
+
 # model = SiliconFlowChatModel(model="THUDM/glm-4-9b-chat")
 
 # model = SiliconFlowChatModel(model="THUDM/GLM-Z1-32B-0414")
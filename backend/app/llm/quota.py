@@ -0,0 +1,230 @@
+"""按用户 / 模型的 token 用量记账与每日配额。
+
+- 用量由 UsageMiddleware 在每次上游调用后记入内存，每 LLM_USAGE_FLUSH_INTERVAL 秒合并为一次事务写入 llm_usage
+- 配额在请求发往上游之前检查（interaction 路由在占用模型名额前调用 check），已用量不低于配额时拒绝；
+  检查只看已完成调用的用量，最后一次放行的调用可能略微超出配额
+- 多个 worker 共享数据库中的用量，本进程缓存的用量与用户配置每 LLM_USAGE_REFRESH 秒从数据库刷新
+"""
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from backend.app.core.metrics import stats_collector
+from backend.app.models.usage import LLMUsage, UserQuota
+
+logger = logging.getLogger(__name__)
+
+_env = os.getenv
+# 每个用户每天（UTC）可用的 token 数（prompt + completion，所有模型合计），0 表示不限
+LLM_DAILY_TOKEN_QUOTA = int(_env("LLM_DAILY_TOKEN_QUOTA", "0"))
+# 按模型的每用户每日配额，如 {"Qwen/Qwen2.5-72B-Instruct": 200000}
+LLM_MODEL_DAILY_TOKEN_QUOTAS: dict[str, int] = json.loads(_env("LLM_MODEL_DAILY_TOKEN_QUOTAS", "{}"))
+LLM_USAGE_FLUSH_INTERVAL = float(_env("LLM_USAGE_FLUSH_INTERVAL", "2"))
+LLM_USAGE_REFRESH = float(_env("LLM_USAGE_REFRESH", "30"))
+
+
+class QuotaExceededError(Exception):
+    """当日 token 配额已用完；model 为 None 表示所有模型合计的配额"""
+
+    def __init__(self, model: str | None, used: int, limit: int, retry_after: int):
+        super().__init__(f"daily token quota exceeded ({used}/{limit})" + (f" for model '{model}'" if model else ""))
+        self.model = model
+        self.used = used
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+@dataclass
+class QuotaPolicy:
+    daily_tokens: int  # 0 表示不限
+    weight: float = 1.0
+
+
+def _day(now: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(now))
+
+
+class UsageLedger:
+    def __init__(self, engine: Engine | None = None, daily_tokens: int = LLM_DAILY_TOKEN_QUOTA,
+                 model_quotas: dict[str, int] | None = None, flush_interval: float = LLM_USAGE_FLUSH_INTERVAL,
+                 refresh: float = LLM_USAGE_REFRESH, clock: Callable[[], float] = time.time):
+        self._engine = engine
+        self.daily_tokens = daily_tokens
+        self.model_quotas = LLM_MODEL_DAILY_TOKEN_QUOTAS if model_quotas is None else model_quotas
+        self.flush_interval = flush_interval
+        self.refresh = refresh
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        # (user_id, model, day) -> [requests, prompt_tokens, completion_tokens]，尚未写库 / 正在写库
+        self._pending: dict[tuple[int, str, str], list[int]] = {}
+        self._flushing: dict[tuple[int, str, str], list[int]] = {}
+        # (user_id, day) -> (刷新时间, {model: tokens})，含本进程尚未写库的用量
+        self._used: dict[tuple[int, str], tuple[float, dict[str, int]]] = {}
+        self._policies: dict[int, tuple[float, QuotaPolicy]] = {}
+        self.counters = {"recorded_calls": 0, "flushes": 0, "flush_errors": 0, "rejected": 0}
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            from backend.app.db.base import engine
+            self._engine = engine
+        return self._engine
+
+    def reset(self, engine: Engine | None = None) -> None:
+        """丢弃内存中的用量与缓存（测试切换数据库时使用）"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._engine = engine
+            self._pending.clear()
+            self._flushing.clear()
+            self._used.clear()
+            self._policies.clear()
+
+    def policy(self, user_id: int) -> QuotaPolicy:
+        now = self._clock()
+        cached = self._policies.get(user_id)
+        if cached is not None and now - cached[0] < self.refresh:
+            return cached[1]
+        with Session(self.engine) as session:
+            row = session.get(UserQuota, user_id)
+        policy = QuotaPolicy(daily_tokens=self.daily_tokens if row is None or row.daily_tokens is None
+                             else row.daily_tokens, weight=row.weight if row is not None else 1.0)
+        self._policies[user_id] = (now, policy)
+        return policy
+
+    def usage(self, user_id: int) -> dict[str, int]:
+        """当日各模型已用 token（数据库 + 本进程未写库部分）"""
+        now = self._clock()
+        day = _day(now)
+        cached = self._used.get((user_id, day))
+        if cached is not None and now - cached[0] < self.refresh:
+            return dict(cached[1])
+        with Session(self.engine) as session:
+            rows = session.exec(select(LLMUsage).where(LLMUsage.user_id == user_id, LLMUsage.day == day)).all()
+        used = {row.model: row.prompt_tokens + row.completion_tokens for row in rows}
+        with self._lock:
+            for source in (self._flushing, self._pending):
+                for (uid, model, d), (_, prompt, completion) in source.items():
+                    if uid == user_id and d == day:
+                        used[model] = used.get(model, 0) + prompt + completion
+            self._used[(user_id, day)] = (now, used)
+            if len(self._used) > 4096:
+                self._used = {key: value for key, value in self._used.items() if key[1] == day}
+        return dict(used)
+
+    def check(self, user_id: int, model: str) -> QuotaPolicy:
+        """请求发往上游前调用：超出配额时抛出 QuotaExceededError，否则返回该用户的配额与调度权重"""
+        policy = self.policy(user_id)
+        limit = self.model_quotas.get(model, 0)
+        if not policy.daily_tokens and not limit:
+            return policy
+        used = self.usage(user_id)
+        retry_after = 86400 - int(self._clock()) % 86400  # 到下一个 UTC 零点
+        total = sum(used.values())
+        if policy.daily_tokens and total >= policy.daily_tokens:
+            self.counters["rejected"] += 1
+            raise QuotaExceededError(None, total, policy.daily_tokens, retry_after)
+        if limit and used.get(model, 0) >= limit:
+            self.counters["rejected"] += 1
+            raise QuotaExceededError(model, used[model], limit, retry_after)
+        return policy
+
+    def record(self, user_id: int, model: str, prompt_tokens: int, completion_tokens: int) -> None:
+        """记入一次上游调用的用量（只修改内存，稍后由后台线程写库）"""
+        day = _day(self._clock())
+        with self._lock:
+            entry = self._pending.setdefault((user_id, model, day), [0, 0, 0])
+            entry[0] += 1
+            entry[1] += prompt_tokens
+            entry[2] += completion_tokens
+            cached = self._used.get((user_id, day))
+            if cached is not None:
+                cached[1][model] = cached[1].get(model, 0) + prompt_tokens + completion_tokens
+            self.counters["recorded_calls"] += 1
+            if self._timer is None and self.flush_interval > 0:
+                self._timer = threading.Timer(self.flush_interval, self._flush_later)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_later(self) -> None:
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("failed to persist LLM usage")
+
+    def flush(self) -> None:
+        """把内存中的用量合并写入 llm_usage（同一行的多次调用合并为一次累加）"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                self._flushing, self._pending = self._pending, {}
+            try:
+                with Session(self.engine) as session:
+                    for (user_id, model, day), (requests, prompt, completion) in sorted(self._flushing.items()):
+                        self._add(session, user_id, model, day, requests, prompt, completion)
+                    session.commit()
+            except BaseException:
+                with self._lock:
+                    self.counters["flush_errors"] += 1
+                    for key, values in self._flushing.items():
+                        entry = self._pending.setdefault(key, [0, 0, 0])
+                        for i, value in enumerate(values):
+                            entry[i] += value
+                    self._flushing = {}
+                raise
+            with self._lock:
+                self._flushing = {}
+                self.counters["flushes"] += 1
+
+    @staticmethod
+    def _add(session: Session, user_id: int, model: str, day: str, requests: int, prompt: int,
+             completion: int) -> None:
+        where = (LLMUsage.user_id == user_id, LLMUsage.model == model, LLMUsage.day == day)
+        values = {"requests": LLMUsage.requests + requests, "prompt_tokens": LLMUsage.prompt_tokens + prompt,
+                  "completion_tokens": LLMUsage.completion_tokens + completion}
+        if session.exec(update(LLMUsage).where(*where).values(**values)).rowcount:
+            return
+        try:
+            with session.begin_nested():
+                session.add(LLMUsage(user_id=user_id, model=model, day=day, requests=requests,
+                                     prompt_tokens=prompt, completion_tokens=completion))
+        except IntegrityError:
+            # 其它 worker 刚插入同一行
+            session.exec(update(LLMUsage).where(*where).values(**values))
+
+    def report(self, user_id: int) -> dict:
+        """当日用量与配额（/interaction/usage）"""
+        policy = self.policy(user_id)
+        used = self.usage(user_id)
+        total = sum(used.values())
+        models = {model: {"used": tokens, "limit": self.model_quotas.get(model, 0)} for model, tokens in used.items()}
+        for model, limit in self.model_quotas.items():
+            models.setdefault(model, {"used": 0, "limit": limit})
+        return {"day": _day(self._clock()), "used": total, "limit": policy.daily_tokens,
+                "remaining": max(policy.daily_tokens - total, 0) if policy.daily_tokens else None,
+                "weight": policy.weight, "models": models}
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self.counters, "pending_rows": len(self._pending)}
+
+
+usage_ledger = UsageLedger()
+stats_collector("llm_usage", usage_ledger.stats, "LLM usage ledger")
@@ -0,0 +1,315 @@
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from tenacity import (AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, stop_before_delay,
+                      wait_random_exponential)
+
+from backend.app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
+
+_env = os.getenv
+# 单次请求（非流式为完整回答，流式为首个 chunk）的超时与含重试的总期限（秒）
+LLM_ATTEMPT_TIMEOUT = float(_env("LLM_ATTEMPT_TIMEOUT", "60"))
+LLM_DEADLINE = float(_env("LLM_DEADLINE", "120"))
+# 按模型覆盖总期限，如 {"deepseek-ai/DeepSeek-R1": 300}
+LLM_MODEL_DEADLINES: dict[str, float] = json.loads(_env("LLM_MODEL_DEADLINES", "{}"))
+LLM_MAX_ATTEMPTS = int(_env("LLM_MAX_ATTEMPTS", "3"))
+LLM_RETRY_BASE = float(_env("LLM_RETRY_BASE", "0.5"))
+LLM_RETRY_MAX = float(_env("LLM_RETRY_MAX", "8"))
+# 对冲请求：单次尝试超过近期 p95 仍未返回时再发一个相同请求，取先成功者（会多消耗 token，默认关闭）
+LLM_HEDGE = _env("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_MIN_DELAY = float(_env("LLM_HEDGE_MIN_DELAY", "1"))
+LLM_HEDGE_MIN_SAMPLES = int(_env("LLM_HEDGE_MIN_SAMPLES", "20"))
+# 熔断：同一 (BASE_URL, 模型) 连续失败次数阈值与打开后的冷却时间（秒）
+LLM_BREAKER_FAILURES = int(_env("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(_env("LLM_BREAKER_RESET", "30"))
+# 主模型不可用（熔断 / 重试耗尽 / 超时）时改用的备用模型
+LLM_FALLBACK_MODEL = _env("LLM_FALLBACK_MODEL") or None
+
+_LATENCY_WINDOW = 200
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，暂不请求该上游"""
+
+    def __init__(self, key: Hashable, retry_after: float):
+        super().__init__(f"upstream {key} is unavailable, retry after {retry_after:.0f}s")
+        self.key = key
+        self.retry_after = retry_after
+
+
+class UpstreamTimeoutError(TimeoutError):
+    """超过单次超时或总期限"""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """连接失败、超时、429 与 5xx 可重试；其余 4xx 说明请求本身有问题"""
+    # 延迟导入（约 1s）：能走到这里说明上游客户端已加载，路由模块导入本模块时不必付出这部分启动耗时
+    import httpx
+    import openai
+    if isinstance(exc, (TimeoutError, openai.APIConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+def is_rejection(exc: BaseException) -> bool:
+    """上游有响应、只是拒绝了请求本身（不可重试的 4xx）"""
+    import openai
+    return isinstance(exc, openai.APIStatusError) and not is_retryable(exc)
+
+
+def is_unavailable(exc: BaseException) -> bool:
+    """可切换到备用模型的失败"""
+    return isinstance(exc, CircuitOpenError) or is_retryable(exc)
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后打开；冷却后放行一个探测请求（半开），成功则关闭"""
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, reset_after: float = LLM_BREAKER_RESET,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failures = failures
+        self.reset_after = reset_after
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if self._clock() - self._opened_at >= self.reset_after else "open"
+
+    def before(self, key: Hashable) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = self._clock() - self._opened_at
+            if waited < self.reset_after or self._probing:
+                raise CircuitOpenError(key, max(self.reset_after - waited, 1.0))
+            self._probing = True
+
+    def success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            if self._probing or self._consecutive >= self.failures:
+                self._opened_at = self._clock()
+            self._probing = False
+
+    def release(self) -> None:
+        """调用未得到上游结果（被取消或本地出错）：不改变熔断状态，只交还探测名额"""
+        with self._lock:
+            self._probing = False
+
+
+class LatencyTracker:
+    """最近若干次成功请求的耗时，用于计算对冲延迟"""
+
+    def __init__(self, window: int = _LATENCY_WINDOW):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class UpstreamPolicy:
+    """上游调用策略：按键（BASE_URL, 模型[, 流式]）的熔断、总期限内的抖动退避重试与可选对冲"""
+
+    def __init__(self, max_attempts: int = LLM_MAX_ATTEMPTS, attempt_timeout: float = LLM_ATTEMPT_TIMEOUT,
+                 deadline: float = LLM_DEADLINE, model_deadlines: dict[str, float] | None = None,
+                 retry_base: float = LLM_RETRY_BASE, retry_max: float = LLM_RETRY_MAX,
+                 hedge: bool = LLM_HEDGE, hedge_min_delay: float = LLM_HEDGE_MIN_DELAY,
+                 hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+                 breaker_failures: int = LLM_BREAKER_FAILURES, breaker_reset: float = LLM_BREAKER_RESET):
+        self.max_attempts = max_attempts
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.model_deadlines = LLM_MODEL_DEADLINES if model_deadlines is None else model_deadlines
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self._breakers: dict[Hashable, CircuitBreaker] = {}
+        self._latency: dict[Hashable, LatencyTracker] = {}
+        self.counters = {"calls": 0, "retries": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0,
+                         "rejected": 0, "fallbacks": 0}
+
+    def breaker(self, key: tuple[str, str]) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers.setdefault(key, CircuitBreaker(self.breaker_failures, self.breaker_reset))
+        return breaker
+
+    def latency(self, key: Hashable) -> LatencyTracker:
+        tracker = self._latency.get(key)
+        if tracker is None:
+            tracker = self._latency.setdefault(key, LatencyTracker())
+        return tracker
+
+    def deadline_for(self, model: str) -> float:
+        return float(self.model_deadlines.get(model, self.deadline))
+
+    def hedge_delay(self, key: Hashable) -> float | None:
+        tracker = self.latency(key)
+        if not self.hedge or len(tracker) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, tracker.quantile(0.95) or 0.0)
+
+    def _retrying_kwargs(self, key: tuple[str, str]) -> dict[str, Any]:
+        def before_sleep(state) -> None:
+            self.counters["retries"] += 1
+            logger.warning("upstream %s attempt %d failed: %r", key, state.attempt_number, state.outcome.exception())
+
+        return {
+            "stop": stop_after_attempt(self.max_attempts) | stop_before_delay(self.deadline_for(key[1])),
+            "wait": wait_random_exponential(multiplier=self.retry_base, max=self.retry_max),
+            "retry": retry_if_exception(is_retryable),
+            "before_sleep": before_sleep,
+            "reraise": True,
+        }
+
+    async def acall(self, key: tuple[str, str], call: Callable[[], Awaitable[T]], *, kind: str = "invoke",
+                    discard: Callable[[T], Awaitable[Any]] | None = None) -> T:
+        """在熔断/重试/期限/对冲策略下执行 call；discard 用于关闭对冲中落败但已返回的结果（如流）"""
+        breaker = self.breaker(key)
+        loop = asyncio.get_running_loop()
+        end = loop.time() + self.deadline_for(key[1])
+        self.counters["calls"] += 1
+        async for attempt in AsyncRetrying(**self._retrying_kwargs(key)):
+            with attempt:
+                try:
+                    breaker.before(key)
+                except CircuitOpenError:
+                    self.counters["rejected"] += 1
+                    raise
+                timeout = min(self.attempt_timeout, end - loop.time())
+                try:
+                    result = await self._attempt((*key, kind), call, timeout, discard)
+                except BaseException as exc:
+                    if isinstance(exc, UpstreamTimeoutError):
+                        self.counters["timeouts"] += 1
+                    if is_retryable(exc):
+                        breaker.failure()
+                    elif is_rejection(exc):
+                        breaker.success()  # 上游有响应，只是请求本身被拒绝
+                    else:
+                        breaker.release()  # 取消（客户端断开、对冲/批量任务取消）或本地异常不能说明上游可用
+                    raise
+                breaker.success()
+                return result
+        raise AssertionError("unreachable")
+
+    async def _attempt(self, key: Hashable, call: Callable[[], Awaitable[T]], timeout: float,
+                       discard: Callable[[T], Awaitable[Any]] | None) -> T:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        end = started + timeout
+        delay = self.hedge_delay(key)
+        primary = asyncio.ensure_future(call())
+        pending = {primary}
+        hedged = False
+        error: BaseException | None = None
+        try:
+            while pending:
+                remaining = end - loop.time()
+                if remaining <= 0:
+                    raise UpstreamTimeoutError(f"upstream {key} did not respond within {timeout:.1f}s")
+                wait = remaining if hedged or delay is None else min(delay - (loop.time() - started), remaining)
+                done, pending = await asyncio.wait(pending, timeout=max(wait, 0), return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in done if t.exception() is None), None)
+                if winner is not None:
+                    for task in done - {winner}:
+                        if task.exception() is None and discard is not None:
+                            await discard(task.result())
+                    if winner is not primary:
+                        self.counters["hedge_wins"] += 1
+                    self.latency(key).record(loop.time() - started)
+                    return winner.result()
+                for task in done:
+                    error = task.exception()
+                if not done and not hedged and delay is not None and end - loop.time() > 0:
+                    hedged = True
+                    self.counters["hedges"] += 1
+                    pending.add(asyncio.ensure_future(call()))
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def call(self, key: tuple[str, str], call: Callable[[], T]) -> T:
+        """同步版本：熔断 + 重试（单次超时由 HTTP 客户端控制，不做对冲）"""
+        breaker = self.breaker(key)
+        self.counters["calls"] += 1
+        for attempt in Retrying(**self._retrying_kwargs(key)):
+            with attempt:
+                breaker.before(key)
+                try:
+                    result = call()
+                except BaseException as exc:
+                    if is_retryable(exc):
+                        breaker.failure()
+                    else:
+                        breaker.success()
+                    raise
+                breaker.success()
+                return result
+        raise AssertionError("unreachable")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.counters,
+            "breakers": {f"{url}|{model}": b.state for (url, model), b in self._breakers.items()},
+            "p95": {"|".join(k): t.quantile(0.95) for k, t in self._latency.items()},
+        }
+
+
+upstream_policy = UpstreamPolicy()
+
+_BREAKER_STATES = {"closed": 0, "open": 1, "half_open": 2}
+
+
+def _collect():
+    policy = upstream_policy
+    yield from (("aitu_upstream_" + key, "gauge", f"Upstream policy: {key}", [({}, value)])
+                for key, value in policy.counters.items())
+    yield ("aitu_upstream_breaker_state", "gauge", "Circuit breaker state (0 closed, 1 open, 2 half-open)",
+           [({"base_url": url, "model": model}, _BREAKER_STATES[b.state]) for (url, model), b in policy._breakers.items()])
+    yield ("aitu_upstream_latency_p95_seconds", "gauge", "Recent p95 latency per upstream key",
+           [({"base_url": k[0], "model": k[1], "kind": k[2]}, t.quantile(0.95) or 0.0) for k, t in policy._latency.items()])
+
+
+registry.register_collector(_collect)
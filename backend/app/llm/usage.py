@@ -0,0 +1,69 @@
+from __future__ import annotations
+import time
+from typing import Awaitable, Callable
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage
+
+from backend.app.core.metrics import registry
+from backend.app.llm.context import AskContext, _message_tokens, count_tokens
+from backend.app.llm.quota import usage_ledger
+
+LLM_TOKENS = registry.counter("aitu_llm_tokens_total", "Tokens used by upstream model calls", ["model", "type"])
+LLM_CALLS = registry.counter("aitu_llm_requests_total", "Upstream model calls", ["model", "outcome"])
+LLM_SECONDS = registry.histogram("aitu_llm_request_duration_seconds", "Upstream model call latency", ["model"])
+
+
+def _model_name(request: ModelRequest) -> str:
+    return str(getattr(request.model, "model_name", None) or "unknown")
+
+
+def response_usage(request: ModelRequest, response: ModelResponse) -> tuple[int, int]:
+    """(prompt_tokens, completion_tokens)；上游未返回用量时按本地分词估算"""
+    messages = response.result if isinstance(response, ModelResponse) else [response]
+    message = next((m for m in reversed(messages) if isinstance(m, AIMessage)), None)
+    usage = message.usage_metadata if message is not None else None
+    if usage:
+        return int(usage.get("input_tokens") or 0), int(usage.get("output_tokens") or 0)
+    prompt = sum(_message_tokens(m) for m in request.messages) + count_tokens(request.system_prompt or "")
+    completion = count_tokens(message.content if isinstance(message.content, str) else str(message.content)) \
+        if message is not None else 0
+    return prompt, completion
+
+
+class UsageMiddleware(AgentMiddleware):
+    """记录每次上游模型调用的耗时、结果与 token 用量（需放在 CompletionCacheMiddleware 之后，命中缓存不计）；
+    运行时上下文带 user_id 时同时记入该用户的用量账本"""
+
+    def _record(self, request: ModelRequest, response: ModelResponse | None, started: float, outcome: str) -> None:
+        model = _model_name(request)
+        LLM_SECONDS.observe(time.perf_counter() - started, model=model)
+        LLM_CALLS.inc(model=model, outcome=outcome)
+        if response is not None:
+            prompt, completion = response_usage(request, response)
+            LLM_TOKENS.inc(prompt, model=model, type="prompt")
+            LLM_TOKENS.inc(completion, model=model, type="completion")
+            ctx = request.runtime.context if request.runtime is not None else None
+            if isinstance(ctx, AskContext) and ctx.user_id is not None:
+                usage_ledger.record(ctx.user_id, model, prompt, completion)
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]):
+        started = time.perf_counter()
+        try:
+            response = handler(request)
+        except BaseException as exc:
+            self._record(request, None, started, type(exc).__name__)
+            raise
+        self._record(request, response, started, "ok")
+        return response
+
+    async def awrap_model_call(self, request: ModelRequest,
+                               handler: Callable[[ModelRequest], Awaitable[ModelResponse]]):
+        started = time.perf_counter()
+        try:
+            response = await handler(request)
+        except BaseException as exc:
+            self._record(request, None, started, type(exc).__name__)
+            raise
+        self._record(request, response, started, "ok")
+        return response
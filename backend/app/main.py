@@ -2,20 +2,28 @@ from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
 from .api.v1.api import api_router
+from .core.config import check_settings, load_env_files
+from .core.metrics import MetricsMiddleware, metrics_endpoint
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="My FastAPI App")
+    load_env_files()
+    # 配置校验先于各路由的启动钩子（后台任务 worker、LLM 预热）执行，配置非法时 worker 不会开始服务
+    app = FastAPI(title="My FastAPI App", on_startup=[check_settings])
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
-        expose_headers=["Authorization", "X-Access-Token"],
+        expose_headers=["Authorization", "X-Access-Token", "X-Next-Cursor", "ETag", "X-Cache"],
     )
 
+    # 最外层：统计包含 CORS 在内的完整处理耗时
+    app.add_middleware(MetricsMiddleware)
+
     app.include_router(api_router, prefix="/api/v1")
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
 
     return app
 
@@ -0,0 +1,31 @@
+from __future__ import annotations
+from sqlalchemy import Column, LargeBinary
+from sqlmodel import SQLModel, Field
+import datetime
+
+class ConversationCheckpoint(SQLModel, table=True):
+    """LangGraph checkpoint（对话线程状态），channel_values 内联序列化"""
+    __tablename__ = "conversation_checkpoint"
+
+    thread_id: str = Field(primary_key=True, max_length=200)
+    checkpoint_ns: str = Field(default="", primary_key=True, max_length=200)
+    checkpoint_id: str = Field(primary_key=True, max_length=64)
+    parent_checkpoint_id: str | None = Field(default=None, max_length=64)
+    type: str = Field(max_length=32)
+    checkpoint: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    meta: bytes = Field(sa_column=Column("metadata", LargeBinary, nullable=False))
+    created_at: str = Field(default_factory=lambda: datetime.datetime.utcnow().isoformat())
+
+class ConversationWrite(SQLModel, table=True):
+    """checkpoint 之后尚未合并的 pending writes"""
+    __tablename__ = "conversation_write"
+
+    thread_id: str = Field(primary_key=True, max_length=200)
+    checkpoint_ns: str = Field(default="", primary_key=True, max_length=200)
+    checkpoint_id: str = Field(primary_key=True, max_length=64)
+    task_id: str = Field(primary_key=True, max_length=64)
+    idx: int = Field(primary_key=True)
+    channel: str = Field(max_length=200)
+    type: str = Field(max_length=32)
+    value: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    task_path: str = Field(default="", max_length=500)
@@ -0,0 +1,16 @@
+from __future__ import annotations
+from sqlmodel import SQLModel, Field
+
+
+class CompletionCacheEntry(SQLModel, table=True):
+    """相同模型输入（模型参数 + system prompt + 规范化消息）的回答缓存"""
+    __tablename__ = "completion_cache"
+
+    key: str = Field(primary_key=True, max_length=64)  # sha256
+    model: str | None = Field(default=None, max_length=200)
+    content: str = Field()
+    prompt_tokens: int = Field(default=0)
+    completion_tokens: int = Field(default=0)
+    created_at: float = Field(index=True)  # epoch 秒，TTL 以写入时间计
+    last_used_at: float = Field(index=True)  # 超出条数上限时按最久未用淘汰
+    hits: int = Field(default=0)
@@ -1,10 +1,56 @@
 from __future__ import annotations
+from sqlalchemy import Column, Index, LargeBinary
 from sqlmodel import SQLModel, Field
 import datetime
 
 class Graph(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
     title: str = Field(index=True, max_length=200)
-    data: str = Field()  # JSON serialized nodes/edges
+    data: str | None = Field(default=None)  # 旧版：JSON serialized nodes/edges
+    payload: bytes | None = Field(default=None, sa_column=Column(LargeBinary))  # 整图快照，见 utils.graph_utils 存储格式
     exported_at: str = Field(default_factory=lambda: datetime.datetime.utcnow().isoformat())
     owner_id: int | None = Field(default=None, foreign_key="user.id")
+    version: int = Field(default=0)  # 每次写入 +1，用于 PATCH 乐观并发控制
+    content_hash: str | None = Field(default=None, max_length=16)  # 写入时计算的响应内容摘要，用作 ETag
+
+    @property
+    def stored(self) -> str | bytes | None:
+        """整图快照：新格式在 payload，旧数据仍在 data"""
+        return self.payload if self.payload is not None else self.data
+
+class GraphNode(SQLModel, table=True):
+    """按节点拆分的存储，与 Graph 整图快照在同一事务内同步写入，用于局部读取与服务端查询"""
+    __tablename__ = "graph_node"
+    __table_args__ = (
+        Index("ix_graph_node_parent", "graph_id", "parent_id"),
+        Index("ix_graph_node_type", "graph_id", "type"),
+        Index("ix_graph_node_viewport", "graph_id", "pos_x", "pos_y"),
+    )
+
+    graph_id: int = Field(foreign_key="graph.id", primary_key=True)
+    node_id: str = Field(primary_key=True, max_length=100)
+    position: int = Field(default=0)  # 在 nodes 数组中的顺序
+    parent_id: str | None = Field(default=None, max_length=100)
+    type: str | None = Field(default=None, max_length=50)
+    title: str | None = Field(default=None, max_length=200)  # 首个问题
+    pos_x: float = Field(default=0)
+    pos_y: float = Field(default=0)
+    data: str = Field()  # 节点完整 JSON
+    content_hash: str = Field(max_length=16)  # 仅覆盖 type + data（内容），拖动位置不改变
+    created_at: str = Field(default_factory=lambda: datetime.datetime.utcnow().isoformat(), index=True)
+    updated_at: str = Field(default_factory=lambda: datetime.datetime.utcnow().isoformat(), index=True)
+
+class GraphEdge(SQLModel, table=True):
+    __tablename__ = "graph_edge"
+    __table_args__ = (
+        Index("ix_graph_edge_source", "graph_id", "source"),
+        Index("ix_graph_edge_target", "graph_id", "target"),
+    )
+
+    graph_id: int = Field(foreign_key="graph.id", primary_key=True)
+    edge_id: str = Field(primary_key=True, max_length=200)
+    position: int = Field(default=0)
+    source: str | None = Field(default=None, max_length=100)
+    target: str | None = Field(default=None, max_length=100)
+    data: str = Field()
+    content_hash: str = Field(max_length=16)
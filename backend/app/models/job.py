@@ -0,0 +1,31 @@
+from __future__ import annotations
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+
+class Job(SQLModel, table=True):
+    """后台任务队列（见 app.jobs），状态: queued / running / succeeded / failed / cancelled"""
+    __table_args__ = (
+        Index("ix_job_claim", "status", "run_after"),
+        Index("ix_job_owner", "owner_id", "id"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    kind: str = Field(max_length=50)
+    owner_id: int | None = Field(default=None, foreign_key="user.id")
+    status: str = Field(default="queued", max_length=20)
+    payload: str = Field(default="{}")  # JSON
+    result: str | None = Field(default=None)  # JSON
+    error: str | None = Field(default=None)
+    progress: float = Field(default=0)  # 0~1
+    message: str | None = Field(default=None, max_length=200)
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=3)
+    cancel_requested: bool = Field(default=False)
+    worker: str | None = Field(default=None, max_length=100)
+    # epoch 秒
+    created_at: float = Field()
+    run_after: float = Field()  # 重试退避：早于该时间不会被领取
+    started_at: float | None = Field(default=None)
+    heartbeat_at: float | None = Field(default=None)  # 超过租约未更新视为 worker 已退出，任务重新入队
+    finished_at: float | None = Field(default=None)
@@ -0,0 +1,30 @@
+from __future__ import annotations
+from sqlalchemy import DDL, Index, event
+from sqlmodel import SQLModel, Field
+
+
+class NodeSearchDoc(SQLModel, table=True):
+    """全文检索文档，每个节点一行，与节点表在同一事务内增量维护。
+
+    倒排索引随方言不同：SQLite 为 FTS5 虚表 node_fts（rowid = id），PostgreSQL 为 tsv 列 + GIN 索引；
+    两者都由下方 DDL 事件创建，内容为 search.text 预切分的词（CJK 按单字 + 二字组）。
+    """
+    __tablename__ = "node_search"
+    __table_args__ = (Index("ix_node_search_node", "graph_id", "node_id", unique=True),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    graph_id: int = Field(foreign_key="graph.id")
+    node_id: str = Field(max_length=100)
+    owner_id: int | None = Field(default=None, index=True)
+    body: str = Field()  # 原文，用于生成摘要片段
+
+
+_table = NodeSearchDoc.__table__
+event.listen(_table, "after_create", DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS node_fts USING fts5(tokens, tokenize='unicode61')"
+).execute_if(dialect="sqlite"))
+event.listen(_table, "before_drop", DDL("DROP TABLE IF EXISTS node_fts").execute_if(dialect="sqlite"))
+event.listen(_table, "after_create", DDL("ALTER TABLE node_search ADD COLUMN tsv tsvector").execute_if(dialect="postgresql"))
+event.listen(_table, "after_create", DDL(
+    "CREATE INDEX IF NOT EXISTS ix_node_search_tsv ON node_search USING GIN (tsv)"
+).execute_if(dialect="postgresql"))
@@ -0,0 +1,23 @@
+from __future__ import annotations
+from sqlmodel import SQLModel, Field
+
+
+class LLMUsage(SQLModel, table=True):
+    """按用户 / 模型 / 日期（UTC）累计的上游 token 用量，由 app.llm.quota 批量写入；命中回答缓存不计"""
+    __tablename__ = "llm_usage"
+
+    user_id: int = Field(primary_key=True, foreign_key="user.id")
+    model: str = Field(primary_key=True, max_length=200)
+    day: str = Field(primary_key=True, max_length=10)  # YYYY-MM-DD
+    requests: int = Field(default=0)
+    prompt_tokens: int = Field(default=0)
+    completion_tokens: int = Field(default=0)
+
+
+class UserQuota(SQLModel, table=True):
+    """用户级的每日 token 配额与调度权重；没有记录的用户使用 LLM_DAILY_TOKEN_QUOTA 与权重 1"""
+    __tablename__ = "user_quota"
+
+    user_id: int = Field(primary_key=True, foreign_key="user.id")
+    daily_tokens: int | None = Field(default=None)  # None 使用默认配额，0 表示不限
+    weight: float = Field(default=1.0)  # 排队时分得名额的相对比例
@@ -11,6 +11,37 @@ class GraphUpdate(BaseModel):
     title: str = Field(..., min_length=1, max_length=200)
     nodes: List[Any] = Field(default_factory=list)
     edges: List[Any] = Field(default_factory=list)
+    version: int | None = None  # 提供时做冲突检测
+
+class GraphPatch(BaseModel):
+    """增量更新：节点/边按 id upsert 或删除；也可用 ops 提交 RFC 6902 JSON Patch（作用于 {title, nodes, edges}）"""
+    version: int
+    title: str | None = Field(default=None, min_length=1, max_length=200)
+    upsert_nodes: List[Any] = Field(default_factory=list)
+    delete_nodes: List[str] = Field(default_factory=list)
+    upsert_edges: List[Any] = Field(default_factory=list)
+    delete_edges: List[str] = Field(default_factory=list)
+    ops: List[Any] | None = None
+
+class GraphOp(BaseModel):
+    """WebSocket 上提交的节点/边级变更；作用于服务端当前版本，同一节点以后到者为准"""
+    type: str = "op"
+    op_id: str | None = None  # 客户端自定义，随广播原样返回，用于确认自己的提交
+    title: str | None = Field(default=None, min_length=1, max_length=200)
+    upsert_nodes: List[Any] = Field(default_factory=list)
+    delete_nodes: List[str] = Field(default_factory=list)
+    upsert_edges: List[Any] = Field(default_factory=list)
+    delete_edges: List[str] = Field(default_factory=list)
+
+    def changes(self) -> dict:
+        """广播给订阅者的变更内容（省略空字段）"""
+        return {k: v for k, v in self.model_dump(exclude={"type", "op_id"}).items() if v}
+
+class GraphPatchResult(BaseModel):
+    id: int
+    title: str
+    version: int
+    exportedAt: str
 
 class GraphBasic(BaseModel):
     id: int
@@ -22,3 +53,32 @@ class GraphDetail(BaseModel):
     nodes: List[Any]
     edges: List[Any]
     exportedAt: str
+    version: int = 0
+
+class NodeSkeleton(BaseModel):
+    id: str
+    type: str | None = None
+    position: dict
+    title: str | None = None
+    parentId: str | None = None
+
+class GraphSkeleton(BaseModel):
+    """首屏绘制所需的最小数据：节点 id/位置/标题 + 边，不含问答正文"""
+    id: int
+    title: str
+    nodes: List[NodeSkeleton]
+    edges: List[Any]
+    exportedAt: str
+    version: int = 0
+
+class RelatedQuery(BaseModel):
+    k: int = Field(default=10, ge=1, le=100)
+    includeSameGraph: bool = False  # 默认只找其它主题（图）中的相似节点
+    minScore: float | None = Field(default=None, ge=-1, le=1)
+
+class RelatedNode(BaseModel):
+    graphId: int
+    graphTitle: str
+    nodeId: str
+    title: str | None = None
+    score: float
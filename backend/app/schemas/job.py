@@ -0,0 +1,29 @@
+from __future__ import annotations
+import json
+from pydantic import BaseModel, Field
+from typing import Any
+
+from backend.app.models.job import Job
+
+class JobCreate(BaseModel):
+    kind: str = Field(..., min_length=1, max_length=50)  # reindex / summarize_graph
+    payload: dict = Field(default_factory=dict)
+
+class JobStatus(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress: float
+    message: str | None = None
+    result: Any = None
+    error: str | None = None
+    attempts: int
+    createdAt: float
+    startedAt: float | None = None
+    finishedAt: float | None = None
+
+    @classmethod
+    def from_job(cls, job: Job) -> "JobStatus":
+        return cls(id=job.id, kind=job.kind, status=job.status, progress=job.progress, message=job.message,
+                   result=json.loads(job.result) if job.result else None, error=job.error, attempts=job.attempts,
+                   createdAt=job.created_at, startedAt=job.started_at, finishedAt=job.finished_at)
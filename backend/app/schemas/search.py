@@ -0,0 +1,12 @@
+from __future__ import annotations
+from pydantic import BaseModel
+from typing import List
+
+class SearchHit(BaseModel):
+    graphId: int
+    graphTitle: str
+    nodeId: str
+    title: str | None = None
+    snippet: str
+    highlights: List[List[int]]  # snippet 内的命中区间 [start, end)
+    score: float
@@ -0,0 +1,50 @@
+from __future__ import annotations
+import math
+import os
+from collections import Counter
+from typing import Protocol, Sequence
+
+import numpy as np
+import xxhash
+
+from backend.app.search.text import tokenize
+
+_env = os.getenv
+VECTOR_EMBEDDER = _env("VECTOR_EMBEDDER", "hashing")
+VECTOR_DIM = int(_env("VECTOR_DIM", "512"))
+
+
+class Embedder(Protocol):
+    name: str
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """返回 (len(texts), dim) 的 float32 矩阵，每行 L2 归一化（空文本为零向量）"""
+        ...
+
+
+class HashingEmbedder:
+    """特征哈希向量：词/字二元组经 xxhash 映射到固定维度并带符号，词频取对数。
+
+    确定性、无需网络和模型文件；适合发现字面重叠较多的相近问答。
+    """
+    name = "hashing"
+
+    def __init__(self, dim: int = VECTOR_DIM):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token, count in Counter(tokenize(text)).items():
+                h = xxhash.xxh3_64_intdigest(token)
+                out[row, h % self.dim] += (1.0 if h >> 63 else -1.0) * (1.0 + math.log(count))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+def get_embedder() -> Embedder:
+    if VECTOR_EMBEDDER == "hashing":
+        return HashingEmbedder()
+    raise ValueError(f"unsupported VECTOR_EMBEDDER: {VECTOR_EMBEDDER}")
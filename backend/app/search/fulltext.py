@@ -0,0 +1,135 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Sequence
+
+from sqlalchemy import delete, func, text
+from sqlmodel import Session, select
+
+from backend.app.crud.graph import GraphDelta
+from backend.app.models.search import NodeSearchDoc
+from backend.app.search.text import highlight_terms, node_text, query_groups, tokenize
+
+SNIPPET_CHARS = 120
+_CHUNK = 500
+
+
+@dataclass
+class FullTextHit:
+    graph_id: int
+    node_id: str
+    body: str
+    score: float
+
+
+def _dialect(session: Session) -> str:
+    return session.get_bind().dialect.name
+
+
+def _delete_docs(session: Session, graph_id: int, node_ids: Sequence[str] | None) -> None:
+    """删除文档及其倒排记录；node_ids 为 None 时删除整张图"""
+    stmt = select(NodeSearchDoc.id).where(NodeSearchDoc.graph_id == graph_id)
+    chunks = [None] if node_ids is None else [node_ids[i:i + _CHUNK] for i in range(0, len(node_ids), _CHUNK)]
+    for chunk in chunks:
+        ids = list(session.exec(stmt if chunk is None else stmt.where(NodeSearchDoc.node_id.in_(chunk))).all())
+        if not ids:
+            continue
+        if _dialect(session) == "sqlite":
+            session.execute(text("DELETE FROM node_fts WHERE rowid IN (%s)" % ",".join(str(int(i)) for i in ids)))
+        session.exec(delete(NodeSearchDoc).where(NodeSearchDoc.id.in_(ids)))
+
+
+def index_delta(session: Session, owner_id: int | None, graph_id: int, delta: GraphDelta) -> None:
+    """按同步结果增量更新全文索引；由调用方提交事务"""
+    changed = [str(n.get("id")) for n in delta.upserted_nodes]
+    if not changed and not delta.deleted_node_ids:
+        return
+    _delete_docs(session, graph_id, [*changed, *delta.deleted_node_ids])
+    docs = []
+    for node in delta.upserted_nodes:
+        body = node_text(node)
+        if body:
+            docs.append(NodeSearchDoc(graph_id=graph_id, node_id=str(node.get("id")), owner_id=owner_id, body=body))
+    if not docs:
+        return
+    session.add_all(docs)
+    session.flush()
+    params = [{"id": doc.id, "tokens": " ".join(tokenize(doc.body))} for doc in docs]
+    dialect = _dialect(session)
+    if dialect == "sqlite":
+        session.execute(text("INSERT INTO node_fts(rowid, tokens) VALUES (:id, :tokens)"), params)
+    elif dialect == "postgresql":
+        session.execute(text("UPDATE node_search SET tsv = to_tsvector('simple', :tokens) WHERE id = :id"), params)
+
+
+def drop_graph(session: Session, graph_id: int) -> None:
+    _delete_docs(session, graph_id, None)
+
+
+def _fts5_query(groups: list[tuple[str, list[str]]]) -> str:
+    parts = []
+    for kind, tokens in groups:
+        parts.append(f'"{tokens[0]}"*' if kind == "word" else '"%s"' % " ".join(tokens))
+    return " AND ".join(parts)
+
+
+def _tsquery(groups: list[tuple[str, list[str]]]) -> str:
+    parts = []
+    for kind, tokens in groups:
+        parts.append(f"'{tokens[0]}':*" if kind == "word" else " <-> ".join(f"'{t}'" for t in tokens))
+    return " & ".join(f"({p})" for p in parts)
+
+
+def search(session: Session, owner_id: int, query: str, limit: int = 20,
+           graph_id: int | None = None) -> list[FullTextHit]:
+    """按相关度返回当前用户的匹配节点（分数越大越相关）"""
+    groups = query_groups(query)
+    if not groups:
+        return []
+    params = {"owner": owner_id, "limit": limit, "graph": graph_id}
+    graph_filter = "" if graph_id is None else " AND d.graph_id = :graph"
+    dialect = _dialect(session)
+    if dialect == "sqlite":
+        sql = ("SELECT d.graph_id, d.node_id, d.body, -bm25(node_fts) AS score FROM node_fts "
+               "JOIN node_search d ON d.id = node_fts.rowid "
+               f"WHERE node_fts MATCH :q AND d.owner_id = :owner{graph_filter} ORDER BY bm25(node_fts) LIMIT :limit")
+        params["q"] = _fts5_query(groups)
+    elif dialect == "postgresql":
+        sql = ("SELECT d.graph_id, d.node_id, d.body, ts_rank_cd(d.tsv, q) AS score "
+               "FROM node_search d, to_tsquery('simple', :q) q "
+               f"WHERE d.tsv @@ q AND d.owner_id = :owner{graph_filter} ORDER BY score DESC LIMIT :limit")
+        params["q"] = _tsquery(groups)
+    else:
+        return _like_search(session, owner_id, query, limit, graph_id)
+    return [FullTextHit(*row) for row in session.execute(text(sql), params).all()]
+
+
+def _like_search(session: Session, owner_id: int, query: str, limit: int,
+                 graph_id: int | None) -> list[FullTextHit]:
+    """其它方言没有倒排索引：逐词 LIKE 扫描原文（不计相关度，新节点在前）"""
+    body = func.lower(NodeSearchDoc.body)
+    stmt = select(NodeSearchDoc.graph_id, NodeSearchDoc.node_id, NodeSearchDoc.body).where(
+        NodeSearchDoc.owner_id == owner_id, *(body.contains(term, autoescape=True) for term in highlight_terms(query)))
+    if graph_id is not None:
+        stmt = stmt.where(NodeSearchDoc.graph_id == graph_id)
+    rows = session.exec(stmt.order_by(NodeSearchDoc.id.desc()).limit(limit)).all()
+    return [FullTextHit(*row, 0.0) for row in rows]
+
+
+def make_snippet(body: str, query: str, width: int = SNIPPET_CHARS) -> tuple[str, list[tuple[int, int]]]:
+    """截取首个命中附近的原文，返回 (片段, 片段内命中区间列表)"""
+    lower = body.lower()
+    terms = [t for t in highlight_terms(query) if t]
+    first = min((p for p in (lower.find(t) for t in terms) if p >= 0), default=0)
+    start = max(0, first - width // 4)
+    end = min(len(body), start + width)
+    snippet = body[start:end]
+    spans: list[tuple[int, int]] = []
+    window = lower[start:end]
+    for term in terms:
+        pos = window.find(term)
+        while pos >= 0:
+            spans.append((pos, pos + len(term)))
+            pos = window.find(term, pos + len(term))
+    prefix = "…" if start > 0 else ""
+    spans = sorted((s + len(prefix), e + len(prefix)) for s, e in spans)
+    return prefix + snippet + ("…" if end < len(body) else ""), spans
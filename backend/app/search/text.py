@@ -0,0 +1,48 @@
+from __future__ import annotations
+import re
+
+# 连续的 ASCII 字母数字为一个词；CJK 连续片段拆为单字 + 相邻二字组（无需分词词典）
+_TOKEN = re.compile(r"[0-9a-z]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+NODE_TEXT_MAX_CHARS = 4000
+
+
+def tokenize(text: str) -> list[str]:
+    tokens: list[str] = []
+    for match in _TOKEN.finditer(text.lower()):
+        word = match.group(0)
+        if word.isascii():
+            tokens.append(word)
+        else:
+            tokens.extend(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def node_text(node: dict) -> str:
+    """节点的可检索文本：各轮提问与回答"""
+    parts: list[str] = []
+    for qa in (node.get("data") or {}).get("context") or []:
+        if isinstance(qa, dict):
+            parts.extend(str(qa[key]) for key in ("question", "llmResponse") if qa.get(key))
+    label = (node.get("data") or {}).get("label")
+    if not parts and isinstance(label, str):
+        parts.append(label)
+    return "\n".join(parts)[:NODE_TEXT_MAX_CHARS]
+
+
+def query_groups(query: str) -> list[tuple[str, list[str]]]:
+    """把检索串拆为若干组：("word", [词]) 做前缀匹配；("cjk", [二字组...]) 按短语（相邻）匹配"""
+    groups: list[tuple[str, list[str]]] = []
+    for match in _TOKEN.finditer(query.lower()):
+        word = match.group(0)
+        if word.isascii():
+            groups.append(("word", [word]))
+        elif len(word) == 1:
+            groups.append(("cjk", [word]))
+        else:
+            groups.append(("cjk", [word[i:i + 2] for i in range(len(word) - 1)]))
+    return groups
+
+
+def highlight_terms(query: str) -> list[str]:
+    return [m.group(0) for m in _TOKEN.finditer(query.lower())]
@@ -0,0 +1,342 @@
+from __future__ import annotations
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Sequence
+
+import numpy as np
+import xxhash
+
+from backend.app.search.embedding import Embedder, get_embedder
+from backend.app.search.text import node_text
+
+try:  # 跨进程文件锁；不支持的平台上只做进程内加锁
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+_env = os.getenv
+VECTOR_INDEX_ENABLED = _env("VECTOR_INDEX_ENABLED", "true").lower() == "true"
+VECTOR_INDEX_DIR = Path(_env("VECTOR_INDEX_DIR", str(Path(__file__).parent.parent.parent / "data" / "vectors")))
+# 存活向量超过该数量时改用 IVF 近似检索（只扫描与查询最接近的若干簇）
+VECTOR_ANN_THRESHOLD = int(_env("VECTOR_ANN_THRESHOLD", "100000"))
+VECTOR_ANN_NPROBE = int(_env("VECTOR_ANN_NPROBE", "8"))
+VECTOR_MIN_SCORE = float(_env("VECTOR_MIN_SCORE", "0.2"))
+# 同时保持打开的用户索引数（LRU）
+VECTOR_OPEN_INDEXES = int(_env("VECTOR_OPEN_INDEXES", "64"))
+
+Key = tuple[int, str]
+
+
+@dataclass
+class VectorHit:
+    graph_id: int
+    node_id: str
+    score: float
+
+
+class _IVF:
+    """倒排文件索引：球面 k-means 粗聚类，查询时只扫描 nprobe 个最近的簇"""
+
+    def __init__(self, matrix: np.ndarray, rows: np.ndarray, iterations: int = 8, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        nlist = max(1, int(np.sqrt(len(rows))))
+        sample = matrix[np.sort(rng.choice(rows, size=min(len(rows), nlist * 64), replace=False))]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        self.centroids = centroids.astype(np.float32)
+        assign = np.concatenate([np.argmax(matrix[rows[i:i + 65536]] @ self.centroids.T, axis=1)
+                                 for i in range(0, len(rows), 65536)])
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self.lists = [rows[order[bounds[i]:bounds[i + 1]]] for i in range(nlist)]
+        self.max_row = int(rows.max()) if len(rows) else -1
+        self.size = len(rows)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nearest = np.argsort(self.centroids @ query)[::-1][:nprobe]
+        return np.concatenate([self.lists[i] for i in nearest])
+
+
+class UserVectorIndex:
+    """单个用户的向量索引，目录中两个只追加文件：
+
+    - vectors.f32：float32 行向量，以 memmap 方式读取
+    - keys.jsonl：每行 {"r": 行号, "g": graph_id, "n": node_id, "h": 内容摘要}；r 为 -1 表示删除，
+      n 为 null 时删除整张图
+
+    同一 (g, n) 以最后一条记录为准，被覆盖/删除的行成为空洞，空洞多于存活行时压缩重写。
+    多进程共享同一目录：写入持排他文件锁，读取持共享锁并增量读取其它进程追加的记录。
+    """
+
+    def __init__(self, path: Path, dim: int):
+        self.path = path
+        self.dim = dim
+        self._vectors_file = path / "vectors.f32"
+        self._keys_file = path / "keys.jsonl"
+        self._lock = threading.Lock()
+        self._entries: dict[Key, tuple[int, str | None]] = {}
+        self._row_key: dict[int, Key] = {}
+        self._offset = 0
+        self._keys_inode: int | None = None
+        self._matrix: np.ndarray | None = None
+        self._matrix_id: tuple[int, int] | None = None
+        self._alive: tuple[np.ndarray, np.ndarray] | None = None  # (行号, graph_id)
+        self._ann: _IVF | None = None
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.path / "lock", "a") as fh:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    self._refresh()
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _reset(self) -> None:
+        self._entries.clear()
+        self._row_key.clear()
+        self._offset = 0
+        self._alive = None
+        self._ann = None
+
+    def _apply(self, record: dict) -> None:
+        graph_id, node_id, row = record["g"], record.get("n"), record["r"]
+        if row < 0:
+            keys = [k for k in self._entries if k[0] == graph_id] if node_id is None else [(graph_id, node_id)]
+            for key in keys:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._row_key.pop(old[0], None)
+            return
+        key = (graph_id, node_id)
+        old = self._entries.get(key)
+        if old is not None:
+            self._row_key.pop(old[0], None)
+        self._entries[key] = (row, record.get("h"))
+        self._row_key[row] = key
+
+    def _refresh(self) -> None:
+        """读取其它进程（或压缩后）新增的记录"""
+        try:
+            stat = self._keys_file.stat()
+        except FileNotFoundError:
+            self._reset()
+            self._keys_inode = None
+            return
+        if stat.st_ino != self._keys_inode or stat.st_size < self._offset:
+            self._reset()
+            self._keys_inode = stat.st_ino
+        if stat.st_size == self._offset:
+            return
+        with open(self._keys_file, "rb") as fh:
+            fh.seek(self._offset)
+            chunk = fh.read()
+        complete = chunk[:chunk.rfind(b"\n") + 1]  # 忽略写了一半的末行
+        for line in complete.splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._offset += len(complete)
+        self._alive = None
+
+    def _load_matrix(self) -> np.ndarray | None:
+        try:
+            stat = self._vectors_file.stat()
+        except FileNotFoundError:
+            return None
+        rows = stat.st_size // (self.dim * 4)
+        if rows == 0:
+            return None
+        if self._matrix_id != (stat.st_ino, rows):
+            self._matrix = np.memmap(self._vectors_file, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            self._matrix_id = (stat.st_ino, rows)
+        return self._matrix
+
+    def _append(self, records: list[dict], vectors: np.ndarray | None = None) -> None:
+        if vectors is not None and len(vectors):
+            row_bytes = self.dim * 4
+            with open(self._vectors_file, "ab") as fh:
+                start = fh.tell() // row_bytes
+                if fh.tell() % row_bytes:  # 截掉崩溃时写了一半的行，保持行对齐
+                    fh.truncate(start * row_bytes)
+                fh.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            for offset, record in enumerate(r for r in records if r["r"] >= 0):
+                record["r"] = start + offset
+        # 先写向量再写键：崩溃时最多留下未被引用的向量行
+        with open(self._keys_file, "ab") as fh:
+            fh.write(b"".join(json.dumps(r, ensure_ascii=False).encode("utf-8") + b"\n" for r in records))
+        self._refresh()
+
+    def upsert(self, graph_id: int, items: Sequence[tuple[str, str | None]], vectors: np.ndarray) -> int:
+        """写入 (node_id, 内容摘要) 对应的向量；摘要未变的跳过，返回实际写入条数"""
+        with self._locked(exclusive=True):
+            keep = [i for i, (node_id, digest) in enumerate(items)
+                    if digest is None or self._entries.get((graph_id, node_id), (None, None))[1] != digest]
+            if keep:
+                records = [{"r": 0, "g": graph_id, "n": items[i][0], "h": items[i][1]} for i in keep]
+                self._append(records, vectors[keep])
+                self._maybe_compact()
+            return len(keep)
+
+    def delete(self, graph_id: int, node_ids: Sequence[str] | None = None) -> None:
+        """删除指定节点；node_ids 为 None 时删除整张图"""
+        with self._locked(exclusive=True):
+            if node_ids is None:
+                records = [{"r": -1, "g": graph_id, "n": None}]
+            else:
+                records = [{"r": -1, "g": graph_id, "n": n} for n in node_ids if (graph_id, n) in self._entries]
+            if records:
+                self._append(records)
+
+    def vector(self, graph_id: int, node_id: str) -> np.ndarray | None:
+        with self._locked(exclusive=False):
+            entry = self._entries.get((graph_id, node_id))
+            matrix = self._load_matrix()
+            if entry is None or matrix is None or entry[0] >= len(matrix):
+                return None
+            return np.array(matrix[entry[0]])
+
+    def __len__(self) -> int:
+        with self._locked(exclusive=False):
+            return len(self._entries)
+
+    def _alive_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._alive is None:
+            rows = np.fromiter(self._row_key.keys(), dtype=np.int64, count=len(self._row_key))
+            graphs = np.fromiter((k[0] for k in self._row_key.values()), dtype=np.int64, count=len(self._row_key))
+            self._alive = (rows, graphs)
+        return self._alive
+
+    def search(self, query: np.ndarray, k: int = 10, exclude_graph: int | None = None,
+               exclude: Key | None = None, min_score: float = VECTOR_MIN_SCORE) -> list[VectorHit]:
+        with self._locked(exclusive=False):
+            matrix = self._load_matrix()
+            if matrix is None or not self._row_key:
+                return []
+            rows, graphs = self._alive_arrays()
+            in_range = rows < len(matrix)
+            rows, graphs = rows[in_range], graphs[in_range]
+            query = np.asarray(query, dtype=np.float32)
+            if len(rows) > VECTOR_ANN_THRESHOLD:
+                rows, graphs = self._ann_candidates(matrix, rows, query)
+                scores = matrix[np.sort(rows)] @ query if len(rows) else np.empty(0, np.float32)
+                order = np.argsort(rows)
+                rows, graphs = rows[order], graphs[order]
+            else:
+                # 对连续内存整体做矩阵乘比按行取子集更快；空洞行数受压缩约束
+                scores = (matrix[:rows.max() + 1] @ query)[rows] if len(rows) else np.empty(0, np.float32)
+            if exclude_graph is not None:
+                scores[graphs == exclude_graph] = -np.inf
+            if exclude is not None and exclude in self._entries:
+                scores[rows == self._entries[exclude][0]] = -np.inf
+            top = min(k, len(scores))
+            if top == 0:
+                return []
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            return [VectorHit(*self._row_key[int(rows[i])], float(scores[i])) for i in best if scores[i] >= min_score]
+
+    def _ann_candidates(self, matrix: np.ndarray, rows: np.ndarray, query: np.ndarray):
+        if self._ann is None or self._ann.size * 1.1 < len(rows):
+            self._ann = _IVF(matrix, rows)
+        tail = rows[rows > self._ann.max_row]  # 建索引后追加的行直接暴力扫描
+        candidates = np.concatenate([self._ann.candidates(query, VECTOR_ANN_NPROBE), tail])
+        candidates = np.array([r for r in candidates.tolist() if r in self._row_key], dtype=np.int64)
+        graphs = np.fromiter((self._row_key[r][0] for r in candidates.tolist()), dtype=np.int64,
+                             count=len(candidates))
+        return candidates, graphs
+
+    def _maybe_compact(self) -> None:
+        matrix = self._load_matrix()
+        total = 0 if matrix is None else len(matrix)
+        alive = len(self._row_key)
+        if total - alive <= max(1024, alive):
+            return
+        order = sorted(self._entries.items(), key=lambda item: item[1][0])
+        tmp_vectors, tmp_keys = self._vectors_file.with_suffix(".tmp"), self._keys_file.with_suffix(".tmp")
+        with open(tmp_vectors, "wb") as fh:
+            for start in range(0, len(order), 65536):
+                fh.write(np.ascontiguousarray(matrix[[e[1][0] for e in order[start:start + 65536]]]).tobytes())
+        with open(tmp_keys, "wb") as fh:
+            for row, ((graph_id, node_id), (_, digest)) in enumerate(order):
+                fh.write(json.dumps({"r": row, "g": graph_id, "n": node_id, "h": digest},
+                                    ensure_ascii=False).encode("utf-8") + b"\n")
+        os.replace(tmp_vectors, self._vectors_file)
+        os.replace(tmp_keys, self._keys_file)
+        self._matrix, self._matrix_id = None, None
+        self._refresh()
+
+
+class VectorIndexManager:
+    """按用户管理向量索引，并负责把节点文本向量化"""
+
+    def __init__(self, root: Path = VECTOR_INDEX_DIR, embedder: Embedder | None = None,
+                 max_open: int = VECTOR_OPEN_INDEXES):
+        self.root = root
+        self.embedder = embedder or get_embedder()
+        self.max_open = max_open
+        self._lock = threading.Lock()
+        self._indexes: OrderedDict[int, UserVectorIndex] = OrderedDict()
+
+    def get(self, user_id: int) -> UserVectorIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                path = self.root / f"{self.embedder.name}-{self.embedder.dim}" / f"u{user_id}"
+                index = self._indexes[user_id] = UserVectorIndex(path, self.embedder.dim)
+                while len(self._indexes) > self.max_open:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(user_id)
+            return index
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    def index_nodes(self, user_id: int, graph_id: int, nodes: Sequence[dict], deleted_node_ids: Sequence[str] = ()) -> int:
+        """增量更新：只向量化传入的（新增/内容变化的）节点，文本未变的跳过，返回写入的向量数"""
+        index = self.get(user_id)
+        texts = [node_text(n) for n in nodes]
+        items = [(str(n.get("id")), xxhash.xxh3_64_hexdigest(text)) for n, text in zip(nodes, texts)]
+        empty = [items[i][0] for i, text in enumerate(texts) if not text]
+        keep = [i for i, text in enumerate(texts) if text]
+        written = 0
+        if keep:
+            written = index.upsert(graph_id, [items[i] for i in keep], self.embedder.embed([texts[i] for i in keep]))
+        removed = [*deleted_node_ids, *empty]
+        if removed:
+            index.delete(graph_id, removed)
+        return written
+
+    def drop_graph(self, user_id: int, graph_id: int) -> None:
+        self.get(user_id).delete(graph_id)
+
+    def related(self, user_id: int, graph_id: int, node: dict, k: int = 10, include_same_graph: bool = False,
+                min_score: float = VECTOR_MIN_SCORE) -> list[VectorHit]:
+        index = self.get(user_id)
+        node_id = str(node.get("id"))
+        query = index.vector(graph_id, node_id)
+        if query is None:
+            text = node_text(node)
+            if not text:
+                return []
+            query = self.embedder.embed([text])[0]
+        return index.search(query, k, exclude_graph=None if include_same_graph else graph_id,
+                            exclude=(graph_id, node_id), min_score=min_score)
+
+
+vector_indexes = VectorIndexManager()
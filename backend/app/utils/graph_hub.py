@@ -0,0 +1,174 @@
+"""图的实时同步：按图分组的进程内广播中心（WebSocket /graphs/{id}/ws）。
+
+- 序号即图的 version：每次写入（WS 操作、REST PUT/PATCH）版本 +1，并以新版本号广播变更
+- 每张图保留最近 GRAPH_WS_HISTORY 条变更，客户端带 since 重连时补发；缺口超出保留范围时改发整图快照
+- 每个订阅者一个有界发送队列，消息只序列化一次；队列满（慢消费者）时断开该连接，不拖慢其他订阅者，
+  客户端带最后的序号重连即可补齐
+- 多 worker 部署时其他进程的写入不会经本进程广播，客户端发现序号跳变时重连补齐
+"""
+from __future__ import annotations
+import asyncio
+import bisect
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from typing import Any
+
+import orjson
+
+from backend.app.core.metrics import stats_collector
+
+_env = os.getenv
+GRAPH_WS_HISTORY = int(_env("GRAPH_WS_HISTORY", "256"))
+GRAPH_WS_QUEUE = int(_env("GRAPH_WS_QUEUE", "64"))
+# 没有订阅者的图最多保留多少份变更历史（LRU）
+GRAPH_WS_IDLE_CHANNELS = int(_env("GRAPH_WS_IDLE_CHANNELS", "1024"))
+
+# 关闭码：慢消费者（稍后重连）、认证失败、图不存在或已删除
+CLOSE_SLOW_CONSUMER = 1013
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_NOT_FOUND = 4404
+
+
+def encode(message: dict[str, Any]) -> str:
+    return orjson.dumps(message).decode()
+
+
+class Subscriber:
+    """一个 WebSocket 连接；队列元素为 (seq, 文本, 关闭码)，seq 为 None 的是只发给本连接的控制消息"""
+
+    __slots__ = ("id", "graph_id", "queue", "loop", "overflowed")
+
+    def __init__(self, sub_id: str, graph_id: int, queue_size: int):
+        self.id = sub_id
+        self.graph_id = graph_id
+        self.queue: asyncio.Queue[tuple[int | None, str | None, int | None]] = asyncio.Queue(queue_size)
+        self.loop = asyncio.get_running_loop()
+        self.overflowed = False
+
+    def _put(self, item: tuple[int | None, str | None, int | None]) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # 丢弃积压并通知写协程断开
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait((None, None, CLOSE_SLOW_CONSUMER))
+
+    def send(self, message: dict[str, Any], close: int | None = None) -> None:
+        """只发给本连接（须在连接所在事件循环中调用）"""
+        self._put((None, encode(message), close))
+
+
+class _Channel:
+    __slots__ = ("subscribers", "history")
+
+    def __init__(self):
+        self.subscribers: set[Subscriber] = set()
+        self.history: list[tuple[int, str]] = []
+
+
+class GraphHub:
+    def __init__(self, history: int = GRAPH_WS_HISTORY, queue_size: int = GRAPH_WS_QUEUE,
+                 idle_channels: int = GRAPH_WS_IDLE_CHANNELS):
+        self.history = history
+        self.queue_size = queue_size
+        self.idle_channels = idle_channels
+        self._channels: dict[int, _Channel] = {}
+        self._idle: OrderedDict[int, None] = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, graph_id: int) -> Subscriber:
+        sub = Subscriber(f"c{next(self._ids)}", graph_id, self.queue_size)
+        with self._lock:
+            self._channels.setdefault(graph_id, _Channel()).subscribers.add(sub)
+            self._idle.pop(graph_id, None)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._lock:
+            channel = self._channels.get(sub.graph_id)
+            if channel is None:
+                return
+            channel.subscribers.discard(sub)
+            if not channel.subscribers:
+                self._idle[sub.graph_id] = None
+                while len(self._idle) > self.idle_channels:
+                    graph_id, _ = self._idle.popitem(last=False)
+                    self._channels.pop(graph_id, None)
+
+    def publish(self, graph_id: int, seq: int, message: dict[str, Any]) -> None:
+        """广播序号为 seq 的变更；可在任意线程调用（REST 写接口运行在线程池中）"""
+        with self._lock:
+            channel = self._channels.get(graph_id)
+            if channel is None:
+                return  # 本进程没有人订阅过这张图
+            data = encode({**message, "seq": seq})
+            # 并发写入的发布顺序可能与版本号不一致，按序号插入
+            bisect.insort(channel.history, (seq, data), key=lambda item: item[0])
+            del channel.history[:-self.history]
+            subscribers = list(channel.subscribers)
+            self.published += 1
+        self._fanout(subscribers, (seq, data, None))
+
+    def close_graph(self, graph_id: int, message: dict[str, Any], code: int = CLOSE_NOT_FOUND) -> None:
+        """图被删除：通知并断开全部订阅者，丢弃历史"""
+        with self._lock:
+            channel = self._channels.pop(graph_id, None)
+            self._idle.pop(graph_id, None)
+        if channel is not None:
+            self._fanout(list(channel.subscribers), (None, encode(message), code))
+
+    def _fanout(self, subscribers: list[Subscriber], item: tuple[int | None, str | None, int | None]) -> None:
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        for sub in subscribers:
+            if sub.loop is current:
+                self._deliver(sub, item)
+            else:
+                try:
+                    sub.loop.call_soon_threadsafe(self._deliver, sub, item)
+                except RuntimeError:
+                    pass  # 连接所在事件循环已关闭
+
+    def _deliver(self, sub: Subscriber, item: tuple[int | None, str | None, int | None]) -> None:
+        overflowed = sub.overflowed
+        sub._put(item)
+        if sub.overflowed and not overflowed:
+            self.dropped += 1
+
+    def replay(self, graph_id: int, since: int, current: int) -> list[tuple[int, str]] | None:
+        """(since, current] 之间的全部变更；历史不完整时返回 None（需发送快照）"""
+        if since >= current:
+            return []
+        with self._lock:
+            channel = self._channels.get(graph_id)
+            history = list(channel.history) if channel else []
+        missed = [(seq, data) for seq, data in history if since < seq <= current]
+        if [seq for seq, _ in missed] != list(range(since + 1, current + 1)):
+            return None
+        return missed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._channels.clear()
+            self._idle.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"channels": len(self._channels),
+                    "subscribers": sum(len(c.subscribers) for c in self._channels.values()),
+                    "published": self.published, "dropped": self.dropped}
+
+
+graph_hub = GraphHub()
+stats_collector("graph_ws", graph_hub.stats, "Graph live-sync hub")
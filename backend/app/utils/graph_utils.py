@@ -1,13 +1,99 @@
 from __future__ import annotations
 import json
+import os
+import threading
 from typing import Tuple, List, Any
 
-def pack_graph(nodes: List[Any], edges: List[Any]) -> str:
-    return json.dumps({"nodes": nodes, "edges": edges}, ensure_ascii=False)
+import orjson
+import zstandard
 
-def unpack_graph(data: str) -> Tuple[List[Any], List[Any]]:
+from backend.app.core.metrics import SIZE_BUCKETS, registry, span
+
+# 存储格式 v1：MAGIC + zstd(orjson({"nodes", "edges"}) 去掉开头的 "{")。
+# 去掉 "{" 使该 zstd 帧可以直接拼接在响应头片段帧之后（zstd 多帧顺序解压即为拼接结果），
+# 读取整图时无需解压/解析即可作为 Content-Encoding: zstd 的响应体。
+# 不以 MAGIC 开头的数据视为旧版纯 JSON 文本。
+MAGIC_V1 = b"AG\x01"
+GRAPH_ZSTD_LEVEL = int(os.getenv("GRAPH_ZSTD_LEVEL", "3"))
+
+_local = threading.local()
+
+
+def _compressor() -> zstandard.ZstdCompressor:
+    # ZstdCompressor/Decompressor 实例不能跨线程并发使用
+    cctx = getattr(_local, "cctx", None)
+    if cctx is None:
+        cctx = _local.cctx = zstandard.ZstdCompressor(level=GRAPH_ZSTD_LEVEL)
+    return cctx
+
+
+def _decompressor() -> zstandard.ZstdDecompressor:
+    dctx = getattr(_local, "dctx", None)
+    if dctx is None:
+        dctx = _local.dctx = zstandard.ZstdDecompressor()
+    return dctx
+
+
+def zstd_compress(data: bytes) -> bytes:
+    return _compressor().compress(data)
+
+
+def is_packed(data: str | bytes | None) -> bool:
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:len(MAGIC_V1)]) == MAGIC_V1
+
+
+GRAPH_BYTES = registry.histogram("aitu_graph_payload_bytes", "Graph snapshot size (json: raw JSON, stored: as persisted)",
+                                 ["op", "encoding"], buckets=SIZE_BUCKETS)
+
+def pack_graph(nodes: List[Any], edges: List[Any]) -> bytes:
+    with span("graph.pack"):
+        body = orjson.dumps({"nodes": nodes, "edges": edges})
+        packed = MAGIC_V1 + zstd_compress(body[1:])
+    GRAPH_BYTES.observe(len(body), op="pack", encoding="json")
+    GRAPH_BYTES.observe(len(packed), op="pack", encoding="stored")
+    return packed
+
+def unpack_graph(data: str | bytes | None) -> Tuple[List[Any], List[Any]]:
     try:
-        payload = json.loads(data) if data else {}
+        with span("graph.unpack"):
+            if is_packed(data):
+                payload = orjson.loads(graph_json_bytes(data))
+            else:
+                payload = json.loads(data) if data else {}
+        if not isinstance(payload, dict):
+            payload = {}
+        GRAPH_BYTES.observe(len(data or b""), op="unpack", encoding="stored")
         return payload.get('nodes', []), payload.get('edges', [])
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, orjson.JSONDecodeError, zstandard.ZstdError):
         return [], []
+
+
+def graph_json_bytes(data: str | bytes | None) -> bytes:
+    """返回 {"nodes":..,"edges":..} 的 JSON 字节（只解压，不解析）"""
+    if is_packed(data):
+        return b"{" + _decompressor().decompress(bytes(data)[len(MAGIC_V1):])
+    if isinstance(data, str):
+        return data.encode("utf-8") if data else b'{"nodes":[],"edges":[]}'
+    return bytes(data) if data else b'{"nodes":[],"edges":[]}'
+
+
+def graph_zstd_frame(data: str | bytes | None) -> bytes | None:
+    """v1 数据中可直接拼接到响应的 zstd 帧；旧格式返回 None"""
+    if is_packed(data):
+        return bytes(data)[len(MAGIC_V1):]
+    return None
+
+
+def merge_graph_json(header: dict, data: str | bytes | None, accept_zstd: bool = False) -> tuple[bytes, bool]:
+    """把 header 中的字段与存储的 nodes/edges 拼成一个单行 JSON 对象，v1 数据不解析图数据。
+
+    返回 (响应体, 是否为 zstd 编码)。
+    """
+    if not is_packed(data):
+        # 旧版纯 JSON 可能是空对象、缺少 edges 或含其它字段，完整解析后重新序列化
+        nodes, edges = unpack_graph(data)
+        return orjson.dumps({**header, "nodes": nodes, "edges": edges}), False
+    prefix = orjson.dumps(header)[:-1] + b","
+    if accept_zstd:
+        return zstd_compress(prefix) + graph_zstd_frame(data), True
+    return prefix + graph_json_bytes(data)[1:], False
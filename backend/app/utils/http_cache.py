@@ -0,0 +1,119 @@
+from __future__ import annotations
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+import xxhash
+
+from backend.app.core.metrics import stats_collector
+
+# 整图响应缓存的条目数与总字节上限（LRU）
+GRAPH_RESPONSE_CACHE_SIZE = int(os.getenv("GRAPH_RESPONSE_CACHE_SIZE", "256"))
+GRAPH_RESPONSE_CACHE_BYTES = int(os.getenv("GRAPH_RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+
+def content_etag(*parts: bytes | str | None) -> str:
+    """对若干片段计算 xxh3 摘要，作为 ETag 的值（不含引号）"""
+    h = xxhash.xxh3_64()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        h.update(part or b"")
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def format_etag(value: str) -> str:
+    # 同一内容可能以明文或 zstd 编码返回，使用弱校验器
+    return f'W/"{value}"'
+
+
+def etag_matches(if_none_match: str | None, value: str | None) -> bool:
+    if not if_none_match or not value:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/").strip('"') == value:
+            return True
+    return False
+
+
+def accepts_encoding(accept_encoding: str | None, coding: str) -> bool:
+    """Accept-Encoding 是否接受 coding：q=0 表示拒绝，未列出时按 * 的设置"""
+    wildcard = False
+    for item in (accept_encoding or "").lower().split(","):
+        name, *params = (part.strip() for part in item.split(";"))
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name == coding:
+            return q > 0
+        if name == "*":
+            wildcard = q > 0
+    return wildcard
+
+
+class ResponseCache:
+    """进程内 LRU 缓存已序列化的响应体，按条目数与总字节数双重限制。
+
+    键的第一个元素为资源 id，invalidate(id) 删除该资源的全部条目。
+    """
+
+    def __init__(self, maxsize: int = GRAPH_RESPONSE_CACHE_SIZE, max_bytes: int = GRAPH_RESPONSE_CACHE_BYTES):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple[bytes, Any]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> tuple[bytes, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, body: bytes, meta: Any = None) -> None:
+        if len(body) > self.max_bytes or self.maxsize <= 0:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (body, meta)
+            self._bytes += len(body)
+            while len(self._entries) > self.maxsize or self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def invalidate(self, resource_id: Hashable) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == resource_id]:
+                self._bytes -= len(self._entries.pop(key)[0])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+graph_response_cache = ResponseCache()
+stats_collector("graph_response_cache", graph_response_cache.stats, "Graph response cache")
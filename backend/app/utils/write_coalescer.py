@@ -0,0 +1,92 @@
+"""写合并（group commit）：短时间内对同一个键的连续写入合并为一次提交。
+
+- 第一个到达的写入成为 leader，等待 window 秒收集同键的后续写入，然后调用 commit 一次性处理整批；
+  其余写入线程阻塞等待各自的结果
+- leader 提交期间到达的写入进入下一批，由其中最早到达者接任 leader，提交不会并发执行
+- commit(key, batch) 为批内每一项设置 result 或 error；commit 抛出异常时未设置结果的项都以该异常失败
+- 阻塞调用，须在线程中使用（同步路由运行在线程池中）
+"""
+from __future__ import annotations
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+
+class Pending:
+    __slots__ = ("value", "result", "error", "_event", "_lead")
+
+    def __init__(self, value: Any):
+        self.value = value
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self._event = threading.Event()
+        self._lead = False
+
+    def outcome(self) -> Any:
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+Commit = Callable[[Hashable, list[Pending]], None]
+
+
+class WriteCoalescer:
+    def __init__(self, window: float, max_batch: int = 64):
+        self.window = window
+        self.max_batch = max_batch
+        self._queues: dict[Hashable, list[Pending]] = {}
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.commits = 0
+        self.max_batch_seen = 0
+
+    def submit(self, key: Hashable, value: Any, commit: Commit) -> Any:
+        """提交一次写入并等待其所在批次提交完成，返回 commit 为其设置的结果"""
+        item = Pending(value)
+        with self._lock:
+            self.writes += 1
+            queue = self._queues.get(key)
+            lead = queue is None
+            if lead:
+                queue = self._queues[key] = []
+            queue.append(item)
+        if not lead:
+            item._event.wait()
+            if not item._lead:
+                return item.outcome()
+        self._lead(key, commit)
+        return item.outcome()
+
+    def _lead(self, key: Hashable, commit: Commit) -> None:
+        if self.window > 0:
+            time.sleep(self.window)
+        with self._lock:
+            queue = self._queues[key]
+            batch = queue[:self.max_batch]
+            del queue[:len(batch)]
+            self.commits += 1
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        try:
+            commit(key, batch)
+        except BaseException as exc:
+            for item in batch:
+                if item.result is None and item.error is None:
+                    item.error = exc
+        finally:
+            with self._lock:
+                queue = self._queues[key]
+                successor = queue[0] if queue else None
+                if successor is None:
+                    del self._queues[key]
+                else:
+                    successor._lead = True
+            for item in batch:
+                item._event.set()
+            if successor is not None:
+                successor._event.set()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"writes": self.writes, "commits": self.commits, "coalesced": self.writes - self.commits,
+                    "max_batch": self.max_batch_seen, "pending_keys": len(self._queues)}
@@ -0,0 +1,6 @@
+"""API 负载/基准测试：合成知识树 + 本地 OpenAI 兼容桩模型 + 混合负载回放，结果保存为 JSON 便于跨版本对比。
+
+    python -m backend.bench run --duration 30 --concurrency 16 --nodes 200 --llm-latency-ms 300
+    python -m backend.bench coldstart --runs 5
+    python -m backend.bench compare backend/bench/results/a.json backend/bench/results/b.json
+"""
@@ -0,0 +1,72 @@
+from __future__ import annotations
+import argparse
+import json
+import sys
+from dataclasses import fields
+from pathlib import Path
+
+from backend.bench.coldstart import (
+    ColdStartConfig, compare_coldstart, format_coldstart, format_coldstart_comparison, run_coldstart,
+)
+from backend.bench.run import BenchConfig, compare, format_comparison, format_summary, run
+
+
+def _add_config_args(parser: argparse.ArgumentParser, config_cls: type = BenchConfig) -> None:
+    for f in fields(config_cls):
+        if f.name == "server_env":
+            continue
+        default = f.default
+        kind = type(default) if default is not None else str
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=kind, default=default)
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="自管模式下传给应用进程的额外环境变量，可重复")
+    parser.add_argument("--out", type=Path, help="结果文件路径，默认 backend/bench/results/<时间>-<提交>.json")
+    parser.add_argument("--baseline", type=Path, help="与之前的结果文件对比")
+
+
+def _format_comparison(baseline: dict, current: dict) -> str:
+    if current.get("kind") == "coldstart":
+        return format_coldstart_comparison(compare_coldstart(baseline, current))
+    return format_comparison(compare(baseline, current))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.bench")
+    sub = parser.add_subparsers(dest="command", required=True)
+    _add_config_args(sub.add_parser("run", help="执行基准并保存 JSON 结果"))
+    _add_config_args(sub.add_parser("coldstart", help="测量 worker 冷启动（导入、就绪、首次问答）耗时"),
+                     ColdStartConfig)
+    cmp = sub.add_parser("compare", help="对比两次基准结果")
+    cmp.add_argument("baseline", type=Path)
+    cmp.add_argument("current", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        baseline, current = (json.loads(p.read_text(encoding="utf-8")) for p in (args.baseline, args.current))
+        print(_format_comparison(baseline, current))
+        return 0
+
+    server_env = dict(item.split("=", 1) for item in args.server_env)
+    if args.command == "coldstart":
+        values = {f.name: getattr(args, f.name) for f in fields(ColdStartConfig) if f.name != "server_env"}
+        result = run_coldstart(ColdStartConfig(**values, server_env=server_env), args.out)
+        print(format_coldstart(result))
+        print(f"saved to {result['path']}")
+        if args.baseline:
+            print(_format_comparison(json.loads(args.baseline.read_text(encoding="utf-8")), result))
+        return 0
+
+    values = {f.name: getattr(args, f.name) for f in fields(BenchConfig) if f.name != "server_env"}
+    config = BenchConfig(**values, server_env=server_env)
+    if config.base_url and not config.user:
+        parser.error("--base-url 需要同时提供 --user 与 --password")
+    result = run(config, args.out)
+    print(format_summary(result))
+    print(f"saved to {result['path']}")
+    if args.baseline:
+        print(_format_comparison(json.loads(args.baseline.read_text(encoding="utf-8")), result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
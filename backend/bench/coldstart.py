@@ -0,0 +1,164 @@
+"""冷启动基准：新 worker 从进程启动到能处理图 CRUD 需要多久（自动扩容时新 pod 的不可用窗口）。
+
+每轮在全新解释器中测量：
+- import_s：导入 backend.app.main 的耗时，以及此时已加载的 LLM 依赖
+- ready_s：启动 uvicorn 子进程到首个 GET /graphs/ 返回 200 的耗时
+- first_ask_s：就绪后首个问答请求的耗时（零延迟桩模型），反映 LLM 依赖的加载开销落在哪里（受 LLM_PRELOAD 影响）
+"""
+from __future__ import annotations
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import httpx
+
+from backend.bench.run import (
+    API, REPO_ROOT, _free_port, _spawn, _wait_ready, migrate_database, result_meta, save_result, seed_users,
+)
+
+METRICS = ("import_s", "ready_s", "first_ask_s")
+# 启动路径上不应出现的重量级依赖（应在首次问答或预热时才加载）
+LLM_MODULES = ("langchain", "langchain_openai", "langgraph", "openai")
+
+_IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import backend.app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_s": elapsed, "llm_loaded": [m for m in {LLM_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+@dataclass
+class ColdStartConfig:
+    runs: int = 5
+    timeout: float = 60.0
+    model: str = "bench-model"
+    server_env: dict[str, str] = field(default_factory=dict)
+
+
+def measure_import(env: dict[str, str]) -> dict:
+    result = subprocess.run([sys.executable, "-c", _IMPORT_PROBE], cwd=REPO_ROOT, env={**os.environ, **env},
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"importing backend.app.main failed:\n{result.stderr[-4000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _poll_ready(url: str, headers: dict, process: subprocess.Popen, log: Path, timeout: float) -> None:
+    """以 10ms 间隔轮询，直到请求返回 200"""
+    deadline = time.monotonic() + timeout
+    with httpx.Client(timeout=5.0) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                tail = log.read_text(encoding="utf-8", errors="replace")[-4000:]
+                raise RuntimeError(f"server exited with {process.returncode} before it became ready:\n{tail}")
+            try:
+                if client.get(url, headers=headers).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def measure_boot(env: dict[str, str], headers: dict, model: str, log: Path, timeout: float, run: int) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = _spawn(["-m", "uvicorn", "backend.app.main:app", "--port", str(port), "--log-level", "warning"],
+                    env, log)
+    try:
+        _poll_ready(f"{base_url}{API}/graphs/", headers, server, log, timeout)
+        ready = time.perf_counter() - start
+        start = time.perf_counter()
+        resp = httpx.post(f"{base_url}{API}/interaction/ask", headers=headers, timeout=timeout,
+                          json={"question": "ping", "model": model, "thread_id": f"coldstart-{run}"})
+        resp.raise_for_status()
+        return {"ready_s": ready, "first_ask_s": time.perf_counter() - start}
+    finally:
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def _stats(values: list[float]) -> dict:
+    return {"median": round(statistics.median(values), 4), "min": round(min(values), 4),
+            "max": round(max(values), 4)}
+
+
+def run_coldstart(config: ColdStartConfig, out: Path | None = None) -> dict:
+    """执行 config.runs 轮冷启动测量并写出 JSON 结果（backend/bench/results/coldstart-*.json）"""
+    from backend.app.core.security import create_access_token
+
+    with tempfile.TemporaryDirectory(prefix="aitu-coldstart-") as tmp:
+        database_url = f"sqlite:///{tmp}/coldstart.db"
+        stub_port = _free_port()
+        env = {
+            "DATABASE_URL": database_url,
+            "BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+            "SILICONFLOW_API_KEY": "bench-key",
+            "JOB_WORKER": "off",
+            "VECTOR_INDEX_DIR": f"{tmp}/vectors",
+            **config.server_env,
+        }
+        migrate_database(database_url)
+        seed_users(database_url, ["coldstart"], "coldstart", config.model, rounds=4)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'coldstart'})}"}
+        stub_log, server_log = Path(tmp) / "stub.log", Path(tmp) / "server.log"
+        stub = _spawn(["-m", "backend.bench.stub_llm", "--port", str(stub_port), "--latency-ms", "0",
+                       "--jitter-ms", "0", "--tokens", "8"], env, stub_log)
+        runs = []
+        try:
+            _wait_ready(f"http://127.0.0.1:{stub_port}/v1/stats", stub, stub_log)
+            for i in range(config.runs):
+                sample = measure_import(env)
+                sample.update(measure_boot(env, headers, config.model, server_log, config.timeout, i))
+                runs.append(sample)
+        finally:
+            stub.terminate()
+            stub.wait(10)
+    result = {
+        "kind": "coldstart",
+        "meta": result_meta(env),
+        "config": {k: v for k, v in asdict(config).items() if k != "server_env"},
+        "summary": {metric: _stats([r[metric] for r in runs]) for metric in METRICS},
+        "llm_loaded_on_import": sorted({m for r in runs for m in r["llm_loaded"]}),
+        "runs": runs,
+    }
+    return save_result(result, out, prefix="coldstart-")
+
+
+def compare_coldstart(baseline: dict, current: dict) -> list[dict]:
+    """按中位数对比两次冷启动结果：change 为相对基线的变化比例（为正表示变慢）"""
+    rows = []
+    for metric in METRICS:
+        before = baseline["summary"].get(metric, {}).get("median")
+        after = current["summary"].get(metric, {}).get("median")
+        rows.append({"metric": metric, "baseline": before, "current": after,
+                     "change": round((after - before) / before, 4) if before and after is not None else None})
+    return rows
+
+
+def format_coldstart(result: dict) -> str:
+    lines = [f"{'metric':<16}{'median s':>10}{'min s':>10}{'max s':>10}"]
+    for metric, s in result["summary"].items():
+        lines.append(f"{metric:<16}{s['median']:>10.3f}{s['min']:>10.3f}{s['max']:>10.3f}")
+    lines.append(f"LLM modules loaded by import: {', '.join(result['llm_loaded_on_import']) or 'none'}")
+    return "\n".join(lines)
+
+
+def format_coldstart_comparison(rows: list[dict]) -> str:
+    lines = [f"{'metric':<16}{'baseline':>10}{'current':>10}{'change':>10}"]
+    for row in rows:
+        change = "n/a" if row["change"] is None else f"{row['change'] * 100:+.1f}%"
+        lines.append(f"{row['metric']:<16}{row['baseline'] or 0:>10.3f}{row['current'] or 0:>10.3f}{change:>10}")
+    return "\n".join(lines)
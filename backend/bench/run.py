@@ -0,0 +1,437 @@
+"""混合负载回放：按权重随机执行 list/get/skeleton/update/ask/ask_stream/login，统计各端点吞吐与 p50/p95/p99。
+
+默认自管环境：临时 SQLite + 桩模型子进程 + uvicorn 子进程（BASE_URL 指向桩模型）；
+--base-url 指向已有服务时只做数据准备与回放（需 --user/--password 对应的已有账号）。
+"""
+from __future__ import annotations
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+import httpx
+
+from backend.bench.synth import synth_graph, text
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+API = "/api/v1"
+DEFAULT_MIX = "list=3,get=3,skeleton=1,update=2,ask=1,login=0.2"
+OPS = ("list", "get", "skeleton", "update", "ask", "ask_stream", "login")
+
+
+@dataclass
+class BenchConfig:
+    duration: float = 20.0
+    warmup: float = 2.0
+    concurrency: int = 16
+    users: int = 4
+    graphs_per_user: int = 3
+    nodes: int = 100
+    answer_chars: int = 800
+    depth: int = 6
+    turns: int = 1
+    mix: str = DEFAULT_MIX
+    seed: int = 0
+    password: str = "bench-password"
+    model: str = "bench-model"
+    # 自管环境
+    server_workers: int = 1
+    database_url: str | None = None
+    llm_latency_ms: float = 300.0
+    llm_jitter_ms: float = 50.0
+    llm_tokens: int = 200
+    llm_token_interval_ms: float = 2.0
+    # 已有服务
+    base_url: str | None = None
+    user: str | None = None
+    server_env: dict[str, str] = field(default_factory=dict)
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights: dict[str, float] = {}
+    for part in filter(None, (p.strip() for p in mix.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in OPS:
+            raise ValueError(f"unknown op {name!r}, expected one of {', '.join(OPS)}")
+        weights[name] = float(weight or 1)
+    if not any(weights.values()):
+        raise ValueError("mix has no positive weights")
+    return {k: v for k, v in weights.items() if v > 0}
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """线性插值分位数（q ∈ [0, 100]），输入需已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.statuses: dict[str, dict[str, int]] = {}
+        self.recording = False
+
+    def record(self, op: str, seconds: float, status: int | str) -> None:
+        if not self.recording:
+            return
+        self.latencies.setdefault(op, []).append(seconds)
+        counts = self.statuses.setdefault(op, {})
+        counts[str(status)] = counts.get(str(status), 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for op, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            statuses = self.statuses.get(op, {})
+            # 409 为乐观锁冲突（并发编辑的正常结果），不计为错误
+            errors = sum(n for s, n in statuses.items() if not (s.startswith("2") or s in ("304", "409")))
+            endpoints[op] = {
+                "requests": len(values), "errors": errors, "statuses": statuses,
+                "throughput_rps": round(len(values) / elapsed, 3) if elapsed else 0.0,
+                **{f"{name}_ms": round(percentile(values, q) * 1000, 3)
+                   for name, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+                "mean_ms": round(sum(values) / len(values) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+            }
+        requests = [e for op, e in endpoints.items() if not op.endswith(".first_event")]
+        total, errors = sum(e["requests"] for e in requests), sum(e["errors"] for e in requests)
+        return {"elapsed_s": round(elapsed, 3), "requests": total, "errors": errors,
+                "throughput_rps": round(total / elapsed, 3) if elapsed else 0.0, "endpoints": endpoints}
+
+
+@dataclass
+class GraphRef:
+    id: int
+    owner: int
+    node_ids: list[str]
+    version: int = 0
+
+
+class Workload:
+    """每个虚拟客户端按 mix 权重循环选择操作；客户端 i 以用户 i % users 的身份访问该用户的图"""
+
+    def __init__(self, client: httpx.AsyncClient, config: BenchConfig, users: list[str],
+                 tokens: list[str], graphs: list[GraphRef]):
+        self.client = client
+        self.config = config
+        self.users = users
+        self.tokens = tokens
+        self.graphs_by_user: dict[int, list[GraphRef]] = {}
+        for graph in graphs:
+            self.graphs_by_user.setdefault(graph.owner, []).append(graph)
+        self.mix = parse_mix(config.mix)
+        self.recorder = Recorder()
+
+    def _headers(self, user: int) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.tokens[user]}"}
+
+    async def _timed(self, op: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            resp = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            self.recorder.record(op, time.perf_counter() - started, type(exc).__name__)
+            return None
+        self.recorder.record(op, time.perf_counter() - started, resp.status_code)
+        return resp
+
+    async def op_list(self, user: int, rng: random.Random) -> None:
+        await self._timed("list", "GET", f"{API}/graphs/", params={"limit": 50}, headers=self._headers(user))
+
+    async def op_get(self, user: int, rng: random.Random) -> None:
+        graph = rng.choice(self.graphs_by_user[user])
+        await self._timed("get", "GET", f"{API}/graphs/{graph.id}", headers=self._headers(user))
+
+    async def op_skeleton(self, user: int, rng: random.Random) -> None:
+        graph = rng.choice(self.graphs_by_user[user])
+        await self._timed("skeleton", "GET", f"{API}/graphs/{graph.id}/skeleton", headers=self._headers(user))
+
+    async def op_update(self, user: int, rng: random.Random) -> None:
+        """增量保存一个节点的回答（与前端自动保存相同的 PATCH），冲突时采用服务端版本"""
+        graph = rng.choice(self.graphs_by_user[user])
+        node_id = rng.choice(graph.node_ids)
+        node = {"id": node_id, "type": "qa", "position": {"x": rng.uniform(0, 2000), "y": rng.uniform(0, 2000)},
+                "data": {"context": [{"question": text(rng, 24) + "？",
+                                      "llmResponse": text(rng, self.config.answer_chars)}]}}
+        resp = await self._timed("update", "PATCH", f"{API}/graphs/{graph.id}", headers=self._headers(user),
+                                 json={"version": graph.version, "upsert_nodes": [node]})
+        if resp is None:
+            return
+        if resp.status_code == 200:
+            graph.version = max(graph.version, resp.json()["version"])
+        elif resp.status_code == 409:
+            graph.version = resp.json()["detail"]["version"]
+
+    def _ask_body(self, user: int, rng: random.Random) -> dict:
+        graph = rng.choice(self.graphs_by_user[user])
+        return {"question": text(rng, 30) + "？", "model": self.config.model, "thread_id": f"bench-{uuid.uuid4().hex}",
+                "graph_id": graph.id, "node_id": rng.choice(graph.node_ids)}
+
+    async def op_ask(self, user: int, rng: random.Random) -> None:
+        await self._timed("ask", "POST", f"{API}/interaction/ask", json=self._ask_body(user, rng),
+                          headers=self._headers(user))
+
+    async def op_ask_stream(self, user: int, rng: random.Random) -> None:
+        """整段流的耗时记为 ask_stream，首个事件的到达时间另记为 ask_stream.first_event"""
+        started = time.perf_counter()
+        status: int | str = "incomplete"
+        try:
+            async with self.client.stream("POST", f"{API}/interaction/ask/stream", json=self._ask_body(user, rng),
+                                          headers=self._headers(user)) as resp:
+                status = resp.status_code
+                first = True
+                async for _ in resp.aiter_raw():
+                    if first:
+                        self.recorder.record("ask_stream.first_event", time.perf_counter() - started, status)
+                        first = False
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+        self.recorder.record("ask_stream", time.perf_counter() - started, status)
+
+    async def op_login(self, user: int, rng: random.Random) -> None:
+        resp = await self._timed("login", "POST", f"{API}/users/login/",
+                                 json={"user_name": self.users[user], "password": self.config.password})
+        if resp is not None and resp.status_code == 200:
+            self.tokens[user] = resp.headers["X-Access-Token"]
+
+    async def _client_loop(self, index: int, deadline: float) -> None:
+        rng = random.Random(self.config.seed * 1000 + index)
+        user = index % len(self.users)
+        names, weights = list(self.mix), list(self.mix.values())
+        while time.perf_counter() < deadline:
+            op = rng.choices(names, weights)[0]
+            await getattr(self, f"op_{op}")(user, rng)
+
+    async def run(self) -> dict:
+        started = time.perf_counter()
+        deadline = started + self.config.warmup + self.config.duration
+        loops = [asyncio.create_task(self._client_loop(i, deadline)) for i in range(self.config.concurrency)]
+        await asyncio.sleep(self.config.warmup)
+        self.recorder.recording = True
+        measured_from = time.perf_counter()
+        await asyncio.gather(*loops)
+        return self.recorder.summary(time.perf_counter() - measured_from)
+
+
+async def login(client: httpx.AsyncClient, user: str, password: str) -> str:
+    resp = await client.post(f"{API}/users/login/", json={"user_name": user, "password": password})
+    resp.raise_for_status()
+    return resp.headers["X-Access-Token"]
+
+
+async def seed_graphs(client: httpx.AsyncClient, config: BenchConfig, tokens: list[str]) -> list[GraphRef]:
+    graphs = []
+    for owner, token in enumerate(tokens):
+        for i in range(config.graphs_per_user):
+            nodes, edges = synth_graph(config.nodes, config.answer_chars, config.depth, config.turns,
+                                       seed=config.seed * 10007 + owner * 101 + i)
+            resp = await client.post(f"{API}/graphs/", json={"title": f"bench {owner}-{i}", "nodes": nodes,
+                                                              "edges": edges},
+                                     headers={"Authorization": f"Bearer {token}"})
+            resp.raise_for_status()
+            body = resp.json()
+            graphs.append(GraphRef(id=body["id"], owner=owner, node_ids=[n["id"] for n in nodes],
+                                   version=body["version"]))
+    return graphs
+
+
+async def run_bench(client: httpx.AsyncClient, config: BenchConfig, users: list[str]) -> dict:
+    """准备数据（登录 + 创建合成图）后回放负载，返回结果摘要"""
+    tokens = [await login(client, user, config.password) for user in users]
+    graphs = await seed_graphs(client, config, tokens)
+    return await Workload(client, config, users, tokens, graphs).run()
+
+
+def migrate_database(database_url: str) -> None:
+    """按部署流程建表：alembic upgrade head（应用启动时不建表）"""
+    result = subprocess.run([sys.executable, "-m", "alembic", "-c", str(REPO_ROOT / "backend" / "alembic.ini"),
+                             "upgrade", "head"], cwd=REPO_ROOT, env={**os.environ, "DATABASE_URL": database_url},
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"alembic upgrade failed:\n{result.stderr[-4000:]}")
+
+
+def seed_users(database_url: str, names: list[str], password: str, model: str, rounds: int) -> None:
+    """在目标库中直接创建压测账号（系统没有开放注册接口）"""
+    from passlib.hash import bcrypt
+    from sqlmodel import Session, create_engine
+
+    from backend.app.models.user import User
+
+    engine = create_engine(database_url)
+    hashed = bcrypt.using(rounds=rounds).hash(password)
+    with Session(engine) as session:
+        for name in names:
+            session.add(User(user_name=name, password=hashed, ad_model=model, ad_api_key="bench-key"))
+        session.commit()
+    engine.dispose()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, log: Path, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            tail = log.read_text(encoding="utf-8", errors="replace")[-4000:]
+            raise RuntimeError(f"process exited with {process.returncode} before {url} became ready:\n{tail}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def _spawn(args: list[str], env: dict[str, str], log: Path) -> subprocess.Popen:
+    """子进程输出写入日志文件，避免与压测进程争用终端"""
+    with log.open("ab") as out:
+        return subprocess.Popen([sys.executable, *args], cwd=REPO_ROOT, env={**os.environ, **env},
+                                stdout=out, stderr=subprocess.STDOUT)
+
+
+@contextmanager
+def managed_target(config: BenchConfig, users: list[str]) -> Iterator[tuple[str, dict]]:
+    """启动桩模型与应用子进程，产出 (base_url, 实际使用的服务端环境变量)"""
+    with tempfile.TemporaryDirectory(prefix="aitu-bench-") as tmp:
+        database_url = config.database_url or f"sqlite:///{tmp}/bench.db"
+        stub_port, app_port = _free_port(), _free_port()
+        env = {
+            "DATABASE_URL": database_url,
+            "BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+            "SILICONFLOW_API_KEY": "bench-key",
+            "JOB_WORKER": "off",
+            "VECTOR_INDEX_DIR": f"{tmp}/vectors",
+            **config.server_env,
+        }
+        migrate_database(database_url)
+        seed_users(database_url, users, config.password, config.model, int(env.get("BCRYPT_ROUNDS", "12")))
+        stub_log, server_log = Path(tmp) / "stub.log", Path(tmp) / "server.log"
+        processes = []
+        try:
+            stub = _spawn(["-m", "backend.bench.stub_llm", "--port", str(stub_port),
+                           "--latency-ms", str(config.llm_latency_ms), "--jitter-ms", str(config.llm_jitter_ms),
+                           "--tokens", str(config.llm_tokens),
+                           "--token-interval-ms", str(config.llm_token_interval_ms), "--seed", str(config.seed)],
+                          env, stub_log)
+            processes.append(stub)
+            _wait_ready(f"http://127.0.0.1:{stub_port}/v1/stats", stub, stub_log)
+            server = _spawn(["-m", "uvicorn", "backend.app.main:app", "--port", str(app_port), "--log-level",
+                             "warning", "--workers", str(config.server_workers)], env, server_log)
+            processes.append(server)
+            _wait_ready(f"http://127.0.0.1:{app_port}/metrics", server, server_log)
+            yield f"http://127.0.0.1:{app_port}", env
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                try:
+                    process.wait(10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_meta(server_env: dict[str, str]) -> dict:
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git": _git_revision(), "python": platform.python_version(), "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        # 仅记录影响性能的配置，不含密钥
+        "server_env": {k: v for k, v in server_env.items() if "KEY" not in k and "TOKEN" not in k},
+    }
+
+
+def save_result(result: dict, out: Path | None = None, prefix: str = "") -> dict:
+    """写出 JSON 结果（默认 backend/bench/results/<前缀><时间>-<提交>.json），返回附带 path 的结果"""
+    if out is None:
+        out = RESULTS_DIR / f"{prefix}{time.strftime('%Y%m%dT%H%M%S')}-{result['meta']['git'] or 'local'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    result["path"] = str(out)
+    return result
+
+
+def run(config: BenchConfig, out: Path | None = None) -> dict:
+    """执行一次完整基准并写出 JSON 结果（默认 backend/bench/results/<时间>-<提交>.json）"""
+    users = [config.user] if config.base_url else [f"bench-{i}" for i in range(config.users)]
+
+    async def replay(base_url: str) -> dict:
+        limits = httpx.Limits(max_connections=config.concurrency * 2, max_keepalive_connections=config.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+            return await run_bench(client, config, users)
+
+    if config.base_url:
+        server_env: dict = {}
+        summary = asyncio.run(replay(config.base_url))
+    else:
+        with managed_target(config, users) as (base_url, server_env):
+            summary = asyncio.run(replay(base_url))
+    result = {
+        "meta": result_meta(server_env),
+        "config": {k: v for k, v in asdict(config).items() if k not in ("password", "server_env")},
+        **summary,
+    }
+    return save_result(result, out)
+
+
+def compare(baseline: dict, current: dict) -> list[dict]:
+    """逐端点对比两次结果：change 为相对基线的变化比例（延迟为正表示变慢，吞吐为负表示下降）"""
+    rows = []
+    for op in sorted(set(baseline["endpoints"]) | set(current["endpoints"])):
+        a, b = baseline["endpoints"].get(op), current["endpoints"].get(op)
+        row: dict = {"endpoint": op}
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors"):
+            before, after = (a or {}).get(key), (b or {}).get(key)
+            row[key] = {"baseline": before, "current": after,
+                        "change": round((after - before) / before, 4) if before and after is not None else None}
+        rows.append(row)
+    return rows
+
+
+def format_summary(result: dict) -> str:
+    lines = [f"{'endpoint':<24}{'req':>8}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for op, e in result["endpoints"].items():
+        lines.append(f"{op:<24}{e['requests']:>8}{e['errors']:>6}{e['throughput_rps']:>10.1f}"
+                     f"{e['p50_ms']:>10.1f}{e['p95_ms']:>10.1f}{e['p99_ms']:>10.1f}")
+    lines.append(f"total {result['requests']} requests, {result['errors']} errors, "
+                 f"{result['throughput_rps']:.1f} req/s over {result['elapsed_s']:.1f}s")
+    return "\n".join(lines)
+
+
+def format_comparison(rows: list[dict]) -> str:
+    def pct(cell: dict) -> str:
+        return "n/a" if cell["change"] is None else f"{cell['change'] * 100:+.1f}%"
+
+    lines = [f"{'endpoint':<24}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}"]
+    for row in rows:
+        lines.append(f"{row['endpoint']:<24}{pct(row['throughput_rps']):>10}{pct(row['p50_ms']):>10}"
+                     f"{pct(row['p95_ms']):>10}{pct(row['p99_ms']):>10}")
+    return "\n".join(lines)
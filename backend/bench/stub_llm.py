@@ -0,0 +1,110 @@
+"""OpenAI 兼容桩模型（/v1/chat/completions），延迟可配置，用于在无真实上游时压测 /ask 链路。
+
+    python -m backend.bench.stub_llm --port 9100 --latency-ms 300 --jitter-ms 100 --tokens 200 --token-interval-ms 5
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 300.0          # 首 token 前的延迟
+    jitter_ms: float = 0.0             # 在 ±jitter 内均匀抖动
+    tokens: int = 200                  # 每个回答的 token 数（按 4 字符一个 chunk）
+    token_interval_ms: float = 0.0     # 流式 chunk 间隔
+    seed: int = 0
+
+
+def create_stub_app(config: StubConfig, script: Callable[[dict], dict | None] | None = None) -> FastAPI:
+    """script(请求体) 可按请求覆盖响应：{"delay": 秒, "status": 错误码, "text": 回答}，返回 None 时按 config 响应"""
+    app = FastAPI()
+    rng = random.Random(config.seed)
+    stats = {"requests": 0, "streams": 0}
+    app.state.stats = stats
+
+    def delay() -> float:
+        jitter = rng.uniform(-config.jitter_ms, config.jitter_ms) if config.jitter_ms else 0.0
+        return max(0.0, config.latency_ms + jitter) / 1000
+
+    def answer() -> list[str]:
+        return [f"tok{i % 10} " for i in range(config.tokens)]
+
+    def usage(body: dict, pieces: list[str]) -> dict:
+        prompt = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+        return {"prompt_tokens": prompt, "completion_tokens": len(pieces), "total_tokens": prompt + len(pieces)}
+
+    @app.post("/v1/chat/completions")
+    async def complete(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        model = body.get("model")
+        step = (script(body) if script else None) or {}
+        await asyncio.sleep(step["delay"] if "delay" in step else delay())
+        if step.get("status"):
+            return JSONResponse({"error": {"message": "upstream error", "type": "server_error"}},
+                                status_code=step["status"])
+        text = step.get("text")
+        pieces = answer() if text is None else [text[i:i + 4] for i in range(0, len(text), 4)]
+        if not body.get("stream"):
+            await asyncio.sleep(config.token_interval_ms * len(pieces) / 1000)
+            return {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(pieces)},
+                             "finish_reason": "stop"}],
+                "usage": usage(body, pieces),
+            }
+        stats["streams"] += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+        async def chunks():
+            for i, piece in enumerate([*pieces, None]):
+                if i and config.token_interval_ms:
+                    await asyncio.sleep(config.token_interval_ms / 1000)
+                delta = {"content": piece} if piece is not None else {}
+                if i == 0:
+                    delta["role"] = "assistant"
+                choice = {"index": 0, "delta": delta, "finish_reason": None if piece is not None else "stop"}
+                yield "data: " + json.dumps({"id": "chatcmpl-stub", "object": "chat.completion.chunk",
+                                             "created": 0, "model": model, "choices": [choice]}) + "\n\n"
+            if include_usage:
+                yield "data: " + json.dumps({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0,
+                                             "model": model, "choices": [], "usage": usage(body, pieces)}) + "\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.get("/v1/stats")
+    async def stub_stats():
+        return stats
+
+    return app
+
+
+def main(argv: list[str] | None = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=StubConfig.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=StubConfig.jitter_ms)
+    parser.add_argument("--tokens", type=int, default=StubConfig.tokens)
+    parser.add_argument("--token-interval-ms", type=float, default=StubConfig.token_interval_ms)
+    parser.add_argument("--seed", type=int, default=StubConfig.seed)
+    args = parser.parse_args(argv)
+    config = StubConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, tokens=args.tokens,
+                        token_interval_ms=args.token_interval_ms, seed=args.seed)
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""按规模参数生成合成知识树（节点格式与前端保存的一致），同一 seed 结果可复现"""
+from __future__ import annotations
+import random
+
+_WORDS = ("缓存", "索引", "事务", "并发", "一致性", "延迟", "吞吐", "分片", "副本", "队列", "日志", "快照",
+          "latency", "index", "shard", "replica", "commit", "vector", "token", "graph", "query", "stream")
+
+
+def text(rng: random.Random, chars: int) -> str:
+    """约 chars 个字符的伪文本（中英混排，含空格与标点，便于分词与检索）"""
+    parts: list[str] = []
+    size = 0
+    while size < chars:
+        word = rng.choice(_WORDS)
+        parts.append(word)
+        size += len(word) + 1
+        if rng.random() < 0.1:
+            parts.append("。")
+    return " ".join(parts)[:chars]
+
+
+def qa_node(rng: random.Random, node_id: str, x: float, y: float, answer_chars: int, turns: int = 1) -> dict:
+    context = [{"question": text(rng, 24) + "？", "llmResponse": text(rng, answer_chars)} for _ in range(turns)]
+    return {"id": node_id, "type": "qa", "position": {"x": x, "y": y}, "data": {"context": context}}
+
+
+def synth_graph(nodes: int, answer_chars: int = 800, depth: int = 6, turns: int = 1,
+                seed: int = 0) -> tuple[list[dict], list[dict]]:
+    """nodes 个节点组成的树，最大深度 depth（根为第 1 层），每个节点 turns 轮问答"""
+    rng = random.Random(seed)
+    depth = max(1, depth)
+    out_nodes: list[dict] = []
+    edges: list[dict] = []
+    levels: list[int] = []
+    for i in range(max(1, nodes)):
+        node_id = f"n{i}"
+        if i == 0:
+            level = 0
+        else:
+            # 优先挂在较深的节点下，使树的深度接近上限
+            candidates = [j for j in range(max(0, i - 8), i) if levels[j] < depth - 1] or [0]
+            parent = rng.choice(candidates)
+            level = levels[parent] + 1
+            edges.append({"id": f"e{parent}-{i}", "source": f"n{parent}", "target": node_id})
+        levels.append(level)
+        out_nodes.append(qa_node(rng, node_id, level * 320.0, i * 40.0, answer_chars, turns))
+    return out_nodes, edges
+
+
+def tree_depth(nodes: list[dict], edges: list[dict]) -> int:
+    parents = {e["target"]: e["source"] for e in edges}
+    best = 0
+    for node in nodes:
+        level, current = 1, node["id"]
+        while current in parents:
+            current = parents[current]
+            level += 1
+        best = max(best, level)
+    return best
@@ -0,0 +1,57 @@
+"""initial schema: user, graph (the tables created by the original create_all)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+由 SQLModel.metadata.create_all 创建的既有数据库执行 `alembic stamp 0001` 后再 upgrade。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'user',
+        sa.Column('user_name', sqlmodel.AutoString(length=100), nullable=False),
+        sa.Column('ad_user', sqlmodel.AutoString(length=200), nullable=True),
+        sa.Column('ad_api_key', sqlmodel.AutoString(length=200), nullable=True),
+        sa.Column('ad_model', sqlmodel.AutoString(length=200), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('password', sqlmodel.AutoString(length=200), nullable=False),
+        sa.Column('ad_token', sqlmodel.AutoString(length=200), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_user_user_name', 'user', ['user_name'])
+    op.create_index('ix_user_ad_token', 'user', ['ad_token'])
+    op.create_table(
+        'graph',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sqlmodel.AutoString(length=200), nullable=False),
+        sa.Column('data', sqlmodel.AutoString(), nullable=False),
+        sa.Column('exported_at', sqlmodel.AutoString(), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['owner_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_graph_title', 'graph', ['title'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_graph_title', table_name='graph')
+    op.drop_table('graph')
+    op.drop_index('ix_user_ad_token', table_name='user')
+    op.drop_index('ix_user_user_name', table_name='user')
+    op.drop_table('user')
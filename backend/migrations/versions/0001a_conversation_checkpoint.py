@@ -0,0 +1,59 @@
+"""conversation checkpoint tables for the SQL checkpointer
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+0001 只包含原版 create_all 创建的 user / graph 表；本迁移补建 checkpointer 所需的表。
+早期版本的 0001 已包含这两张表，已存在时跳过。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001a'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'conversation_checkpoint' not in existing:
+        op.create_table(
+            'conversation_checkpoint',
+            sa.Column('thread_id', sqlmodel.AutoString(length=200), nullable=False),
+            sa.Column('checkpoint_ns', sqlmodel.AutoString(length=200), nullable=False),
+            sa.Column('checkpoint_id', sqlmodel.AutoString(length=64), nullable=False),
+            sa.Column('parent_checkpoint_id', sqlmodel.AutoString(length=64), nullable=True),
+            sa.Column('type', sqlmodel.AutoString(length=32), nullable=False),
+            sa.Column('checkpoint', sa.LargeBinary(), nullable=False),
+            sa.Column('metadata', sa.LargeBinary(), nullable=False),
+            sa.Column('created_at', sqlmodel.AutoString(), nullable=False),
+            sa.PrimaryKeyConstraint('thread_id', 'checkpoint_ns', 'checkpoint_id'),
+        )
+    if 'conversation_write' not in existing:
+        op.create_table(
+            'conversation_write',
+            sa.Column('thread_id', sqlmodel.AutoString(length=200), nullable=False),
+            sa.Column('checkpoint_ns', sqlmodel.AutoString(length=200), nullable=False),
+            sa.Column('checkpoint_id', sqlmodel.AutoString(length=64), nullable=False),
+            sa.Column('task_id', sqlmodel.AutoString(length=64), nullable=False),
+            sa.Column('idx', sa.Integer(), nullable=False),
+            sa.Column('channel', sqlmodel.AutoString(length=200), nullable=False),
+            sa.Column('type', sqlmodel.AutoString(length=32), nullable=False),
+            sa.Column('value', sa.LargeBinary(), nullable=False),
+            sa.Column('task_path', sqlmodel.AutoString(length=500), nullable=False),
+            sa.PrimaryKeyConstraint('thread_id', 'checkpoint_ns', 'checkpoint_id', 'task_id', 'idx'),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('conversation_write')
+    op.drop_table('conversation_checkpoint')
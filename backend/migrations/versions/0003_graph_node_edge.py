@@ -0,0 +1,132 @@
+"""graph_node / graph_edge tables, backfilled from graph.data
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+import datetime
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import xxhash
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_BATCH = 500
+
+
+def _dump(item) -> str:
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+
+
+def _title(node: dict):
+    context = (node.get("data") or {}).get("context") or []
+    if context and isinstance(context[0], dict) and context[0].get("question"):
+        return str(context[0]["question"])[:200]
+    return None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    node_table = op.create_table(
+        'graph_node',
+        sa.Column('graph_id', sa.Integer(), nullable=False),
+        sa.Column('node_id', sqlmodel.AutoString(length=100), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('parent_id', sqlmodel.AutoString(length=100), nullable=True),
+        sa.Column('type', sqlmodel.AutoString(length=50), nullable=True),
+        sa.Column('title', sqlmodel.AutoString(length=200), nullable=True),
+        sa.Column('data', sqlmodel.AutoString(), nullable=False),
+        sa.Column('content_hash', sqlmodel.AutoString(length=16), nullable=False),
+        sa.Column('created_at', sqlmodel.AutoString(), nullable=False),
+        sa.Column('updated_at', sqlmodel.AutoString(), nullable=False),
+        sa.ForeignKeyConstraint(['graph_id'], ['graph.id']),
+        sa.PrimaryKeyConstraint('graph_id', 'node_id'),
+    )
+    op.create_index('ix_graph_node_parent', 'graph_node', ['graph_id', 'parent_id'])
+    op.create_index('ix_graph_node_type', 'graph_node', ['graph_id', 'type'])
+    op.create_index('ix_graph_node_created_at', 'graph_node', ['created_at'])
+    op.create_index('ix_graph_node_updated_at', 'graph_node', ['updated_at'])
+    edge_table = op.create_table(
+        'graph_edge',
+        sa.Column('graph_id', sa.Integer(), nullable=False),
+        sa.Column('edge_id', sqlmodel.AutoString(length=200), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('source', sqlmodel.AutoString(length=100), nullable=True),
+        sa.Column('target', sqlmodel.AutoString(length=100), nullable=True),
+        sa.Column('data', sqlmodel.AutoString(), nullable=False),
+        sa.Column('content_hash', sqlmodel.AutoString(length=16), nullable=False),
+        sa.ForeignKeyConstraint(['graph_id'], ['graph.id']),
+        sa.PrimaryKeyConstraint('graph_id', 'edge_id'),
+    )
+    op.create_index('ix_graph_edge_source', 'graph_edge', ['graph_id', 'source'])
+    op.create_index('ix_graph_edge_target', 'graph_edge', ['graph_id', 'target'])
+
+    # 回填：逐个图解析 data，分批插入
+    bind = op.get_bind()
+    now = datetime.datetime.utcnow().isoformat()
+    node_rows, edge_rows = [], []
+    for graph_id, data, exported_at in bind.execute(sa.text("SELECT id, data, exported_at FROM graph")):
+        try:
+            payload = json.loads(data) if data else {}
+        except json.JSONDecodeError:
+            continue
+        nodes, edges = payload.get("nodes") or [], payload.get("edges") or []
+        parents = {}
+        for e in edges:
+            if isinstance(e, dict) and e.get("target") is not None:
+                parents.setdefault(e["target"], e.get("source"))
+        seen = set()
+        for position, node in enumerate(nodes):
+            if not isinstance(node, dict) or node.get("id") is None or str(node["id"]) in seen:
+                continue
+            seen.add(str(node["id"]))
+            blob = _dump(node)
+            node_rows.append({
+                "graph_id": graph_id, "node_id": str(node["id"]), "position": position,
+                "parent_id": parents.get(node["id"]), "type": node.get("type"), "title": _title(node),
+                "data": blob, "content_hash": xxhash.xxh3_64_hexdigest(blob),
+                "created_at": exported_at or now, "updated_at": exported_at or now,
+            })
+        seen_edges = set()
+        for position, edge in enumerate(edges):
+            if not isinstance(edge, dict):
+                continue
+            edge_id = str(edge.get("id") or f"{edge.get('source')}-{edge.get('target')}")
+            if edge_id in seen_edges:
+                continue
+            seen_edges.add(edge_id)
+            blob = _dump(edge)
+            edge_rows.append({
+                "graph_id": graph_id, "edge_id": edge_id, "position": position, "source": edge.get("source"),
+                "target": edge.get("target"), "data": blob, "content_hash": xxhash.xxh3_64_hexdigest(blob),
+            })
+        if len(node_rows) >= _BATCH or len(edge_rows) >= _BATCH:
+            op.bulk_insert(node_table, node_rows)
+            op.bulk_insert(edge_table, edge_rows)
+            node_rows, edge_rows = [], []
+    if node_rows:
+        op.bulk_insert(node_table, node_rows)
+    if edge_rows:
+        op.bulk_insert(edge_table, edge_rows)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_graph_edge_target', table_name='graph_edge')
+    op.drop_index('ix_graph_edge_source', table_name='graph_edge')
+    op.drop_table('graph_edge')
+    op.drop_index('ix_graph_node_updated_at', table_name='graph_node')
+    op.drop_index('ix_graph_node_created_at', table_name='graph_node')
+    op.drop_index('ix_graph_node_type', table_name='graph_node')
+    op.drop_index('ix_graph_node_parent', table_name='graph_node')
+    op.drop_table('graph_node')
@@ -0,0 +1,54 @@
+"""graph_node canvas position columns for viewport queries; content-only hash
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import xxhash
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('graph_node') as batch_op:
+        batch_op.add_column(sa.Column('pos_x', sa.Float(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('pos_y', sa.Float(), nullable=False, server_default='0'))
+    op.create_index('ix_graph_node_viewport', 'graph_node', ['graph_id', 'pos_x', 'pos_y'])
+
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("SELECT graph_id, node_id, data FROM graph_node")).fetchall()
+    updates = []
+    for graph_id, node_id, data in rows:
+        node = json.loads(data)
+        position = node.get("position") or {}
+        try:
+            pos_x, pos_y = float(position.get("x") or 0), float(position.get("y") or 0)
+        except (TypeError, ValueError, AttributeError):
+            pos_x, pos_y = 0.0, 0.0
+        content = json.dumps([node.get("type"), node.get("data")], ensure_ascii=False, separators=(",", ":"))
+        updates.append({"g": graph_id, "n": node_id, "x": pos_x, "y": pos_y,
+                        "h": xxhash.xxh3_64_hexdigest(content)})
+    if updates:
+        bind.execute(sa.text("UPDATE graph_node SET pos_x = :x, pos_y = :y, content_hash = :h "
+                             "WHERE graph_id = :g AND node_id = :n"), updates)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_graph_node_viewport', table_name='graph_node')
+    with op.batch_alter_table('graph_node') as batch_op:
+        batch_op.drop_column('pos_y')
+        batch_op.drop_column('pos_x')
@@ -0,0 +1,45 @@
+"""graph.payload compressed snapshot
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    旧行的 data 保留原样，下次写入时转换为 payload（读取端自动识别两种格式）。
+    """
+    with op.batch_alter_table('graph') as batch_op:
+        batch_op.add_column(sa.Column('payload', sa.LargeBinary(), nullable=True))
+        batch_op.alter_column('data', existing_type=sqlmodel.sql.sqltypes.AutoString(), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    import zstandard
+
+    bind = op.get_bind()
+    dctx = zstandard.ZstdDecompressor()
+    rows = bind.execute(sa.text("SELECT id, payload FROM graph WHERE payload IS NOT NULL")).fetchall()
+    for graph_id, payload in rows:
+        data = (b"{" + dctx.decompress(bytes(payload)[3:])).decode("utf-8")
+        bind.execute(sa.text("UPDATE graph SET data = :data WHERE id = :id"), {"data": data, "id": graph_id})
+    bind.execute(sa.text("UPDATE graph SET data = '{}' WHERE data IS NULL"))
+    with op.batch_alter_table('graph') as batch_op:
+        batch_op.alter_column('data', existing_type=sqlmodel.sql.sqltypes.AutoString(), nullable=False)
+        batch_op.drop_column('payload')
@@ -0,0 +1,103 @@
+"""node_search full-text index, backfilled from graph_node
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+
+"""
+import json
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 与 backend.app.search.text 保持一致（迁移脚本不依赖应用代码）
+_TOKEN = re.compile(r"[0-9a-z]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+
+def _tokenize(text: str) -> str:
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        word = match.group(0)
+        if word.isascii():
+            tokens.append(word)
+        else:
+            tokens.extend(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return " ".join(tokens)
+
+
+def _node_text(node: dict) -> str:
+    parts = []
+    for qa in (node.get("data") or {}).get("context") or []:
+        if isinstance(qa, dict):
+            parts.extend(str(qa[key]) for key in ("question", "llmResponse") if qa.get(key))
+    label = (node.get("data") or {}).get("label")
+    if not parts and isinstance(label, str):
+        parts.append(label)
+    return "\n".join(parts)[:4000]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'node_search',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('graph_id', sa.Integer(), nullable=False),
+        sa.Column('node_id', sqlmodel.AutoString(length=100), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=True),
+        sa.Column('body', sqlmodel.AutoString(), nullable=False),
+        sa.ForeignKeyConstraint(['graph_id'], ['graph.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_node_search_node', 'node_search', ['graph_id', 'node_id'], unique=True)
+    op.create_index('ix_node_search_owner_id', 'node_search', ['owner_id'])
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    if dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS node_fts USING fts5(tokens, tokenize='unicode61')")
+    elif dialect == 'postgresql':
+        op.execute("ALTER TABLE node_search ADD COLUMN tsv tsvector")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_node_search_tsv ON node_search USING GIN (tsv)")
+
+    # 回填：逐个节点提取问答文本
+    rows = bind.execute(sa.text(
+        "SELECT n.graph_id, n.node_id, g.owner_id, n.data FROM graph_node n JOIN graph g ON g.id = n.graph_id"
+    )).fetchall()
+    next_id = 1
+    for graph_id, node_id, owner_id, data in rows:
+        try:
+            body = _node_text(json.loads(data))
+        except (json.JSONDecodeError, AttributeError):
+            continue
+        if not body:
+            continue
+        params = {"id": next_id, "graph_id": graph_id, "node_id": node_id, "owner_id": owner_id, "body": body,
+                  "tokens": _tokenize(body)}
+        bind.execute(sa.text("INSERT INTO node_search (id, graph_id, node_id, owner_id, body) "
+                             "VALUES (:id, :graph_id, :node_id, :owner_id, :body)"), params)
+        if dialect == 'sqlite':
+            bind.execute(sa.text("INSERT INTO node_fts (rowid, tokens) VALUES (:id, :tokens)"), params)
+        elif dialect == 'postgresql':
+            bind.execute(sa.text("UPDATE node_search SET tsv = to_tsvector('simple', :tokens) WHERE id = :id"), params)
+        next_id += 1
+    if dialect == 'postgresql' and next_id > 1:
+        op.execute("SELECT setval(pg_get_serial_sequence('node_search', 'id'), (SELECT MAX(id) FROM node_search))")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS node_fts")
+    op.drop_index('ix_node_search_owner_id', table_name='node_search')
+    op.drop_index('ix_node_search_node', table_name='node_search')
+    op.drop_table('node_search')
@@ -0,0 +1,45 @@
+"""completion_cache table
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'completion_cache',
+        sa.Column('key', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+        sa.Column('model', sqlmodel.sql.sqltypes.AutoString(length=200), nullable=True),
+        sa.Column('content', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=False),
+        sa.Column('completion_tokens', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.Float(), nullable=False),
+        sa.Column('last_used_at', sa.Float(), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_index('ix_completion_cache_created_at', 'completion_cache', ['created_at'], unique=False)
+    op.create_index('ix_completion_cache_last_used_at', 'completion_cache', ['last_used_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_completion_cache_last_used_at', table_name='completion_cache')
+    op.drop_index('ix_completion_cache_created_at', table_name='completion_cache')
+    op.drop_table('completion_cache')
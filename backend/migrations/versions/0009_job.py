@@ -0,0 +1,56 @@
+"""job queue table
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sqlmodel.sql.sqltypes.AutoString(length=50), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=True),
+        sa.Column('status', sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False),
+        sa.Column('payload', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('result', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('progress', sa.Float(), nullable=False),
+        sa.Column('message', sqlmodel.sql.sqltypes.AutoString(length=200), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+        sa.Column('worker', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=True),
+        sa.Column('created_at', sa.Float(), nullable=False),
+        sa.Column('run_after', sa.Float(), nullable=False),
+        sa.Column('started_at', sa.Float(), nullable=True),
+        sa.Column('heartbeat_at', sa.Float(), nullable=True),
+        sa.Column('finished_at', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['owner_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_job_claim', 'job', ['status', 'run_after'], unique=False)
+    op.create_index('ix_job_owner', 'job', ['owner_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_job_owner', table_name='job')
+    op.drop_index('ix_job_claim', table_name='job')
+    op.drop_table('job')
@@ -0,0 +1,49 @@
+"""llm usage ledger and user quota tables
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'llm_usage',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('model', sqlmodel.sql.sqltypes.AutoString(length=200), nullable=False),
+        sa.Column('day', sqlmodel.sql.sqltypes.AutoString(length=10), nullable=False),
+        sa.Column('requests', sa.Integer(), nullable=False),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=False),
+        sa.Column('completion_tokens', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'model', 'day'),
+    )
+    op.create_table(
+        'user_quota',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('daily_tokens', sa.Integer(), nullable=True),
+        sa.Column('weight', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_quota')
+    op.drop_table('llm_usage')
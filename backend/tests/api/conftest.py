@@ -6,6 +6,16 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session, SQLModel, create_engine
 
+# 启动校验缺少该变量时会告警；测试中使用假模型，不会真正请求上游
+os.environ.setdefault("SILICONFLOW_API_KEY", "test-key")
+# LLM 依赖由用到的用例按需加载，不在启动时后台预热
+os.environ.setdefault("LLM_PRELOAD", "off")
+# 路由级用例使用进程内 checkpointer；SQL 实现在 tests/llm 中单独验证
+os.environ.setdefault("CHECKPOINTER_BACKEND", "memory")
+# 路由级用例在线程中计算 bcrypt，进程池在 test_password_hashing 中单独验证
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+# 后台任务由用例显式驱动 Worker，不随应用启动
+os.environ.setdefault("JOB_WORKER", "off")
 
 @pytest.fixture(autouse=True)
 def isolated_sqlite_db(tmp_path: Path) -> Generator[None, None, None]:
@@ -30,12 +40,30 @@ def isolated_sqlite_db(tmp_path: Path) -> Generator[None, None, None]:
     # Import app and dependency after DATABASE_URL is set, and override the router dependency
     from backend.app.main import app
     from backend.app.api.deps import get_db
+    from backend.app.api.v1.routes.jobs import job_counts
+    from backend.app.db.session import get_session
+    from backend.app.core.user_cache import user_cache
+    from backend.app.llm.completion_cache import completion_cache
+    from backend.app.llm.quota import usage_ledger
+    from backend.app.search.vector_index import vector_indexes
+    from backend.app.utils.graph_hub import graph_hub
+    from backend.app.utils.http_cache import graph_response_cache
 
     def _override_get_db() -> Generator[Session, None, None]:
         with Session(engine) as s:
             yield s
 
     app.dependency_overrides[get_db] = _override_get_db
+    app.dependency_overrides[get_session] = _override_get_db
+    # 各用例的临时库会复用相同的 (graph_id, version)
+    graph_response_cache.clear()
+    graph_hub.clear()
+    user_cache.clear()
+    usage_ledger.reset(engine)
+    completion_cache.reset(engine)
+    job_counts.reset(engine)
+    vector_indexes.root = tmp_path / "vectors"
+    vector_indexes.clear()
 
     try:
         yield
@@ -51,6 +79,7 @@ def isolated_sqlite_db(tmp_path: Path) -> Generator[None, None, None]:
                 pass
             try:
                 app.dependency_overrides.pop(get_db, None)
+                app.dependency_overrides.pop(get_session, None)
             except Exception:
                 pass
             if db_file.exists():
@@ -60,6 +89,20 @@ def isolated_sqlite_db(tmp_path: Path) -> Generator[None, None, None]:
                     pass
 
 
+@pytest.fixture
+def auth_headers() -> dict[str, str]:
+    """Create a user in the isolated DB and return a bearer header for it."""
+    from backend.app.main import app
+    from backend.app.api.deps import get_db
+    from backend.app.core.security import create_access_token
+    from backend.app.models.user import User
+
+    with next(app.dependency_overrides[get_db]()) as session:
+        session.add(User(user_name="owner", password="x", ad_model="fake-model", ad_api_key="k"))
+        session.commit()
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'owner'})}"}
+
+
 @pytest.fixture
 def client() -> TestClient:
     """Provide a TestClient bound to the isolated DB for convenience."""
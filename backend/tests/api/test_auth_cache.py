@@ -0,0 +1,37 @@
+from fastapi.testclient import TestClient
+
+from backend.app.core import security
+from backend.app.core.user_cache import UserCache, user_cache
+from backend.app.models.user import User
+
+
+def test_current_user_cached_until_register(client: TestClient, auth_headers, monkeypatch):
+    calls = []
+    lookup = security.get_user_by_username
+    monkeypatch.setattr(security, "get_user_by_username", lambda *args: calls.append(args[0]) or lookup(*args))
+
+    for _ in range(3):
+        assert client.get("/api/v1/graphs/", headers=auth_headers).status_code == 200
+    assert calls == ["owner"]
+
+    # 改名后旧用户名签发的令牌不能再命中缓存
+    resp = client.put("/api/v1/users/1/register/", json={"user_name": "renamed", "password": "pw"})
+    assert resp.status_code == 200
+    assert client.get("/api/v1/graphs/", headers=auth_headers).status_code == 401
+    new_headers = {"Authorization": resp.headers["authorization"]}
+    assert client.get("/api/v1/graphs/", headers=new_headers).status_code == 200
+    assert "owner" not in user_cache._entries
+
+
+def test_user_cache_ttl_and_copies():
+    now = [0.0]
+    cache = UserCache(maxsize=1, ttl=10, clock=lambda: now[0])
+    cache.put("a", User(id=1, user_name="a", password="x"))
+    first = cache.get("a")
+    first.ad_model = "changed"
+    assert cache.get("a").ad_model is None
+    now[0] = 11
+    assert cache.get("a") is None
+    cache.put("a", User(id=1, user_name="a", password="x"))
+    cache.put("b", User(id=2, user_name="b", password="x"))
+    assert cache.get("a") is None and cache.get("b").id == 2
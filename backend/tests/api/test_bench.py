@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import httpx
+from passlib.hash import bcrypt
+
+from backend.app.api.deps import get_db
+from backend.app.main import app
+from backend.app.models.user import User
+from backend.bench.run import BenchConfig, compare, parse_mix, percentile, run_bench
+from backend.bench.stub_llm import StubConfig, create_stub_app
+from backend.bench.synth import synth_graph, tree_depth
+
+
+def test_synth_graph_is_reproducible_and_bounded():
+    nodes, edges = synth_graph(50, answer_chars=120, depth=4, turns=2, seed=7)
+    assert (nodes, edges) == synth_graph(50, answer_chars=120, depth=4, turns=2, seed=7)
+    assert len(nodes) == 50 and len(edges) == 49 and tree_depth(nodes, edges) == 4
+    assert all(len(n["data"]["context"]) == 2 and len(n["data"]["context"][0]["llmResponse"]) == 120 for n in nodes)
+
+
+def test_percentile_and_mix():
+    assert percentile([], 95) == 0.0
+    assert percentile([1, 2, 3, 4, 5], 50) == 3 and percentile([1, 2], 95) == 1.95
+    assert parse_mix("list=2,get,login=0") == {"list": 2.0, "get": 1.0}
+    a = {"endpoints": {"get": {"throughput_rps": 10, "p50_ms": 2, "p95_ms": 4, "p99_ms": 8, "errors": 0}}}
+    b = {"endpoints": {"get": {"throughput_rps": 5, "p50_ms": 3, "p95_ms": 4, "p99_ms": 8, "errors": 0}}}
+    row = compare(a, b)[0]
+    assert row["throughput_rps"]["change"] == -0.5 and row["p50_ms"]["change"] == 0.5
+
+
+def test_stub_llm_streams_with_usage():
+    async def scenario():
+        stub = create_stub_app(StubConfig(latency_ms=0, tokens=3))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stub), base_url="http://stub") as client:
+            body = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+            plain = (await client.post("/v1/chat/completions", json=body)).json()
+            streamed = await client.post("/v1/chat/completions",
+                                         json={**body, "stream": True, "stream_options": {"include_usage": True}})
+            return plain, streamed.text
+
+    plain, streamed = asyncio.run(scenario())
+    assert plain["choices"][0]["message"]["content"] == "tok0 tok1 tok2 "
+    events = [json.loads(line[6:]) for line in streamed.splitlines() if line.startswith("data: {")]
+    assert "".join(e["choices"][0]["delta"].get("content", "") for e in events if e["choices"]) == "tok0 tok1 tok2 "
+    assert events[-1]["usage"]["completion_tokens"] == 3 and streamed.rstrip().endswith("[DONE]")
+
+
+def test_workload_replays_against_app():
+    with next(app.dependency_overrides[get_db]()) as session:
+        session.add(User(user_name="bench-0", password=bcrypt.using(rounds=4).hash("pw"), ad_model="m"))
+        session.commit()
+    config = BenchConfig(duration=0.5, warmup=0.1, concurrency=3, graphs_per_user=2, nodes=12, answer_chars=60,
+                         depth=3, password="pw", mix="list=1,get=1,skeleton=1,update=2,login=0.2")
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as client:
+            return await run_bench(client, config, ["bench-0"])
+
+    result = asyncio.run(scenario())
+    assert result["errors"] == 0 and result["requests"] > 0
+    assert {"list", "get", "skeleton", "update"} <= set(result["endpoints"])
+    update = result["endpoints"]["update"]
+    assert set(update["statuses"]) <= {"200", "409"} and update["p50_ms"] <= update["p99_ms"]
@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+
+from backend.app.utils.http_cache import ResponseCache, graph_response_cache
+
+
+def test_get_graph_etag_and_response_cache(client: TestClient, auth_headers):
+    gid = client.post("/api/v1/graphs/", json={"title": "g", "nodes": [{"id": "a"}], "edges": []},
+                      headers=auth_headers).json()["id"]
+    hits, misses = graph_response_cache.hits, graph_response_cache.misses
+
+    first = client.get(f"/api/v1/graphs/{gid}")
+    assert first.headers["x-cache"] == "MISS"
+    etag = first.headers["etag"]
+    second = client.get(f"/api/v1/graphs/{gid}")
+    assert second.headers["x-cache"] == "HIT" and second.json() == first.json()
+    assert (graph_response_cache.hits - hits, graph_response_cache.misses - misses) == (1, 1)
+
+    not_modified = client.get(f"/api/v1/graphs/{gid}", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.headers["etag"] == etag
+
+    client.put(f"/api/v1/graphs/{gid}", headers=auth_headers, json={"title": "g2", "nodes": [], "edges": []})
+    changed = client.get(f"/api/v1/graphs/{gid}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["x-cache"] == "MISS"
+    assert changed.json()["title"] == "g2" and changed.headers["etag"] != etag
+
+    client.delete(f"/api/v1/graphs/{gid}", headers=auth_headers)
+    assert client.get(f"/api/v1/graphs/{gid}").status_code == 404
+    assert len(graph_response_cache) == 0
+
+
+def test_list_graphs_etag(client: TestClient, auth_headers):
+    client.post("/api/v1/graphs/", json={"title": "a"}, headers=auth_headers)
+    first = client.get("/api/v1/graphs/", headers=auth_headers)
+    etag = first.headers["etag"]
+    cached = client.get("/api/v1/graphs/", headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+    client.post("/api/v1/graphs/", json={"title": "b"}, headers=auth_headers)
+    assert client.get("/api/v1/graphs/", headers={**auth_headers, "If-None-Match": etag}).status_code == 200
+
+
+def test_response_cache_lru_by_bytes():
+    cache = ResponseCache(maxsize=10, max_bytes=10)
+    cache.put((1, 0), b"12345")
+    cache.put((2, 0), b"12345")
+    cache.get((1, 0))
+    cache.put((3, 0), b"123")
+    assert cache.get((2, 0)) is None and cache.get((1, 0)) is not None
+    cache.invalidate(1)
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] == 3
@@ -0,0 +1,100 @@
+import json
+
+from fastapi.testclient import TestClient
+
+
+def _node(node_id: str, x: float, y: float) -> dict:
+    return {"id": node_id, "type": "markdown", "position": {"x": x, "y": y},
+            "data": {"context": [{"question": f"question {node_id}", "llmResponse": "long answer " * 100}]}}
+
+
+def test_skeleton_and_node_batches(client: TestClient, auth_headers):
+    nodes = [_node(str(i), x=i * 100, y=0) for i in range(5)]
+    edges = [{"id": f"{i}-{i + 1}", "source": str(i), "target": str(i + 1)} for i in range(4)]
+    gid = client.post("/api/v1/graphs/", json={"title": "big", "nodes": nodes, "edges": edges},
+                      headers=auth_headers).json()["id"]
+
+    skeleton = client.get(f"/api/v1/graphs/{gid}/skeleton", headers=auth_headers).json()
+    assert [n["id"] for n in skeleton["nodes"]] == ["0", "1", "2", "3", "4"]
+    assert skeleton["nodes"][2] == {"id": "2", "type": "markdown", "position": {"x": 200.0, "y": 0.0},
+                                    "title": "question 2", "parentId": "1"}
+    assert len(skeleton["edges"]) == 4
+    assert "long answer" not in str(skeleton)
+
+    by_id = client.get(f"/api/v1/graphs/{gid}/nodes", params={"ids": ["3", "1"]}, headers=auth_headers).json()
+    assert [n["id"] for n in by_id] == ["1", "3"]
+    assert by_id[0] == nodes[1]
+
+    in_view = client.get(f"/api/v1/graphs/{gid}/nodes",
+                         params={"x_min": 150, "y_min": -10, "x_max": 320, "y_max": 10}, headers=auth_headers).json()
+    assert [n["id"] for n in in_view] == ["2", "3"]
+
+    assert client.get(f"/api/v1/graphs/{gid}/nodes", headers=auth_headers).status_code == 400
+
+
+def test_skeleton_and_nodes_of_other_users_are_not_found(client: TestClient, auth_headers):
+    from backend.app.api.deps import get_db
+    from backend.app.core.security import create_access_token
+    from backend.app.main import app
+    from backend.app.models.user import User
+
+    gid = client.post("/api/v1/graphs/", json={"title": "private", "nodes": [_node("0", 0, 0)], "edges": []},
+                      headers=auth_headers).json()["id"]
+    with next(app.dependency_overrides[get_db]()) as session:
+        session.add(User(user_name="intruder", password="x"))
+        session.commit()
+    intruder = {"Authorization": f"Bearer {create_access_token({'sub': 'intruder'})}"}
+
+    assert client.get(f"/api/v1/graphs/{gid}/skeleton", headers=intruder).status_code == 404
+    assert client.get(f"/api/v1/graphs/{gid}/nodes", params={"ids": ["0"]}, headers=intruder).status_code == 404
+    assert client.get(f"/api/v1/graphs/{gid}/skeleton").status_code == 401
+
+
+def test_list_graphs_cursor_pagination(client: TestClient, auth_headers):
+    ids = [client.post("/api/v1/graphs/", json={"title": f"g{i}"}, headers=auth_headers).json()["id"]
+           for i in range(5)]
+
+    first = client.get("/api/v1/graphs/", params={"limit": 2}, headers=auth_headers)
+    assert [g["id"] for g in first.json()] == ids[::-1][:2]
+    cursor = first.headers["x-next-cursor"]
+
+    second = client.get("/api/v1/graphs/", params={"limit": 2, "cursor": cursor}, headers=auth_headers)
+    assert [g["id"] for g in second.json()] == ids[::-1][2:4]
+
+    last = client.get("/api/v1/graphs/", params={"limit": 2, "cursor": second.headers["x-next-cursor"]},
+                      headers=auth_headers)
+    assert [g["id"] for g in last.json()] == ids[:1]
+    assert "x-next-cursor" not in last.headers
+
+    assert [g["id"] for g in client.get("/api/v1/graphs/", headers=auth_headers).json()] == ids[::-1]
+
+
+def test_get_graph_compressed_and_legacy_rows(client: TestClient, auth_headers):
+    from backend.app.api.deps import get_db
+    from backend.app.main import app
+    from backend.app.models.graph import Graph
+
+    nodes = [_node("0", 0, 0)]
+    gid = client.post("/api/v1/graphs/", json={"title": "z", "nodes": nodes, "edges": []},
+                      headers=auth_headers).json()["id"]
+
+    plain = client.get(f"/api/v1/graphs/{gid}", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == {"id": gid, "title": "z", "exportedAt": plain.json()["exportedAt"], "version": 0,
+                            "nodes": nodes, "edges": []}
+
+    compressed = client.get(f"/api/v1/graphs/{gid}", headers={"Accept-Encoding": "zstd"})
+    assert compressed.headers["content-encoding"] == "zstd"
+    assert compressed.json() == plain.json()
+
+    # 迁移前写入的行仍是 JSON 文本，照常读取，下次保存时转换为压缩格式
+    with next(app.dependency_overrides[get_db]()) as session:
+        legacy = Graph(title="old", owner_id=1, data=json.dumps({"nodes": nodes, "edges": []}))
+        session.add(legacy)
+        session.commit()
+        legacy_id = legacy.id
+    assert client.get(f"/api/v1/graphs/{legacy_id}").json()["nodes"] == nodes
+    client.put(f"/api/v1/graphs/{legacy_id}", headers=auth_headers, json={"title": "old", "nodes": nodes, "edges": []})
+    with next(app.dependency_overrides[get_db]()) as session:
+        row = session.get(Graph, legacy_id)
+        assert row.data is None and row.payload.startswith(b"AG\x01")
@@ -0,0 +1,123 @@
+from fastapi.testclient import TestClient
+
+
+def _node(node_id: str, question: str = "q", answer: str | None = "a") -> dict:
+    return {"id": node_id, "type": "markdown", "position": {"x": 0, "y": 0},
+            "data": {"context": [{"question": question, "llmResponse": answer}]}}
+
+
+def _create(client: TestClient, headers: dict) -> dict:
+    body = {"title": "t", "nodes": [_node("1"), _node("2")],
+            "edges": [{"id": "1-2", "source": "1", "target": "2"}]}
+    resp = client.post("/api/v1/graphs/", json=body, headers=headers)
+    assert resp.status_code == 201, resp.text
+    return resp.json()
+
+
+def test_patch_upserts_and_deletes_without_resending_graph(client: TestClient, auth_headers):
+    created = _create(client, auth_headers)
+    gid, version = created["id"], created["version"]
+
+    resp = client.patch(f"/api/v1/graphs/{gid}", headers=auth_headers, json={
+        "version": version,
+        "upsert_nodes": [_node("2", answer="edited"), _node("3")],
+        "upsert_edges": [{"id": "2-3", "source": "2", "target": "3"}],
+    })
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["version"] == version + 1
+    assert "nodes" not in resp.json()
+
+    resp = client.patch(f"/api/v1/graphs/{gid}", headers=auth_headers, json={"version": version + 1, "delete_nodes": ["1"],
+                                                        "title": "renamed"})
+    assert resp.status_code == 200, resp.text
+
+    graph = client.get(f"/api/v1/graphs/{gid}").json()
+    assert graph["title"] == "renamed"
+    assert [n["id"] for n in graph["nodes"]] == ["2", "3"]
+    assert graph["nodes"][0]["data"]["context"][0]["llmResponse"] == "edited"
+    assert [e["id"] for e in graph["edges"]] == ["2-3"]  # 与节点 1 相连的边被级联删除
+    assert graph["version"] == version + 2
+
+
+def test_patch_with_stale_version_conflicts(client: TestClient, auth_headers):
+    created = _create(client, auth_headers)
+    gid = created["id"]
+    assert client.patch(f"/api/v1/graphs/{gid}", headers=auth_headers, json={"version": 0, "title": "a"}).status_code == 200
+
+    resp = client.patch(f"/api/v1/graphs/{gid}", headers=auth_headers, json={"version": 0, "title": "b"})
+    assert resp.status_code == 409
+    assert resp.json()["detail"]["version"] == 1
+
+    resp = client.put(f"/api/v1/graphs/{gid}", headers=auth_headers, json={"title": "c", "nodes": [], "edges": [], "version": 0})
+    assert resp.status_code == 409
+
+
+def test_patch_accepts_json_patch_ops(client: TestClient, auth_headers):
+    gid = _create(client, auth_headers)["id"]
+    resp = client.patch(f"/api/v1/graphs/{gid}", headers=auth_headers, json={"version": 0, "ops": [
+        {"op": "replace", "path": "/nodes/0/data/context/0/question", "value": "new q"},
+        {"op": "remove", "path": "/edges/0"},
+    ]})
+    assert resp.status_code == 200, resp.text
+    graph = client.get(f"/api/v1/graphs/{gid}").json()
+    assert graph["nodes"][0]["data"]["context"][0]["question"] == "new q"
+    assert graph["edges"] == []
+
+    bad = client.patch(f"/api/v1/graphs/{gid}", headers=auth_headers, json={"version": 1, "ops": [{"op": "remove", "path": "/nodes/9"}]})
+    assert bad.status_code == 422
+    # 补丁后的 nodes / edges 必须仍是数组，与 PUT 的校验一致
+    for ops in ([{"op": "replace", "path": "/nodes", "value": {"a": 1}}],
+                [{"op": "replace", "path": "/edges", "value": "x"}],
+                [{"op": "replace", "path": "", "value": []}]):
+        bad = client.patch(f"/api/v1/graphs/{gid}", headers=auth_headers, json={"version": 1, "ops": ops})
+        assert bad.status_code == 422, ops
+    assert client.get(f"/api/v1/graphs/{gid}").json()["version"] == 1
+
+
+def test_node_and_edge_rows_follow_writes(client: TestClient, auth_headers):
+    from sqlmodel import select
+
+    from backend.app.api.deps import get_db
+    from backend.app.main import app
+    from backend.app.models.graph import GraphEdge, GraphNode
+
+    gid = _create(client, auth_headers)["id"]
+    client.patch(f"/api/v1/graphs/{gid}", headers=auth_headers, json={"version": 0, "upsert_nodes": [_node("3", question="third")],
+                                                 "upsert_edges": [{"id": "2-3", "source": "2", "target": "3"}]})
+    with next(app.dependency_overrides[get_db]()) as session:
+        rows = session.exec(select(GraphNode).where(GraphNode.graph_id == gid).order_by(GraphNode.position)).all()
+        assert [(r.node_id, r.parent_id, r.title) for r in rows] == [("1", None, "q"), ("2", "1", "q"), ("3", "2", "third")]
+
+    # 数字 id 的节点与边同样关联到父节点
+    numeric = client.post("/api/v1/graphs/", headers=auth_headers, json={
+        "title": "n", "nodes": [{**_node("x"), "id": 1}, {**_node("y"), "id": 2}],
+        "edges": [{"id": "e", "source": 1, "target": 2}]}).json()["id"]
+    with next(app.dependency_overrides[get_db]()) as session:
+        rows = session.exec(select(GraphNode).where(GraphNode.graph_id == numeric).order_by(GraphNode.position)).all()
+        assert [(r.node_id, r.parent_id) for r in rows] == [("1", None), ("2", "1")]
+
+    client.delete(f"/api/v1/graphs/{gid}", headers=auth_headers)
+    with next(app.dependency_overrides[get_db]()) as session:
+        assert session.exec(select(GraphNode).where(GraphNode.graph_id == gid)).all() == []
+        assert session.exec(select(GraphEdge).where(GraphEdge.graph_id == gid)).all() == []
+
+
+def test_writes_by_non_owner_are_not_found(client: TestClient, auth_headers):
+    from backend.app.api.deps import get_db
+    from backend.app.core.security import create_access_token
+    from backend.app.main import app
+    from backend.app.models.user import User
+
+    gid = _create(client, auth_headers)["id"]
+    with next(app.dependency_overrides[get_db]()) as session:
+        session.add(User(user_name="intruder", password="x"))
+        session.commit()
+    intruder = {"Authorization": f"Bearer {create_access_token({'sub': 'intruder'})}"}
+
+    assert client.patch(f"/api/v1/graphs/{gid}", headers=intruder, json={"version": 0, "title": "x"}).status_code == 404
+    assert client.put(f"/api/v1/graphs/{gid}", headers=intruder,
+                      json={"title": "x", "nodes": [], "edges": []}).status_code == 404
+    assert client.delete(f"/api/v1/graphs/{gid}", headers=intruder).status_code == 404
+    assert client.patch(f"/api/v1/graphs/{gid}", json={"version": 0, "title": "x"}).status_code == 401
+    graph = client.get(f"/api/v1/graphs/{gid}").json()
+    assert (graph["title"], graph["version"], len(graph["nodes"])) == ("t", 0, 2)
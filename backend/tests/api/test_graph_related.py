@@ -0,0 +1,27 @@
+from fastapi.testclient import TestClient
+
+
+def _node(node_id: str, question: str, answer: str) -> dict:
+    return {"id": node_id, "type": "markdown", "position": {"x": 0, "y": 0},
+            "data": {"context": [{"question": question, "llmResponse": answer}]}}
+
+
+def test_related_nodes_across_graphs(client: TestClient, auth_headers):
+    first = client.post("/api/v1/graphs/", headers=auth_headers, json={
+        "title": "机器学习", "nodes": [_node("a", "什么是梯度下降", "梯度下降是一种迭代优化算法")], "edges": []}).json()
+    second = client.post("/api/v1/graphs/", headers=auth_headers, json={
+        "title": "深度学习", "nodes": [_node("x", "历史", "无关内容")], "edges": []}).json()
+
+    url = f"/api/v1/graphs/{first['id']}/nodes/a/related"
+    assert client.post(url, headers=auth_headers).json() == []
+
+    # 保存时增量索引新节点
+    client.patch(f"/api/v1/graphs/{second['id']}", headers=auth_headers, json={
+        "version": 0, "upsert_nodes": [_node("y", "梯度下降的学习率", "学习率控制梯度下降的步长")]})
+    related = client.post(url, headers=auth_headers, json={"k": 5}).json()
+    assert [(r["graphId"], r["nodeId"], r["graphTitle"], r["title"]) for r in related] == \
+        [(second["id"], "y", "深度学习", "梯度下降的学习率")]
+
+    client.delete(f"/api/v1/graphs/{second['id']}", headers=auth_headers)
+    assert client.post(url, headers=auth_headers).json() == []
+    assert client.post(f"/api/v1/graphs/{first['id']}/nodes/zz/related", headers=auth_headers).status_code == 404
@@ -0,0 +1,56 @@
+import threading
+
+from fastapi.testclient import TestClient
+from sqlmodel import create_engine, text
+
+from backend.app.api.v1.routes import graphs
+from backend.app.db.base import sqlite_pragmas
+
+
+def _concurrently(fn, args_list):
+    results = [None] * len(args_list)
+
+    def run(i, args):
+        results[i] = fn(*args)
+
+    threads = [threading.Thread(target=run, args=(i, args)) for i, args in enumerate(args_list)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    return results
+
+
+def test_concurrent_saves_are_coalesced_with_sequential_semantics(client: TestClient, auth_headers, monkeypatch):
+    monkeypatch.setattr(graphs.graph_saves, "window", 0.2)
+    created = client.post("/api/v1/graphs/", json={"title": "t", "nodes": [], "edges": []}, headers=auth_headers).json()
+    gid, version = created["id"], created["version"]
+    before = graphs.graph_saves.stats()
+
+    # 同一基础版本的 PATCH：结果与逐个提交相同，只有第一个成功，其余 409
+    patches = _concurrently(lambda i: client.patch(f"/api/v1/graphs/{gid}", headers=auth_headers, json={
+        "version": version, "upsert_nodes": [{"id": f"n{i}"}]}), [(i,) for i in range(4)])
+    assert sorted(r.status_code for r in patches) == [200, 409, 409, 409]
+    version += 1
+
+    # 不带 version 的整图保存：全部成功，各得到连续的新版本号，最终状态为版本最大的那次保存
+    puts = _concurrently(lambda i: client.put(f"/api/v1/graphs/{gid}", headers=auth_headers, json={
+        "title": f"v{i}", "nodes": [{"id": f"p{i}"}], "edges": []}), [(i,) for i in range(3)])
+    assert all(r.status_code == 200 for r in puts)
+    assert sorted(r.json()["version"] for r in puts) == [version + 1, version + 2, version + 3]
+    last = max(puts, key=lambda r: r.json()["version"]).json()
+
+    stats = graphs.graph_saves.stats()
+    assert stats["writes"] - before["writes"] == 7 and stats["commits"] - before["commits"] == 2
+    graph = client.get(f"/api/v1/graphs/{gid}").json()
+    assert graph["version"] == version + 3 and graph["title"] == last["title"] and graph["nodes"] == last["nodes"]
+
+
+def test_sqlite_pragmas(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/p.db")
+    sqlite_pragmas(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    engine.dispose()
@@ -0,0 +1,103 @@
+import asyncio
+import tracemalloc
+
+import orjson
+import pytest
+import zstandard
+from fastapi.testclient import TestClient
+
+from backend.app.api.deps import get_db
+from backend.app.core.security import create_access_token
+from backend.app.crud import graph_transfer
+from backend.app.main import app
+from backend.app.models.graph import Graph
+from backend.app.models.user import User
+
+
+def _node(node_id: str, question: str) -> dict:
+    return {"id": node_id, "type": "qa", "position": {"x": 0, "y": 0},
+            "data": {"context": [{"question": question, "llmResponse": "回答\n第二行"}]}}
+
+
+def _seed(client: TestClient, headers: dict) -> None:
+    for i in range(3):
+        nodes = [_node("a", f"问题{i}"), _node("b", "缓存淘汰")]
+        client.post("/api/v1/graphs/", json={"title": f"图{i}", "nodes": nodes,
+                                             "edges": [{"id": "ab", "source": "a", "target": "b"}]}, headers=headers)
+    with next(app.dependency_overrides[get_db]()) as session:  # 旧版纯 JSON 存储（含换行）
+        session.add(Graph(title="legacy", data='{"nodes": [\n{"id": "x"}], "edges": []}', owner_id=1))
+        session.commit()
+
+
+def _other_user() -> dict:
+    with next(app.dependency_overrides[get_db]()) as session:
+        session.add(User(user_name="other", password="x"))
+        session.commit()
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'other'})}"}
+
+
+def test_export_streams_ndjson_and_zstd(client: TestClient, auth_headers, monkeypatch):
+    monkeypatch.setattr(graph_transfer, "GRAPH_EXPORT_BATCH", 2)
+    _seed(client, auth_headers)
+    resp = client.get("/api/v1/graphs/export", headers=auth_headers)
+    assert resp.status_code == 200 and resp.headers["content-type"] == "application/x-ndjson"
+    lines = [orjson.loads(line) for line in resp.content.splitlines()]
+    assert lines[0]["format"] == "aitu-graphs"
+    assert [g["title"] for g in lines[1:]] == ["图0", "图1", "图2", "legacy"]
+    assert lines[1]["nodes"][0]["data"]["context"][0]["llmResponse"] == "回答\n第二行"
+    assert lines[4]["nodes"] == [{"id": "x"}]
+
+    zresp = client.get("/api/v1/graphs/export", params={"compression": "zstd"}, headers=auth_headers)
+    assert zresp.headers["content-type"] == "application/zstd"
+    assert zresp.headers["content-disposition"].endswith('.ndjson.zst"')
+    dobj = zstandard.ZstdDecompressor().decompressobj()
+    assert [orjson.loads(line) for line in dobj.decompress(zresp.content).splitlines()][1:] == lines[1:]
+
+
+def test_import_consumes_stream_in_batches(client: TestClient, auth_headers, monkeypatch):
+    monkeypatch.setattr("backend.app.api.v1.routes.graphs.GRAPH_IMPORT_BATCH", 2)
+    _seed(client, auth_headers)
+    exported = client.get("/api/v1/graphs/export", params={"compression": "zstd"}, headers=auth_headers).content
+    other = _other_user()
+
+    def chunks():  # 小块发送，行与 zstd 帧都会跨块
+        for i in range(0, len(exported), 7):
+            yield exported[i:i + 7]
+
+    resp = client.post("/api/v1/graphs/import", content=chunks(), headers=other)
+    assert resp.status_code == 200, resp.text
+    result = resp.json()
+    assert (result["imported"], result["skipped"], len(result["ids"])) == (4, 0, 4)
+
+    listed = client.get("/api/v1/graphs/", headers=other).json()
+    assert sorted(g["title"] for g in listed) == ["legacy", "图0", "图1", "图2"]
+    graph = client.get(f"/api/v1/graphs/{result['ids'][0]}").json()
+    assert graph["version"] == 0 and [n["id"] for n in graph["nodes"]] == ["a", "b"]
+    hits = client.get("/api/v1/search", params={"q": "缓存淘汰"}, headers=other).json()
+    assert len(hits) == 3  # 导入时同步建立全文索引
+
+    bad = b'{"title": "ok", "nodes": [], "edges": []}\nnot json\n{"title": ""}\n{"format": "other"}\n'
+    result = client.post("/api/v1/graphs/import", content=bad, headers=other).json()
+    assert (result["imported"], result["skipped"]) == (1, 3)
+    assert [e["line"] for e in result["errors"]] == [2, 3, 4]
+
+
+def test_import_rejects_zstd_bomb_with_bounded_memory():
+    cobj = zstandard.ZstdCompressor().compressobj()
+    block = b"a" * (1 << 20)
+    bomb = b"".join(cobj.compress(block) for _ in range(64)) + cobj.flush()  # 64MB 的单行，压缩后仅几 KB
+
+    async def consume():
+        async def chunks():
+            yield bomb
+        async for _ in graph_transfer.iter_lines(chunks(), max_line=1 << 20):
+            pass
+
+    tracemalloc.start()
+    try:
+        with pytest.raises(graph_transfer.ImportLineTooLong):
+            asyncio.run(consume())
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 16 << 20
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import backend.app.main  # noqa: F401  导入即注册全部表模型
+from backend.app.utils.graph_hub import CLOSE_NOT_FOUND, CLOSE_SLOW_CONSUMER, CLOSE_UNAUTHORIZED, GraphHub
+
+
+def _node(node_id: str, answer: str = "a") -> dict:
+    return {"id": node_id, "type": "qa", "position": {"x": 0, "y": 0},
+            "data": {"context": [{"question": "q", "llmResponse": answer}]}}
+
+
+def _create(client: TestClient, headers: dict) -> int:
+    resp = client.post("/api/v1/graphs/", json={"title": "t", "nodes": [_node("1")], "edges": []}, headers=headers)
+    return resp.json()["id"]
+
+
+def _ws(client: TestClient, gid: int, headers: dict, since: int | None = None):
+    token = headers["Authorization"].split()[1]
+    query = f"?token={token}" + (f"&since={since}" if since is not None else "")
+    return client.websocket_connect(f"/api/v1/graphs/{gid}/ws{query}")
+
+
+def test_ops_broadcast_to_all_subscribers_with_sequence(client: TestClient, auth_headers):
+    gid = _create(client, auth_headers)
+    with _ws(client, gid, auth_headers) as a, _ws(client, gid, auth_headers) as b:
+        snapshot = a.receive_json()
+        assert snapshot["type"] == "snapshot" and snapshot["seq"] == 0 and snapshot["nodes"][0]["id"] == "1"
+        ready_a, _, ready_b = a.receive_json(), b.receive_json(), b.receive_json()
+        assert ready_a["seq"] == 0 and ready_a["client_id"] != ready_b["client_id"]
+
+        a.send_json({"type": "op", "op_id": "x1", "upsert_nodes": [_node("2")],
+                     "upsert_edges": [{"id": "1-2", "source": "1", "target": "2"}]})
+        for ws in (a, b):  # 发送者收到的广播即确认
+            op = ws.receive_json()
+            assert (op["type"], op["seq"], op["op_id"], op["origin"]) == ("op", 1, "x1", ready_a["client_id"])
+            assert op["upsert_nodes"][0]["id"] == "2" and "delete_nodes" not in op
+
+        # REST 写入同样广播
+        client.patch(f"/api/v1/graphs/{gid}", headers=auth_headers, json={"version": 1, "delete_nodes": ["1"]})
+        assert b.receive_json() == {"type": "op", "origin": None, "op_id": None, "delete_nodes": ["1"], "seq": 2}
+
+        b.send_json({"type": "op", "upsert_nodes": [{"no": "id"}]})
+        assert b.receive_json()["status"] == 422
+        b.send_json({"type": "ping"})
+        assert b.receive_json() == {"type": "pong"}
+
+    graph = client.get(f"/api/v1/graphs/{gid}").json()
+    assert graph["version"] == 2 and [n["id"] for n in graph["nodes"]] == ["2"] and graph["edges"] == []
+
+
+def test_reconnect_resumes_from_last_sequence(client: TestClient, auth_headers):
+    gid = _create(client, auth_headers)
+    with _ws(client, gid, auth_headers) as ws:
+        ws.receive_json(), ws.receive_json()
+        for answer in ("b", "c"):
+            ws.send_json({"type": "op", "upsert_nodes": [_node("1", answer)]})
+            ws.receive_json()
+    client.patch(f"/api/v1/graphs/{gid}", headers=auth_headers, json={"version": 2, "title": "renamed"})  # 断线期间的写入
+
+    with _ws(client, gid, auth_headers, since=1) as ws:
+        replayed = [ws.receive_json() for _ in range(3)]
+        assert [m.get("seq") for m in replayed] == [2, 3, 3]
+        assert replayed[1]["title"] == "renamed" and replayed[2]["type"] == "ready"
+
+    with _ws(client, gid, auth_headers, since=99) as ws:  # 无法补齐时退回快照
+        assert ws.receive_json()["type"] == "snapshot"
+
+
+def test_auth_and_delete_close_codes(client: TestClient, auth_headers):
+    gid = _create(client, auth_headers)
+    with client.websocket_connect(f"/api/v1/graphs/{gid}/ws?token=bad") as ws:
+        with pytest.raises(WebSocketDisconnect) as exc:
+            ws.receive_json()
+        assert exc.value.code == CLOSE_UNAUTHORIZED
+    with _ws(client, gid, auth_headers) as ws:
+        ws.receive_json(), ws.receive_json()
+        client.delete(f"/api/v1/graphs/{gid}", headers=auth_headers)
+        assert ws.receive_json() == {"type": "deleted"}
+        with pytest.raises(WebSocketDisconnect) as exc:
+            ws.receive_json()
+        assert exc.value.code == CLOSE_NOT_FOUND
+
+
+def test_slow_subscriber_is_dropped_without_blocking_others():
+    async def scenario():
+        hub = GraphHub(history=4, queue_size=2)
+        slow, fast = hub.subscribe(1), hub.subscribe(1)
+        for seq in range(1, 4):
+            hub.publish(1, seq, {"type": "op"})
+            await fast.queue.get()
+        return hub, slow, [await slow.queue.get() for _ in range(slow.queue.qsize())]
+
+    hub, slow, items = asyncio.run(scenario())
+    assert items == [(None, None, CLOSE_SLOW_CONSUMER)] and hub.stats()["dropped"] == 1
+    assert [seq for seq, _ in hub.replay(1, 0, 3)] == [1, 2, 3] and hub.replay(1, 0, 5) is None
+    hub.unsubscribe(slow)
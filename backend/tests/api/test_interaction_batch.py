@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from backend.app.api.v1.routes import interaction
+from backend.app.core.security import get_current_user
+from backend.app.llm import agent as llm_agent
+from backend.app.main import app
+from backend.app.models.user import User
+
+
+@pytest.fixture(autouse=True)
+def _fresh_agent_cache():
+    llm_agent.agent_cache.clear()
+    app.dependency_overrides[get_current_user] = lambda: User(
+        id=1, user_name="alice", password="x", ad_model="fake-model", ad_api_key="k")
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+    llm_agent.agent_cache.clear()
+
+
+def _events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        head, data = block.split("\n", 1)
+        events.append((head.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+_calls = {"active": 0, "peak": 0}
+
+
+class _EchoModel(GenericFakeChatModel):
+    """回显最后一个问题，并记录同时在途的调用数"""
+
+    async def _agenerate(self, messages, *args, **kwargs):
+        _calls["active"] += 1
+        _calls["peak"] = max(_calls["peak"], _calls["active"])
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            _calls["active"] -= 1
+        if messages[-1].content == "boom":
+            raise RuntimeError("upstream key sk-secret rejected")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"re: {messages[-1].content}"))])
+
+
+def test_batch_streams_each_result_and_caps_concurrency(client: TestClient, monkeypatch):
+    monkeypatch.setattr(interaction, "ASK_BATCH_USER_CONCURRENCY", 2)
+    monkeypatch.setattr(llm_agent, "SiliconFlowChatModel", lambda **kwargs: _EchoModel(messages=iter([])))
+    _calls["peak"] = 0
+    items = [{"question": f"q{i}", "thread_id": f"b-{i}"} for i in range(5)]
+    resp = client.post("/api/v1/interaction/ask/batch", json={"model": "fake-model", "items": items})
+    assert resp.status_code == 200
+    events = _events(resp.text)
+    results = sorted((data for name, data in events if name == "result"), key=lambda d: d["index"])
+    assert [r["answer"] for r in results] == [f"re: q{i}" for i in range(5)]
+    assert events[-1] == ("done", {"succeeded": 5, "failed": 0})
+    assert _calls["peak"] == 2
+
+    saved = llm_agent.checkpointer.get({"configurable": {"thread_id": "b-3"}})
+    assert saved["channel_values"]["messages"][-1].content == "re: q3"
+
+
+def test_batch_reports_item_errors(client: TestClient, monkeypatch):
+    monkeypatch.setattr(llm_agent, "SiliconFlowChatModel", lambda **kwargs: _EchoModel(messages=iter([])))
+    items = [{"question": "ok", "thread_id": "c-1"},
+             {"question": "missing graph", "thread_id": "c-2", "graph_id": 999, "node_id": "n"},
+             {"question": "boom", "thread_id": "c-3"}]
+    events = _events(client.post("/api/v1/interaction/ask/batch", json={"model": "m", "items": items}).text)
+    assert ("error", {"index": 1, "thread_id": "c-2", "detail": "Graph not found"}) in events
+    assert ("error", {"index": 2, "thread_id": "c-3", "detail": "服务内部错误，请稍后重试"}) in events  # 不泄露异常内容
+    assert events[-1] == ("done", {"succeeded": 1, "failed": 2})
+
+
+def test_batch_validation(client: TestClient):
+    dup = [{"question": "a", "thread_id": "t"}, {"question": "b", "thread_id": "t"}]
+    assert client.post("/api/v1/interaction/ask/batch", json={"model": "m", "items": dup}).status_code == 400
+    too_many = [{"question": "a", "thread_id": f"t{i}"} for i in range(interaction.ASK_BATCH_MAX_ITEMS + 1)]
+    assert client.post("/api/v1/interaction/ask/batch", json={"model": "m", "items": too_many}).status_code == 422
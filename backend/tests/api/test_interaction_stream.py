@@ -0,0 +1,114 @@
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from backend.app.core.security import get_current_user
+from backend.app.llm import agent as llm_agent
+from backend.app.main import app
+from backend.app.models.user import User
+
+
+@pytest.fixture(autouse=True)
+def _fresh_agent_cache():
+    # 每个用例使用各自 monkeypatch 的假模型，避免命中上一个用例缓存的 agent
+    llm_agent.agent_cache.clear()
+    yield
+    llm_agent.agent_cache.clear()
+
+
+def _fake_user() -> User:
+    return User(id=1, user_name="alice", password="x", ad_model="fake-model", ad_api_key="k")
+
+
+def test_ask_stream_emits_tokens_and_saves_turn(client: TestClient, monkeypatch):
+    monkeypatch.setattr(
+        llm_agent, "SiliconFlowChatModel",
+        lambda **kwargs: GenericFakeChatModel(messages=iter([AIMessage(content="hello streaming world")])),
+    )
+    app.dependency_overrides[get_current_user] = _fake_user
+    try:
+        with client.stream("POST", "/api/v1/interaction/ask/stream",
+                           json={"question": "hi", "model": "fake-model", "thread_id": "g1-n1"}) as resp:
+            assert resp.status_code == 200
+            assert resp.headers["content-type"].startswith("text/event-stream")
+            body = "".join(resp.iter_text())
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+
+    assert body.count("event: token") > 1
+    assert 'event: done\ndata: {"answer": "hello streaming world"}' in body
+
+    saved = llm_agent.checkpointer.get({"configurable": {"thread_id": "g1-n1"}})
+    messages = saved["channel_values"]["messages"]
+    assert messages[-1].content == "hello streaming world"
+
+
+def test_ask_stream_hides_unexpected_error_details(client: TestClient, monkeypatch):
+    class _BrokenModel(GenericFakeChatModel):
+        def _stream(self, *args, **kwargs):
+            raise RuntimeError("upstream key sk-secret rejected")
+
+    monkeypatch.setattr(llm_agent, "SiliconFlowChatModel", lambda **kwargs: _BrokenModel(messages=iter([])))
+    app.dependency_overrides[get_current_user] = _fake_user
+    try:
+        with client.stream("POST", "/api/v1/interaction/ask/stream",
+                           json={"question": "hi", "model": "fake-model", "thread_id": "g1-err"}) as resp:
+            body = "".join(resp.iter_text())
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+
+    assert 'event: error\ndata: {"detail": "服务内部错误，请稍后重试"}' in body
+    assert "sk-secret" not in body
+
+
+def test_ask_stream_rejects_empty_question(client: TestClient):
+    app.dependency_overrides[get_current_user] = _fake_user
+    try:
+        resp = client.post("/api/v1/interaction/ask/stream",
+                           json={"question": "  ", "model": "fake-model", "thread_id": "g1-n1"})
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+    assert resp.status_code == 400
+
+
+def test_ask_is_async_and_uses_context_thread(client: TestClient, monkeypatch):
+    replies = iter([AIMessage(content="first answer"), AIMessage(content="branch answer")])
+    seen: list[list] = []
+
+    class _RecordingModel(GenericFakeChatModel):
+        async def _agenerate(self, messages, *args, **kwargs):
+            seen.append(messages)
+            return await super()._agenerate(messages, *args, **kwargs)
+
+    monkeypatch.setattr(llm_agent, "SiliconFlowChatModel", lambda **kwargs: _RecordingModel(messages=replies))
+    app.dependency_overrides[get_current_user] = _fake_user
+    try:
+        first = client.post("/api/v1/interaction/ask",
+                            json={"question": "root q", "model": "fake-model", "thread_id": "g2-a"})
+        branch = client.post("/api/v1/interaction/ask",
+                             json={"question": "branch q", "model": "fake-model", "thread_id": "g2-b",
+                                   "context_thread_id": "g2-a", "context_msg_index": 0})
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+
+    assert first.json() == {"answer": "first answer"}
+    assert branch.json() == {"answer": "branch answer"}
+    assert [m.content for m in seen[-1][-3:]] == ["root q", "first answer", "branch q"]
+
+
+def test_ask_maps_open_circuit_to_503(client: TestClient, monkeypatch):
+    from backend.app.llm.resilience import CircuitOpenError
+
+    class _DownModel(GenericFakeChatModel):
+        async def _agenerate(self, *args, **kwargs):
+            raise CircuitOpenError(("url", "fake-model"), retry_after=12)
+
+    monkeypatch.setattr(llm_agent, "SiliconFlowChatModel", lambda **kwargs: _DownModel(messages=iter([])))
+    app.dependency_overrides[get_current_user] = _fake_user
+    try:
+        resp = client.post("/api/v1/interaction/ask",
+                           json={"question": "q", "model": "fake-model", "thread_id": "g3-a"})
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+    assert resp.status_code == 503 and resp.headers["retry-after"] == "12"
@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+from sqlmodel import Session
+
+from backend.app.api.deps import get_db
+from backend.app.jobs import queue, tasks
+from backend.app.jobs.queue import JobContext, job_handler
+from backend.app.jobs.worker import Worker
+from backend.app.llm.quota import usage_ledger
+from backend.app.main import app
+from backend.app.models.job import Job
+from backend.app.models.usage import UserQuota
+
+
+def _engine():
+    with next(app.dependency_overrides[get_db]()) as session:
+        return session.get_bind()
+
+
+def _node(node_id: str, question: str, answer: str) -> dict:
+    return {"id": node_id, "type": "qa", "position": {"x": 0, "y": 0},
+            "data": {"context": [{"question": question, "llmResponse": answer}]}}
+
+
+def _create_graph(client: TestClient, auth_headers: dict) -> int:
+    nodes = [_node("root", "什么是缓存", "缓存保存计算结果"), _node("child", "LRU 是什么", "按最近使用淘汰")]
+    edges = [{"id": "e1", "source": "root", "target": "child"}]
+    resp = client.post("/api/v1/graphs/", json={"title": "缓存", "nodes": nodes, "edges": edges}, headers=auth_headers)
+    return resp.json()["id"]
+
+
+class _FakeModel:
+    def __init__(self):
+        self.prompts: list[str] = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages[-1].content)
+        return AIMessage(content=f"summary #{len(self.prompts)}")
+
+
+def test_summarize_graph_job(client: TestClient, auth_headers, monkeypatch):
+    graph_id = _create_graph(client, auth_headers)
+    model = _FakeModel()
+    monkeypatch.setattr(tasks, "chat_model", lambda user: model)
+    monkeypatch.setattr(tasks, "SUMMARY_CHUNK_CHARS", 20)  # 强制分块 + 合并
+
+    resp = client.post("/api/v1/jobs", json={"kind": "summarize_graph", "payload": {"graph_id": graph_id}},
+                       headers=auth_headers)
+    assert resp.status_code == 202 and resp.json()["status"] == "queued"
+    job_id = resp.json()["id"]
+
+    asyncio.run(Worker(_engine()).drain())
+
+    status = client.get(f"/api/v1/jobs/{job_id}", headers=auth_headers).json()
+    assert status["status"] == "succeeded" and status["progress"] == 1.0
+    assert status["result"] == {"graph_id": graph_id, "title": "缓存", "summary": "summary #3", "chunks": 2}
+    assert "什么是缓存" in model.prompts[0] and "LRU" in model.prompts[1]  # 按树的层级顺序
+    assert [j["id"] for j in client.get("/api/v1/jobs", headers=auth_headers).json()] == [job_id]
+    # 上游调用的用量（未返回用量时按本地分词估算）记在任务所有者名下
+    used = usage_ledger.usage(1)
+    assert list(used) == ["unknown"] and used["unknown"] > 0
+
+
+def test_summarize_graph_job_respects_quota(client: TestClient, auth_headers, monkeypatch):
+    graph_id = _create_graph(client, auth_headers)
+    model = _FakeModel()
+    monkeypatch.setattr(tasks, "chat_model", lambda user: model)
+    with Session(_engine()) as session:
+        session.add(UserQuota(user_id=1, daily_tokens=100))
+        session.commit()
+    usage_ledger.record(1, "fake-model", 90, 10)
+
+    job_id = client.post("/api/v1/jobs", json={"kind": "summarize_graph", "payload": {"graph_id": graph_id}},
+                         headers=auth_headers).json()["id"]
+    asyncio.run(Worker(_engine()).drain())
+
+    status = client.get(f"/api/v1/jobs/{job_id}", headers=auth_headers).json()
+    assert status["status"] == "failed" and "quota" in status["error"]
+    assert model.prompts == []  # 未发往上游
+
+
+def test_reindex_job_rebuilds_search(client: TestClient, auth_headers):
+    graph_id = _create_graph(client, auth_headers)
+    engine = _engine()
+    with Session(engine) as session:
+        from backend.app.search import fulltext
+        fulltext.drop_graph(session, graph_id)
+        session.commit()
+    assert client.get("/api/v1/search", params={"q": "淘汰"}, headers=auth_headers).json() == []
+
+    job_id = client.post("/api/v1/jobs", json={"kind": "reindex"}, headers=auth_headers).json()["id"]
+    asyncio.run(Worker(engine).drain())
+
+    assert client.get(f"/api/v1/jobs/{job_id}", headers=auth_headers).json()["result"] == {"graphs": 1, "nodes": 2}
+    hits = client.get("/api/v1/search", params={"q": "淘汰"}, headers=auth_headers).json()
+    assert [h["nodeId"] for h in hits] == ["child"]
+
+
+def test_job_validation_and_cancel(client: TestClient, auth_headers):
+    assert client.post("/api/v1/jobs", json={"kind": "nope"}, headers=auth_headers).status_code == 400
+    assert client.post("/api/v1/jobs", json={"kind": "summarize_graph", "payload": {"graph_id": 99}},
+                       headers=auth_headers).status_code == 404
+    job_id = client.post("/api/v1/jobs", json={"kind": "reindex"}, headers=auth_headers).json()["id"]
+    assert client.post(f"/api/v1/jobs/{job_id}/cancel", headers=auth_headers).json()["status"] == "cancelled"
+    assert client.get("/api/v1/jobs/12345", headers=auth_headers).status_code == 404
+
+
+calls = {"flaky": 0}
+
+
+@job_handler("test_flaky", max_attempts=2)
+def _flaky(ctx: JobContext):
+    calls["flaky"] += 1
+    if calls["flaky"] == 1:
+        raise RuntimeError("transient")
+    return {"ok": True}
+
+
+def test_retry_with_backoff_and_stale_lease(monkeypatch):
+    monkeypatch.setattr(queue, "JOB_RETRY_BASE", 0)
+    engine = _engine()
+    with Session(engine) as session:
+        job_id = queue.enqueue(session, "test_flaky").id
+    asyncio.run(Worker(engine).drain())
+    with Session(engine) as session:
+        job = session.get(Job, job_id)
+        assert (job.status, job.attempts, job.result) == ("succeeded", 2, '{"ok": true}')
+        assert job.error == "internal error"  # 异常详情只记日志
+
+        # 模拟 worker 崩溃：任务停留在 running 且心跳过期
+        stale = queue.enqueue(session, "test_flaky")
+        assert queue.claim(session, "dead-worker").id == stale.id
+        stale.heartbeat_at = time.time() - 1000
+        session.add(stale)
+        session.commit()
+        assert queue.requeue_stale(session, lease=60) == 1
+        session.refresh(stale)
+        assert stale.status == "queued" and stale.worker is None
+
+
+def test_job_metrics_use_the_bound_engine_off_the_event_loop(client: TestClient, auth_headers):
+    from backend.app.api.v1.routes.jobs import job_counts
+
+    client.post("/api/v1/jobs", json={"kind": "reindex"}, headers=auth_headers)
+    [(_, _, _, samples)] = job_counts.collect()  # 首次抓取不等待查询，在后台线程刷新
+    deadline = time.monotonic() + 5
+    while job_counts._updated == float("-inf") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    [(_, _, _, samples)] = job_counts.collect()
+    assert dict((labels["status"], n) for labels, n in samples) == {"queued": 1, "running": 0}
+
+
+def test_tree_order_with_numeric_ids():
+    nodes = [{"id": 3}, {"id": 2}, {"id": 1}]
+    edges = [{"source": 1, "target": 2}, {"source": 2, "target": 3}]
+    assert [n["id"] for n in tasks.tree_order(nodes, edges)] == [1, 2, 3]
@@ -0,0 +1,43 @@
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from backend.app.api.deps import get_db
+from backend.app.core.metrics import instrument_engine
+from backend.app.llm import agent as llm_agent
+from backend.app.llm.usage import LLM_TOKENS
+from backend.app.main import app
+
+
+def _sample(text: str, prefix: str) -> float:
+    line = next(line for line in text.splitlines() if line.startswith(prefix))
+    return float(line.rsplit(" ", 1)[1])
+
+
+def test_metrics_endpoint_reports_requests_spans_and_tokens(client: TestClient, auth_headers, monkeypatch):
+    llm_agent.agent_cache.clear()
+    monkeypatch.setattr(llm_agent, "SiliconFlowChatModel", lambda **kwargs: GenericFakeChatModel(
+        messages=iter([AIMessage(content="answer", usage_metadata={
+            "input_tokens": 11, "output_tokens": 7, "total_tokens": 18})])))
+    before = LLM_TOKENS.value(model="unknown", type="prompt")
+    with next(app.dependency_overrides[get_db]()) as session:
+        instrument_engine(session.get_bind())  # 用例使用独立引擎，应用引擎在 db.base 中已接入
+
+    graph = client.post("/api/v1/graphs/", json={"title": "t", "nodes": [], "edges": []}, headers=auth_headers)
+    client.get(f"/api/v1/graphs/{graph.json()['id']}", headers=auth_headers)
+    resp = client.post("/api/v1/interaction/ask", headers=auth_headers,
+                       json={"question": "q", "model": "m", "thread_id": "metrics-1"})
+    assert resp.status_code == 200
+    llm_agent.agent_cache.clear()
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200 and metrics.headers["content-type"].startswith("text/plain")
+    text = metrics.text
+    assert _sample(text, 'aitu_http_requests_total{method="GET",route="/api/v1/graphs/{graph_id}",status="200"}') >= 1
+    assert _sample(text, 'aitu_span_duration_seconds_count{span="graph.pack"}') >= 1
+    assert _sample(text, 'aitu_span_duration_seconds_count{span="auth.decode"}') >= 1
+    assert _sample(text, 'aitu_span_duration_seconds_count{span="ask.invoke"}') >= 1
+    assert 'aitu_graph_payload_bytes_bucket{op="pack",encoding="stored"' in text
+    assert "aitu_db_query_duration_seconds_count" in text
+    assert LLM_TOKENS.value(model="unknown", type="prompt") - before == 11
+    assert "aitu_graph_response_cache_hits" in text and "aitu_completion_cache_hits" in text
@@ -0,0 +1,54 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+
+from backend.app.api.deps import get_db
+from backend.app.core import hashing
+from backend.app.main import app
+from backend.app.models.user import User
+
+SECRET_COST_12 = "$2b$12$VNihoqOCXPaTW6LsPyCcpukeXISCVHxrMazjuTOFsmBMyXA3He1PC"  # 'secret'
+
+
+def _add_alice():
+    with next(app.dependency_overrides[get_db]()) as session:
+        session.add(User(user_name="alice", password=SECRET_COST_12))
+        session.commit()
+
+
+def _stored_hash() -> str:
+    with next(app.dependency_overrides[get_db]()) as session:
+        return session.get(User, 1).password
+
+
+def test_login_rehashes_when_cost_changes(client: TestClient, monkeypatch):
+    _add_alice()
+    monkeypatch.setattr(hashing, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4))
+    assert client.post("/api/v1/users/login/", json={"user_name": "alice", "password": "secret"}).status_code == 200
+    assert _stored_hash().startswith("$2b$04$")
+    assert client.post("/api/v1/users/login/", json={"user_name": "alice", "password": "secret"}).status_code == 200
+    assert client.post("/api/v1/users/login/", json={"user_name": "alice", "password": "bad"}).status_code == 401
+
+
+def test_login_rejected_when_hasher_saturated(client: TestClient, monkeypatch):
+    _add_alice()
+    monkeypatch.setattr(hashing.password_hasher, "max_pending", 0)
+    resp = client.post("/api/v1/users/login/", json={"user_name": "alice", "password": "secret"})
+    assert resp.status_code == 503 and resp.headers["retry-after"] == "1"
+    assert _stored_hash() == SECRET_COST_12
+
+
+def test_process_pool_roundtrip():
+    hasher = hashing.PasswordHasher(workers=1, max_pending=4)
+
+    async def scenario():
+        hashed = await hasher.hash("pw")
+        return hashed, await hasher.verify_and_update("pw", hashed), await hasher.verify_and_update("no", hashed)
+
+    try:
+        hashed, ok, bad = asyncio.run(scenario())
+    finally:
+        hasher.shutdown()
+    assert hashed.startswith(f"$2b${hashing.BCRYPT_ROUNDS:02d}$")
+    assert ok == (True, None) and bad == (False, None)
@@ -0,0 +1,40 @@
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from sqlmodel import select
+
+from backend.app.api.deps import get_db
+from backend.app.llm import agent as llm_agent
+from backend.app.llm.quota import usage_ledger
+from backend.app.main import app
+from backend.app.models.usage import LLMUsage, UserQuota
+
+
+def test_usage_is_persisted_and_quota_rejects_before_upstream(client: TestClient, auth_headers, monkeypatch):
+    llm_agent.agent_cache.clear()
+    monkeypatch.setattr(llm_agent, "SiliconFlowChatModel", lambda **kwargs: GenericFakeChatModel(
+        messages=iter([AIMessage(content=f"answer {i}", usage_metadata={
+            "input_tokens": 11, "output_tokens": 7, "total_tokens": 18}) for i in range(5)])))
+    with next(app.dependency_overrides[get_db]()) as session:
+        session.add(UserQuota(user_id=1, daily_tokens=30, weight=2))
+        session.commit()
+
+    def ask(thread: str):
+        return client.post("/api/v1/interaction/ask", headers=auth_headers,
+                           json={"question": "q", "model": "m", "thread_id": thread})
+
+    assert ask("quota-1").status_code == 200
+    assert ask("quota-2").status_code == 200
+    rejected = ask("quota-3")
+    assert rejected.status_code == 429 and int(rejected.headers["Retry-After"]) > 0
+    stream = client.post("/api/v1/interaction/ask/stream", headers=auth_headers,
+                         json={"question": "q", "model": "m", "thread_id": "quota-4"})
+    assert stream.status_code == 429
+    llm_agent.agent_cache.clear()
+
+    report = client.get("/api/v1/interaction/usage", headers=auth_headers).json()
+    assert (report["used"], report["limit"], report["remaining"], report["weight"]) == (36, 30, 0, 2)
+    usage_ledger.flush()
+    with next(app.dependency_overrides[get_db]()) as session:
+        row = session.exec(select(LLMUsage).where(LLMUsage.user_id == 1)).one()
+    assert (row.requests, row.prompt_tokens, row.completion_tokens) == (2, 22, 14)
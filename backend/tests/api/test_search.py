@@ -0,0 +1,42 @@
+from fastapi.testclient import TestClient
+
+from backend.app.search import fulltext
+
+
+def _node(node_id: str, question: str, answer: str) -> dict:
+    return {"id": node_id, "type": "markdown", "position": {"x": 0, "y": 0},
+            "data": {"context": [{"question": question, "llmResponse": answer}]}}
+
+
+def test_search_ranks_and_tracks_writes(client: TestClient, auth_headers):
+    gid = client.post("/api/v1/graphs/", headers=auth_headers, json={"title": "机器学习", "edges": [], "nodes": [
+        _node("a", "什么是梯度下降", "梯度下降沿负梯度方向迭代，梯度下降常用于训练神经网络"),
+        _node("b", "Python 入门", "Python is a programming language"),
+    ]}).json()["id"]
+
+    hits = client.get("/api/v1/search", params={"q": "梯度下降"}, headers=auth_headers).json()
+    assert [(h["graphId"], h["nodeId"], h["graphTitle"], h["title"]) for h in hits] == \
+        [(gid, "a", "机器学习", "什么是梯度下降")]
+    snippet, (start, end) = hits[0]["snippet"], hits[0]["highlights"][0]
+    assert snippet[start:end] == "梯度下降"
+    # 不相邻的字不算命中；英文按前缀匹配
+    assert client.get("/api/v1/search", params={"q": "梯降"}, headers=auth_headers).json() == []
+    assert [h["nodeId"] for h in client.get("/api/v1/search", params={"q": "progr"}, headers=auth_headers).json()] == ["b"]
+
+    client.put(f"/api/v1/graphs/{gid}", headers=auth_headers, json={"title": "机器学习", "edges": [], "nodes": [
+        _node("b", "Python 入门", "Python is a programming language"), _node("c", "牛顿法", "二阶优化方法")]})
+    assert client.get("/api/v1/search", params={"q": "梯度下降"}, headers=auth_headers).json() == []
+    assert [h["nodeId"] for h in client.get("/api/v1/search", params={"q": "优化"}, headers=auth_headers).json()] == ["c"]
+
+    client.delete(f"/api/v1/graphs/{gid}", headers=auth_headers)
+    assert client.get("/api/v1/search", params={"q": "python"}, headers=auth_headers).json() == []
+
+
+def test_search_falls_back_to_like_on_other_dialects(client: TestClient, auth_headers, monkeypatch):
+    client.post("/api/v1/graphs/", headers=auth_headers, json={"title": "g", "edges": [], "nodes": [
+        _node("a", "什么是梯度下降", "沿负梯度方向迭代"), _node("b", "Python 入门", "Python is a programming language")]})
+    monkeypatch.setattr(fulltext, "_dialect", lambda session: "mysql")
+
+    hits = client.get("/api/v1/search", params={"q": "PYTHON progr"}, headers=auth_headers)
+    assert hits.status_code == 200 and [h["nodeId"] for h in hits.json()] == ["b"]
+    assert [h["nodeId"] for h in client.get("/api/v1/search", params={"q": "梯度"}, headers=auth_headers).json()] == ["a"]
@@ -0,0 +1,27 @@
+import pytest
+
+from backend.app.core.config import ConfigError, validate_settings
+from backend.bench.coldstart import compare_coldstart, measure_import
+
+
+def test_app_import_does_not_load_llm_stack(tmp_path):
+    # 新解释器中导入应用：LangChain/LangGraph/openai 应留到首次问答或预热时加载
+    sample = measure_import({"DATABASE_URL": f"sqlite:///{tmp_path}/app.db"})
+    assert sample["llm_loaded"] == [] and sample["import_s"] > 0
+
+
+def test_validate_settings(monkeypatch):
+    monkeypatch.setenv("SILICONFLOW_API_KEY", "k")
+    assert validate_settings() == []
+    monkeypatch.delenv("SILICONFLOW_API_KEY")
+    assert any("SILICONFLOW_API_KEY" in w for w in validate_settings())
+    monkeypatch.setenv("JOB_WORKER", "inproces")
+    with pytest.raises(ConfigError, match="JOB_WORKER"):
+        validate_settings()
+
+
+def test_compare_coldstart():
+    a = {"summary": {"import_s": {"median": 2.0}, "ready_s": {"median": 4.0}}}
+    b = {"summary": {"import_s": {"median": 1.0}, "ready_s": {"median": 3.0}, "first_ask_s": {"median": 1.0}}}
+    rows = {row["metric"]: row["change"] for row in compare_coldstart(a, b)}
+    assert rows == {"import_s": -0.5, "ready_s": -0.25, "first_ask_s": None}
@@ -42,4 +42,21 @@ def test_register_success(client: TestClient):
 
     resp = client.put(f"/api/v1/users/{u.id}/register/", json={"user_name": "alice", "password": "secret"})
     assert resp.status_code == 200, resp.text
-    assert "authorization" in resp.headers
\ No newline at end of file
+    assert "authorization" in resp.headers
+
+def test_register_drops_cached_agent(client: TestClient, monkeypatch):
+    from backend.app.llm import agent as llm_agent
+
+    override = app.dependency_overrides[get_db]
+    with next(override()) as session:
+        u = User(user_name="bob", password="x", ad_model="m", ad_api_key="k")
+        session.add(u)
+        session.commit()
+        session.refresh(u)
+    monkeypatch.setattr(llm_agent, "agent_cache", llm_agent.AgentCache(lambda model, key: object()))
+    llm_agent.agent_cache.get(u.id, "m", "k")
+    assert len(llm_agent.agent_cache) == 1
+
+    resp = client.put(f"/api/v1/users/{u.id}/register/", json={"user_name": "bob", "password": "secret"})
+    assert resp.status_code == 200, resp.text
+    assert len(llm_agent.agent_cache) == 0  # 用户设置变更后不再复用旧 agent
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# 应用级组件（db.base.engine、回答缓存等）在导入时按 DATABASE_URL 建立连接；指向临时库，
+# 测试不会打开（也不会以 WAL 模式改写）仓库中的开发库 backend/data/graphs.db
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='aitu-tests-')}/app.db")
@@ -0,0 +1,47 @@
+"""本地 OpenAI 兼容服务（/v1/chat/completions），按脚本返回延迟、错误码或回答，用于验证上游调用策略。
+
+响应格式复用压测桩模型 backend.bench.stub_llm，这里只负责脚本与在后台线程中运行。
+"""
+from __future__ import annotations
+import socket
+import threading
+import time
+
+import uvicorn
+
+from backend.bench.stub_llm import StubConfig, create_stub_app
+
+
+class FakeOpenAI:
+    """每个请求依次弹出 script 中的一步：{"delay": 秒, "status": 错误码, "text": 回答}；
+    脚本用完后按 default 响应，failing_models 中的模型始终返回 503。"""
+
+    def __init__(self):
+        self.script: list[dict] = []
+        self.default: dict = {"text": "ok"}
+        self.failing_models: set[str] = set()
+        self.requests: list[dict] = []
+        app = create_stub_app(StubConfig(latency_ms=0), script=self._step)
+        self._server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="off",
+                                                     timeout_graceful_shutdown=1))
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self.url = "http://127.0.0.1:%d/v1" % self._sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [self._sock]}, daemon=True)
+
+    def __enter__(self) -> "FakeOpenAI":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(5)
+        self._sock.close()
+
+    def _step(self, body: dict) -> dict:
+        self.requests.append(body)
+        if body.get("model") in self.failing_models:
+            return {"status": 503}
+        return self.script.pop(0) if self.script else self.default
@@ -0,0 +1,52 @@
+from backend.app.llm.agent_cache import AgentCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _cache(**kwargs):
+    built: list[tuple] = []
+
+    def factory(model, api_key):
+        built.append((model, api_key))
+        return object()
+
+    return AgentCache(factory, **kwargs), built
+
+
+def test_reuses_agent_for_same_model_and_key():
+    cache, built = _cache()
+    a = cache.get(1, "m", "k")
+    b = cache.get(2, "m", "k")
+    assert a is b
+    assert built == [("m", "k")]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_and_idle_eviction():
+    clock = _Clock()
+    cache, built = _cache(maxsize=2, idle_ttl=10, clock=clock)
+    cache.get(1, "a", "k")
+    cache.get(2, "b", "k")
+    cache.get(3, "c", "k")
+    assert len(cache) == 2  # "a" 被 LRU 淘汰
+    clock.now = 11
+    cache.get(4, "d", "k")
+    assert len(cache) == 1  # 其余条目空闲超时
+
+
+def test_key_change_drops_old_entry_unless_shared():
+    cache, built = _cache()
+    cache.get(1, "m", "old")
+    cache.get(2, "m", "shared")
+    cache.get(3, "m", "shared")
+    cache.get(1, "m", "new")
+    cache.get(2, "m", "other")
+    assert len(cache) == 3  # "old" 被丢弃，"shared" 仍被用户 3 使用
+    cache.invalidate_user(3)
+    assert len(cache) == 2
@@ -0,0 +1,57 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain.agents import create_agent
+from sqlmodel import create_engine
+
+from backend.app.llm.checkpointer import SQLCheckpointSaver
+
+
+@pytest.fixture
+def engine(tmp_path: Path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ckpt.db'}", connect_args={"check_same_thread": False})
+    yield engine
+    engine.dispose()
+
+
+def _agent(saver, *answers: str):
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=a) for a in answers]))
+    return create_agent(model=model, tools=[], system_prompt="sys", checkpointer=saver)
+
+
+def test_history_survives_new_saver_instance(engine):
+    saver = SQLCheckpointSaver(engine)
+    saver.setup()
+    config = {"configurable": {"thread_id": "g1-n1"}}
+    _agent(saver, "a1").invoke({"messages": [{"role": "user", "content": "q1"}]}, config=config)
+
+    # 模拟另一个 worker / 重启后的进程：没有热点缓存
+    other = SQLCheckpointSaver(engine, cache_size=0)
+    _agent(other, "a2").invoke({"messages": [{"role": "user", "content": "q2"}]}, config=config)
+
+    messages = saver.get(config)["channel_values"]["messages"]
+    assert [m.content for m in messages] == ["q1", "a1", "q2", "a2"]
+
+
+def test_async_api_and_pruning(engine):
+    asyncio.run(_async_api_and_pruning(engine))
+
+
+async def _async_api_and_pruning(engine):
+    saver = SQLCheckpointSaver(engine, keep_per_thread=2)
+    saver.setup()
+    config = {"configurable": {"thread_id": "t"}}
+    agent = _agent(saver, "a1", "a2", "a3")
+    for q in ("q1", "q2", "q3"):
+        await agent.ainvoke({"messages": [{"role": "user", "content": q}]}, config=config)
+
+    history = [c async for c in saver.alist(config)]
+    assert len(history) == 2
+    latest = await saver.aget(config)
+    assert [m.content for m in latest["channel_values"]["messages"]][-2:] == ["q3", "a3"]
+
+    await saver.adelete_thread("t")
+    assert await saver.aget_tuple(config) is None
@@ -0,0 +1,66 @@
+import asyncio
+
+from langchain.agents import create_agent
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from sqlmodel import create_engine
+
+from backend.app.llm.completion_cache import CompletionCache, CompletionCacheMiddleware, completion_key
+from backend.app.llm.context import AskContext
+from backend.app.models.completion import CompletionCacheEntry
+
+
+class _SlowModel(GenericFakeChatModel):
+    calls: int = 0
+
+    async def _agenerate(self, messages, *args, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return await super()._agenerate(messages, *args, **kwargs)
+
+
+def _cache(tmp_path, **kwargs) -> CompletionCache:
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    CompletionCacheEntry.__table__.create(engine)
+    return CompletionCache(engine, **kwargs)
+
+
+def test_key_normalizes_whitespace():
+    model = GenericFakeChatModel(messages=iter([]))
+    assert completion_key(model, "sys", [HumanMessage(content=" what  is\nAI ")]) == \
+        completion_key(model, "sys", [HumanMessage(content="what is AI")])
+    assert completion_key(model, "sys", [HumanMessage(content="a")]) != completion_key(model, "other", [HumanMessage(content="a")])
+
+
+def test_cache_hits_and_coalesces_concurrent_requests(tmp_path):
+    cache = _cache(tmp_path)
+    model = _SlowModel(messages=iter([AIMessage(content="shared answer"), AIMessage(content="fresh answer")]))
+    agent = create_agent(model=model, tools=[], system_prompt="sys", context_schema=AskContext,
+                         middleware=[CompletionCacheMiddleware(cache)])
+
+    async def ask(cached: bool = True):
+        result = await agent.ainvoke({"messages": [{"role": "user", "content": "同一个问题"}]},
+                                     context=AskContext(use_cache=cached))
+        return result["messages"][-1].content
+
+    async def scenario():
+        concurrent = await asyncio.gather(ask(), ask(), ask())
+        return concurrent, await ask(), await ask(cached=False)
+
+    concurrent, later, uncached = asyncio.run(scenario())
+    assert concurrent == ["shared answer"] * 3 and later == "shared answer"
+    assert uncached == "fresh answer" and model.calls == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["coalesced"], stats["upstream_calls"]) == (1, 3, 2, 1)
+
+
+def test_ttl_and_size_eviction(tmp_path):
+    now = [1000.0]
+    cache = _cache(tmp_path, ttl=100, max_entries=2, clock=lambda: now[0])
+    for i in range(3):
+        now[0] += 1
+        cache.store(f"k{i}", "m", AIMessage(content=f"a{i}"))
+    cache._prune(cache._session(), now[0])
+    assert cache.lookup("k0") is None and cache.lookup("k2").content == "a2"
+    now[0] += 200
+    assert cache.lookup("k2") is None
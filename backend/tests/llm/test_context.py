@@ -0,0 +1,67 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from backend.app.llm.context import (
+    ancestor_chain, assemble_messages, branch_turns, count_tokens, pack_turns,
+)
+
+
+def _node(node_id, *qas):
+    return {"id": node_id, "data": {"context": [{"question": q, "llmResponse": a} for q, a in qas]}}
+
+
+NODES = [
+    _node("root", ("root q0", "root a0"), ("root q1", "root a1 " * 50)),
+    _node("mid", ("mid q", "mid a")),
+    _node("leaf", ("leaf q", None)),
+    _node("other", ("other q", "other a")),
+]
+EDGES = [
+    {"id": "root-mid", "source": "root", "target": "mid"},
+    {"id": "mid-leaf", "source": "mid", "target": "leaf"},
+    {"id": "root-other", "source": "root", "target": "other"},
+]
+
+
+def test_ancestor_chain_is_nearest_first_and_ignores_siblings():
+    assert [n["id"] for n in ancestor_chain(NODES, EDGES, "leaf")] == ["mid", "root"]
+    assert ancestor_chain(NODES, EDGES, "root") == []
+
+
+def test_ancestor_chain_accepts_numeric_ids():
+    nodes = [{"id": 1}, {"id": 2}, {"id": 3}]
+    edges = [{"source": 1, "target": 2}, {"source": 2, "target": 3}]
+    assert [n["id"] for n in ancestor_chain(nodes, edges, "3")] == [2, 1]
+
+
+def test_pack_prefers_near_turns_and_keeps_chronological_order():
+    turns = branch_turns(NODES, EDGES, "leaf")
+    assert [t.question for t in turns] == ["root q0", "root q1", "mid q"]
+
+    small = pack_turns(turns, budget=count_tokens("mid q") + count_tokens("mid a") + 8)
+    assert [m.content for m in small] == ["mid q", "mid a"]
+
+    everything = pack_turns(turns, budget=10_000)
+    assert [m.content for m in everything][::2] == ["root q0", "root q1", "mid q"]
+
+
+def test_focus_turn_wins_and_long_turn_is_truncated():
+    turns = branch_turns(NODES, EDGES, "mid", focus_index=1)
+    packed = pack_turns(turns, budget=90)
+    assert packed[0].content == "root q1"
+    assert packed[1].content.endswith("（已截断）")
+    assert "root q0" not in [m.content for m in packed]
+
+
+def test_assemble_keeps_current_question_and_recent_history_within_budget():
+    history = []
+    for i in range(20):
+        history += [HumanMessage(content=f"q{i} " * 20), AIMessage(content=f"a{i} " * 20)]
+    messages = [SystemMessage(content="sys"), *history, HumanMessage(content="now?")]
+    turns = branch_turns(NODES, EDGES, "leaf")
+
+    assembled = assemble_messages(messages, turns, budget=400)
+    assert isinstance(assembled[0], SystemMessage)
+    assert assembled[-1].content == "now?"
+    assert "mid q" in [m.content for m in assembled]
+    assert sum(count_tokens(m.content) for m in assembled[1:]) <= 400
+    assert isinstance(assembled[1], HumanMessage)
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from backend.app.llm.limiter import ModelBusyError, ModelLimiter
+
+
+async def _serve(limiter: ModelLimiter, requests: list[tuple[str, float]], order: list[str]) -> None:
+    """容量为 1：先占住名额，再按顺序提交请求，记录各用户获得名额的顺序"""
+    gate = asyncio.Event()
+
+    async def hold():
+        async with limiter.slot("m", "holder"):
+            await gate.wait()
+
+    async def one(user: str, weight: float):
+        async with limiter.slot("m", user, weight):
+            order.append(user)
+            await asyncio.sleep(0)
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    tasks = []
+    for user, weight in requests:
+        tasks.append(asyncio.create_task(one(user, weight)))
+        await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(holder, *tasks)
+
+
+def test_heavy_user_does_not_starve_others_and_weights_apply():
+    order: list[str] = []
+    asyncio.run(_serve(ModelLimiter(limit=1), [("a", 1)] * 4 + [("b", 1)], order))
+    # b 晚于 a 的 4 个请求到达，但只排在 a 的第一个请求之后
+    assert order[:2] == ["a", "b"]
+
+    order = []
+    asyncio.run(_serve(ModelLimiter(limit=1), [("a", 1)] * 6 + [("b", 2)] * 6, order))
+    # 权重为 2 的 b 在前半程获得约两倍的名额
+    assert order[:6].count("b") == 4
+
+
+def test_queue_depth_shedding_and_timeout():
+    async def main():
+        limiter = ModelLimiter(limit=1, acquire_timeout=0.05, max_queue=2, max_queue_per_user=1)
+        gate = asyncio.Event()
+
+        async def hold(user):
+            async with limiter.slot("m", user):
+                await gate.wait()
+
+        holder = asyncio.create_task(hold("x"))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(hold("a"))]
+        await asyncio.sleep(0)
+        with pytest.raises(ModelBusyError) as user_full:
+            await limiter.slot("m", "a").__aenter__()
+        queued.append(asyncio.create_task(hold("b")))
+        await asyncio.sleep(0)
+        with pytest.raises(ModelBusyError) as queue_full:
+            await limiter.slot("m", "c").__aenter__()
+        assert (user_full.value.reason, queue_full.value.reason) == ("user_queue_full", "queue_full")
+        # 排队超时的请求退出队列，不占用名额
+        for task in queued:
+            with pytest.raises(ModelBusyError):
+                await task
+        assert limiter.stats()["m"] == {"limit": 1, "in_flight": 1, "waiting": 0, "waiting_users": 0}
+        gate.set()
+        await holder
+        async with limiter.slot("m", "a"):
+            assert limiter.stats()["m"]["in_flight"] == 1
+        assert limiter.stats()["m"]["in_flight"] == 0
+
+    asyncio.run(main())
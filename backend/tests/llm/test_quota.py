@@ -0,0 +1,48 @@
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from backend.app.llm.quota import QuotaExceededError, UsageLedger
+from backend.app.models.usage import LLMUsage, UserQuota
+from backend.app.models.user import User
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'usage.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([User(id=1, user_name="a", password="x"), User(id=2, user_name="b", password="x"),
+                         UserQuota(user_id=2, daily_tokens=0, weight=3)])
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+def test_usage_is_merged_into_daily_rows_and_shared_between_ledgers(engine):
+    now = [86400 * 100 + 10.0]
+    ledger = UsageLedger(engine, daily_tokens=100, model_quotas={"big": 30}, flush_interval=0, clock=lambda: now[0])
+    ledger.record(1, "big", 10, 5)
+    ledger.record(1, "big", 10, 5)
+    ledger.record(1, "small", 40, 0)
+    ledger.flush()
+    ledger.record(1, "small", 1, 1)
+    ledger.flush()
+    with Session(engine) as session:
+        rows = {row.model: row for row in session.exec(select(LLMUsage))}
+    assert (rows["big"].requests, rows["big"].prompt_tokens, rows["big"].completion_tokens) == (2, 20, 10)
+    assert (rows["small"].requests, rows["small"].prompt_tokens) == (2, 41)
+
+    # 另一个 worker 从数据库读到同样的用量
+    other = UsageLedger(engine, daily_tokens=100, model_quotas={"big": 30}, clock=lambda: now[0])
+    with pytest.raises(QuotaExceededError) as exc:
+        other.check(1, "big")
+    assert (exc.value.model, exc.value.used, exc.value.retry_after) == ("big", 30, 86400 - 10)
+    assert other.check(1, "small").weight == 1.0
+    other.record(1, "small", 30, 0)
+    with pytest.raises(QuotaExceededError) as exc:
+        other.check(1, "small")
+    assert exc.value.model is None and exc.value.used == 102
+    # 用户配置覆盖默认配额（0 为不限）与权重；次日用量重新计算
+    assert other.check(2, "big").weight == 3
+    now[0] += 86400
+    assert other.check(1, "big").daily_tokens == 100
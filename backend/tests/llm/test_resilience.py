@@ -0,0 +1,131 @@
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+os.environ.setdefault("SILICONFLOW_API_KEY", "test-key")
+
+from backend.app.llm import resilience  # noqa: E402
+from backend.app.llm.model import SiliconFlowChatModel  # noqa: E402
+from backend.app.llm.resilience import CircuitOpenError, UpstreamPolicy, UpstreamTimeoutError  # noqa: E402
+from backend.tests.fake_openai import FakeOpenAI  # noqa: E402
+
+
+@pytest.fixture
+def fake():
+    with FakeOpenAI() as server:
+        yield server
+
+
+def _use_policy(monkeypatch, **kwargs) -> UpstreamPolicy:
+    kwargs = {"retry_base": 0.01, "retry_max": 0.02, "hedge": False, **kwargs}
+    policy = UpstreamPolicy(**kwargs)
+    monkeypatch.setattr(resilience, "upstream_policy", policy)
+    return policy
+
+
+def _model(fake: FakeOpenAI, **kwargs) -> SiliconFlowChatModel:
+    # 每个用例使用独立事件循环，不复用全局连接池
+    return SiliconFlowChatModel(model="primary", api_key="k", base_url=fake.url,
+                                http_client=httpx.Client(), http_async_client=httpx.AsyncClient(), **kwargs)
+
+
+def test_retries_transient_errors(fake, monkeypatch):
+    policy = _use_policy(monkeypatch)
+    fake.script = [{"status": 500}, {"status": 429}, {"text": "recovered"}]
+    reply = asyncio.run(_model(fake).ainvoke("hi"))
+    assert reply.content == "recovered"
+    assert len(fake.requests) == 3
+    assert policy.counters["retries"] == 2
+
+
+def test_client_errors_are_not_retried(fake, monkeypatch):
+    _use_policy(monkeypatch)
+    fake.script = [{"status": 400}]
+    with pytest.raises(Exception):
+        asyncio.run(_model(fake).ainvoke("hi"))
+    assert len(fake.requests) == 1
+
+
+def test_stream_retries_only_before_first_chunk(fake, monkeypatch):
+    _use_policy(monkeypatch)
+    fake.script = [{"status": 502}, {"text": "hello streaming world"}]
+
+    async def collect():
+        return [chunk.content async for chunk in _model(fake).astream("hi")]
+
+    assert "".join(asyncio.run(collect())) == "hello streaming world"
+    assert len(fake.requests) == 2
+
+
+def test_deadline(fake, monkeypatch):
+    _use_policy(monkeypatch, deadline=0.3)
+    fake.script = [{"delay": 2, "text": "late"}]
+    started = time.perf_counter()
+    with pytest.raises(UpstreamTimeoutError):
+        asyncio.run(_model(fake).ainvoke("hi"))
+    assert time.perf_counter() - started < 1.5
+
+
+def test_hedged_request_wins_over_slow_primary(fake, monkeypatch):
+    policy = _use_policy(monkeypatch, hedge=True, hedge_min_delay=0.2, hedge_min_samples=0)
+    fake.script = [{"delay": 3, "text": "slow"}, {"text": "fast"}]
+    started = time.perf_counter()
+    reply = asyncio.run(_model(fake).ainvoke("hi"))
+    assert reply.content == "fast"
+    assert time.perf_counter() - started < 2
+    assert (policy.counters["hedges"], policy.counters["hedge_wins"]) == (1, 1)
+
+
+def test_breaker_opens_then_falls_back(fake, monkeypatch):
+    policy = _use_policy(monkeypatch, max_attempts=1, breaker_failures=2, breaker_reset=60)
+    fake.failing_models = {"primary"}
+    model = _model(fake)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(Exception):
+                await model.ainvoke("hi")
+        with pytest.raises(CircuitOpenError):
+            await model.ainvoke("hi")
+        assert len(fake.requests) == 2  # 熔断期间不再请求上游
+        assert policy.stats()["breakers"] == {f"{fake.url}|primary": "open"}
+        return await _model(fake, fallback_model="backup").ainvoke("hi")
+
+    assert asyncio.run(scenario()).content == "ok"
+    assert fake.requests[-1]["model"] == "backup"
+    assert policy.counters["fallbacks"] == 1
+
+
+def test_breaker_half_open_probe():
+    now = [0.0]
+    breaker = resilience.CircuitBreaker(failures=1, reset_after=10, clock=lambda: now[0])
+    breaker.failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before("k")
+    now[0] = 11
+    breaker.before("k")  # 冷却后放行一个探测请求
+    with pytest.raises(CircuitOpenError):
+        breaker.before("k")
+    breaker.success()
+    assert breaker.state == "closed"
+
+
+def test_cancelled_probe_does_not_close_breaker():
+    policy = UpstreamPolicy(breaker_failures=1, breaker_reset=0.05, hedge=False)
+    breaker = policy.breaker(("u", "m"))
+    breaker.failure()
+    time.sleep(0.06)
+
+    async def scenario():
+        task = asyncio.create_task(policy.acall(("u", "m"), lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.02)  # 探测请求已发出
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert breaker.state == "half_open"  # 上游没有回应，熔断不能因此关闭
+    breaker.before("k")  # 探测名额已交还
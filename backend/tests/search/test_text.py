@@ -0,0 +1,17 @@
+from backend.app.search.fulltext import _fts5_query, _tsquery, make_snippet
+from backend.app.search.text import query_groups, tokenize
+
+
+def test_cjk_tokens_and_queries():
+    assert tokenize("AI 知识图谱") == ["ai", "知", "识", "图", "谱", "知识", "识图", "图谱"]
+    groups = query_groups("图谱 Graph 知")
+    assert groups == [("cjk", ["图谱"]), ("word", ["graph"]), ("cjk", ["知"])]
+    assert _fts5_query(groups) == '"图谱" AND "graph"* AND "知"'
+    assert _tsquery(query_groups("知识图谱")) == "('知识' <-> '识图' <-> '图谱')"
+
+
+def test_snippet_window_and_highlights():
+    body = "前言" * 100 + "这里讲梯度下降。" + "后记" * 100
+    snippet, spans = make_snippet(body, "梯度下降", width=40)
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert [snippet[s:e] for s, e in spans] == ["梯度下降"]
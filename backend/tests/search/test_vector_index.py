@@ -0,0 +1,58 @@
+import numpy as np
+
+from backend.app.search import vector_index
+from backend.app.search.embedding import HashingEmbedder
+from backend.app.search.vector_index import UserVectorIndex, VectorIndexManager
+
+
+def _node(node_id: str, question: str, answer: str) -> dict:
+    return {"id": node_id, "data": {"context": [{"question": question, "llmResponse": answer}]}}
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dim=64)
+    a, b, empty = embedder.embed(["知识图谱 graph", "知识图谱 graph", ""])
+    assert np.allclose(a, b) and np.isclose(np.linalg.norm(a), 1.0)
+    assert not empty.any()
+
+
+def test_incremental_index_and_cross_graph_search(tmp_path):
+    manager = VectorIndexManager(root=tmp_path, embedder=HashingEmbedder(dim=256))
+    manager.index_nodes(1, 10, [_node("a", "什么是梯度下降", "梯度下降是一种优化算法"),
+                                _node("b", "神经网络", "神经网络由多层神经元组成")])
+    manager.index_nodes(1, 20, [_node("c", "梯度下降的学习率", "学习率决定梯度下降每一步的步长"),
+                                _node("d", "法国大革命", "1789 年爆发")])
+
+    hits = manager.related(1, 10, _node("a", "什么是梯度下降", "梯度下降是一种优化算法"))
+    assert [(h.graph_id, h.node_id) for h in hits] == [(20, "c")]
+    with_same = manager.related(1, 10, _node("a", "", ""), include_same_graph=True, min_score=-1)
+    assert ("a" not in {h.node_id for h in with_same}) and len(with_same) == 3
+
+    # 内容未变不重复写入；删除节点/整图后不再命中
+    assert manager.index_nodes(1, 20, [_node("c", "梯度下降的学习率", "学习率决定梯度下降每一步的步长")]) == 0
+    manager.index_nodes(1, 20, [], deleted_node_ids=["c"])
+    assert manager.related(1, 10, _node("a", "", "")) == []
+    manager.drop_graph(1, 10)
+    assert len(manager.get(1)) == 1
+
+    # 重新打开（模拟其它进程）读到相同状态
+    reopened = UserVectorIndex(manager.get(1).path, 256)
+    assert len(reopened) == 1 and reopened.vector(20, "d") is not None
+
+
+def test_compaction_and_ann(tmp_path, monkeypatch):
+    dim = 32
+    index = UserVectorIndex(tmp_path, dim)
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(4500, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    for version in range(3):  # 反复覆盖，空洞多于存活行时触发压缩
+        index.upsert(1, [(str(i), f"v{version}") for i in range(1500)], vectors[version * 1500:(version + 1) * 1500])
+    assert (tmp_path / "vectors.f32").stat().st_size == 1500 * dim * 4
+    assert np.allclose(index.vector(1, "7"), vectors[3007])
+
+    exact = index.search(vectors[3010], k=5, min_score=-1)
+    assert exact[0].node_id == "10"
+    monkeypatch.setattr(vector_index, "VECTOR_ANN_THRESHOLD", 100)
+    monkeypatch.setattr(vector_index, "VECTOR_ANN_NPROBE", 39)  # 全部簇：结果与暴力检索一致
+    assert [h.node_id for h in index.search(vectors[3010], k=5, min_score=-1)] == [h.node_id for h in exact]
@@ -0,0 +1,52 @@
+import json
+
+import orjson
+import zstandard
+
+from backend.app.utils.graph_utils import MAGIC_V1, merge_graph_json, pack_graph, unpack_graph
+
+NODES = [{"id": "a", "data": {"label": "中文"}}, {"id": "b"}]
+EDGES = [{"id": "a-b", "source": "a", "target": "b"}]
+
+
+def test_pack_roundtrip_and_legacy_json():
+    packed = pack_graph(NODES, EDGES)
+    assert packed.startswith(MAGIC_V1)
+    assert unpack_graph(packed) == (NODES, EDGES)
+    legacy = json.dumps({"nodes": NODES, "edges": EDGES})
+    assert unpack_graph(legacy) == (NODES, EDGES)
+    assert unpack_graph(legacy.encode()) == (NODES, EDGES)
+    assert unpack_graph(None) == ([], [])
+    assert unpack_graph(MAGIC_V1 + b"broken") == ([], [])
+
+
+def test_merge_graph_json_without_reparse():
+    header = {"id": 1, "title": "t", "version": 2}
+    expected = {**header, "nodes": NODES, "edges": EDGES}
+    packed = pack_graph(NODES, EDGES)
+
+    body, encoded = merge_graph_json(header, packed)
+    assert not encoded and orjson.loads(body) == expected
+
+    body, encoded = merge_graph_json(header, packed, accept_zstd=True)
+    assert encoded
+    with zstandard.ZstdDecompressor().stream_reader(body, read_across_frames=True) as reader:
+        assert orjson.loads(reader.read()) == expected
+
+    # 旧格式数据不能直接透传 zstd 帧，解析后重新序列化为明文
+    body, encoded = merge_graph_json(header, json.dumps({"nodes": NODES, "edges": EDGES}), accept_zstd=True)
+    assert not encoded and orjson.loads(body) == expected
+    # 0005 降级写入的空对象、缺少 edges、含同名字段的旧数据都得到合法且完整的对象
+    assert orjson.loads(merge_graph_json(header, "{}")[0]) == {**header, "nodes": [], "edges": []}
+    legacy = json.dumps({"id": 9, "title": "old", "nodes": NODES})
+    assert orjson.loads(merge_graph_json(header, legacy)[0]) == {**header, "nodes": NODES, "edges": []}
+    assert merge_graph_json(header, legacy)[0].count(b'"title"') == 1
+
+
+def test_accepts_encoding():
+    from backend.app.utils.http_cache import accepts_encoding
+
+    assert accepts_encoding("gzip, zstd", "zstd") and accepts_encoding("ZSTD;q=0.5", "zstd")
+    assert not accepts_encoding("zstd;q=0, gzip", "zstd") and not accepts_encoding("gzip", "zstd")
+    assert accepts_encoding("gzip, *", "zstd") and not accepts_encoding("*, zstd;q=0", "zstd")
+    assert not accepts_encoding(None, "zstd")
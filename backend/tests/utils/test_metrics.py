@@ -0,0 +1,21 @@
+from backend.app.core.metrics import Registry
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    requests = registry.counter("t_requests_total", "Requests", ["route"])
+    latency = registry.histogram("t_latency_seconds", "Latency", ["route"], buckets=(0.1, 1))
+    requests.inc(route='/a"b')
+    requests.inc(2, route='/a"b')
+    for value in (0.05, 0.5, 5):
+        latency.observe(value, route="/x")
+    registry.register_collector(lambda: [("t_pool_size", "gauge", "Pool", [({}, 5)])])
+
+    text = registry.render()
+    assert '# TYPE t_requests_total counter\nt_requests_total{route="/a\\"b"} 3' in text
+    assert 't_latency_seconds_bucket{route="/x",le="0.1"} 1' in text
+    assert 't_latency_seconds_bucket{route="/x",le="1"} 2' in text
+    assert 't_latency_seconds_bucket{route="/x",le="+Inf"} 3' in text
+    assert 't_latency_seconds_count{route="/x"} 3' in text
+    assert "t_pool_size 5" in text
+    assert registry.counter("t_requests_total", "Requests", ["route"]) is requests
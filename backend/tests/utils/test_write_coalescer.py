@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+from backend.app.utils.write_coalescer import WriteCoalescer
+
+
+def test_concurrent_writes_share_one_commit_and_hand_off_leadership():
+    coalescer = WriteCoalescer(window=0.05)
+    batches = []
+    in_commit = threading.Event()
+
+    def commit(key, batch):
+        batches.append([item.value for item in batch])
+        in_commit.set()
+        time.sleep(0.05)
+        for item in batch:
+            if item.value == "bad":
+                item.error = ValueError(item.value)
+            else:
+                item.result = (key, item.value)
+
+    results = {}
+
+    def write(value):
+        try:
+            results[value] = coalescer.submit("g", value, commit)
+        except ValueError as exc:
+            results[value] = exc
+
+    first = [threading.Thread(target=write, args=(v,)) for v in ("a", "b", "bad")]
+    for t in first:
+        t.start()
+    in_commit.wait(2)
+    # 提交期间到达的写入进入下一批，由其中一个接任 leader
+    late = [threading.Thread(target=write, args=(v,)) for v in ("c", "d")]
+    for t in late:
+        t.start()
+    for t in first + late:
+        t.join(5)
+
+    assert sorted(map(sorted, batches)) == [["a", "b", "bad"], ["c", "d"]]
+    assert results["a"] == ("g", "a") and results["d"] == ("g", "d") and isinstance(results["bad"], ValueError)
+    assert coalescer.stats() == {"writes": 5, "commits": 2, "coalesced": 3, "max_batch": 3, "pending_keys": 0}
+
+
+def test_commit_failure_fails_the_whole_batch_and_releases_the_key():
+    coalescer = WriteCoalescer(window=0)
+
+    def broken(key, batch):
+        raise RuntimeError("db down")
+
+    with pytest.raises(RuntimeError, match="db down"):
+        coalescer.submit("g", 1, broken)
+    assert coalescer.submit("g", 2, lambda key, batch: setattr(batch[0], "result", "ok")) == "ok"
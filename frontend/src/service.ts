@@ -176,7 +176,9 @@ export class GraphService {
     try {
       const res = await fetch(`${LLM_BASE_URL}/api/v1/graphs/${id}`, {
         method: 'PUT',
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json',
+          'Authorization': `${localStorage.getItem('access_token')}`
+         },
         body: JSON.stringify(payload)
       });
       if (!res.ok) throw new Error(`HTTP ${res.status}`);